@@ -0,0 +1,150 @@
+"""
+Asyncio algod client for pool states.
+
+The requests share a pool of keep-alive connections, at most max_connections requests are in flight. The concurrent
+requests of the same pool are de-duplicated, the callers wait for the same response. The account information is
+decoded into the local state layout of the contract (see BaseTestCase.get_pool_state) and tagged with the round.
+
+    async with AlgodClient("127.0.0.1", 4001, token) as client:
+        snapshots = await client.get_pool_snapshots(pool_addresses)
+"""
+import asyncio
+import base64
+import json
+
+from .constants import *
+from .donations import get_account_balances
+
+
+class AlgodError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+def decode_local_state(key_values):
+    """ Returns {key: int or bytes} of the key-value list of algod """
+    local_state = {}
+    for key_value in key_values:
+        value = key_value['value']
+        local_state[base64.b64decode(key_value['key'])] = base64.b64decode(value['bytes']) if value['type'] == 1 else value['uint']
+    return local_state
+
+
+def get_pool_snapshot(account_info, app_id=APPLICATION_ID):
+    """ pool_state is None if the account is not opted in to the app """
+    pool_state = None
+    for app_local_state in account_info.get('apps-local-state', ()):
+        if app_local_state['id'] == app_id:
+            pool_state = decode_local_state(app_local_state.get('key-value', ()))
+    return dict(
+        round=account_info['round'],
+        address=account_info['address'],
+        pool_state=pool_state,
+        balances=get_account_balances(account_info),
+    )
+
+
+class AlgodClient:
+
+    def __init__(self, host, port, token="", max_connections=16):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.semaphore = asyncio.Semaphore(max_connections)
+        # The idle keep-alive connections, (reader, writer)
+        self.connections = []
+        # The pending snapshot requests by address
+        self.in_flight = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        connections, self.connections = self.connections, []
+        for _, writer in connections:
+            writer.close()
+        for _, writer in connections:
+            await writer.wait_closed()
+
+    async def send(self, connection, method, path, body):
+        reader, writer = connection
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nX-Algo-API-Token: {self.token}\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+
+        status = int((await reader.readline()).split(b" ", 2)[1])
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            name, value = line.decode().split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+        response_body = await reader.readexactly(int(headers['content-length']))
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        return status, response_body, keep_alive
+
+    async def request(self, method, path, body=b""):
+        """ Returns the decoded JSON response, raises AlgodError if the status is not 200 """
+        async with self.semaphore:
+            # A reused connection may have been closed by the server, the request is retried on a new connection
+            while True:
+                reused = bool(self.connections)
+                connection = self.connections.pop() if reused else await asyncio.open_connection(self.host, self.port)
+                try:
+                    status, response_body, keep_alive = await self.send(connection, method, path, body)
+                except (ConnectionError, asyncio.IncompleteReadError, IndexError):
+                    connection[1].close()
+                    if reused:
+                        continue
+                    raise
+                break
+            if keep_alive:
+                self.connections.append(connection)
+            else:
+                connection[1].close()
+
+        response = json.loads(response_body) if response_body else {}
+        if status != 200:
+            raise AlgodError(status, response.get('message', ''))
+        return response
+
+    async def get_status(self):
+        return await self.request("GET", "/v2/status")
+
+    async def get_transaction_params(self):
+        return await self.request("GET", "/v2/transactions/params")
+
+    async def get_account_info(self, address):
+        return await self.request("GET", f"/v2/accounts/{address}")
+
+    async def send_raw_transaction(self, encoded_stxns):
+        """ encoded_stxns is the concatenated encoded signed transactions of a group, returns the txid of the first one """
+        response = await self.request("POST", "/v2/transactions", bytes(encoded_stxns))
+        return response['txId']
+
+    async def get_pending_transaction_info(self, txid):
+        return await self.request("GET", f"/v2/transactions/pending/{txid}")
+
+    async def fetch_pool_snapshot(self, address):
+        try:
+            return get_pool_snapshot(await self.get_account_info(address))
+        finally:
+            del self.in_flight[address]
+
+    async def get_pool_snapshot(self, address):
+        """ Returns dict(round, address, pool_state, balances), see get_pool_snapshot """
+        if address not in self.in_flight:
+            self.in_flight[address] = asyncio.ensure_future(self.fetch_pool_snapshot(address))
+        # shield keeps the shared request running if one of the callers is cancelled
+        return await asyncio.shield(self.in_flight[address])
+
+    async def get_pool_snapshots(self, addresses):
+        """ Returns {address: snapshot}, the snapshots of a call may be from different rounds """
+        snapshots = await asyncio.gather(*[self.get_pool_snapshot(address) for address in addresses])
+        return dict(zip(addresses, snapshots))
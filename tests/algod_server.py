@@ -0,0 +1,223 @@
+"""
+Local algod-compatible stand-in server backed by a JigLedger.
+
+    GET /v2/status
+    GET /v2/transactions/params
+    GET /v2/accounts/{address}
+    POST /v2/transactions
+    GET /v2/transactions/pending/{txid}
+
+The responses have the JSON layout of algod. Every accepted group is evaluated with eval_transactions as a block of
+its own, the round is a counter of the server. A rejected group is a 400 response with the evaluation error.
+
+    python -m tests.algod_server --pools 50 --requests 20000 --concurrency 64
+
+benchmarks the requests per second of account information and transaction submission.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import time
+
+from algojig import get_suggested_params
+from algojig.exceptions import LogicEvalError
+from algosdk import encoding
+
+from .algod import AlgodClient
+from .constants import *
+from .load import LoadGenerator
+from .utils import decode_signed_transactions
+
+# The min balance of the evaluator of algojig, it does not account the schema cost of an app opt-in (see bootstrap_pool)
+ASSET_MIN_BALANCE = 100_000
+ACCOUNT_MIN_BALANCE = 100_000
+APP_OPT_IN_MIN_BALANCE = 100_000
+
+
+def encode_local_state(local_state):
+    key_values = []
+    for key, value in local_state.items():
+        if isinstance(value, bytes):
+            value = {"type": 1, "bytes": base64.b64encode(value).decode(), "uint": 0}
+        else:
+            value = {"type": 2, "bytes": "", "uint": value}
+        key_values.append({"key": base64.b64encode(key).decode(), "value": value})
+    return key_values
+
+
+class AlgodServer:
+    """
+    Serves the accounts of the ledger over HTTP/1.1 with keep-alive.
+
+        server = AlgodServer(ledger)
+        await server.start()
+        ... AlgodClient("127.0.0.1", server.port)
+        await server.close()
+    """
+
+    def __init__(self, ledger, host="127.0.0.1", port=0):
+        self.ledger = ledger
+        self.host = host
+        self.port = port
+        self.round = 1
+        self.request_count = 0
+        # The pending transaction information of the confirmed transactions by txid
+        self.confirmed_transactions = {}
+        self.server = None
+        # The connection handler tasks by writer
+        self.connections = {}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        # The idle keep-alive connections are closed by the server
+        for writer in list(self.connections):
+            writer.close()
+        await asyncio.gather(*self.connections.values(), return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def handle_connection(self, reader, writer):
+        self.connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, value = line.decode().split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                self.request_count += 1
+                status, response = self.handle_request(method, path.split("?", 1)[0], body)
+                response_body = json.dumps(response).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(response_body)}\r\n\r\n".encode()
+                    + response_body
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections.pop(writer, None)
+            writer.close()
+
+    def handle_request(self, method, path, body):
+        parts = path.strip("/").split("/")
+        if method == "GET" and parts == ["v2", "status"]:
+            return "200 OK", self.get_status()
+        if method == "GET" and parts == ["v2", "transactions", "params"]:
+            return "200 OK", self.get_transaction_params()
+        if method == "GET" and len(parts) == 3 and parts[:2] == ["v2", "accounts"]:
+            return "200 OK", self.get_account_info(parts[2])
+        if method == "POST" and parts == ["v2", "transactions"]:
+            return self.submit_transactions(body)
+        if method == "GET" and len(parts) == 4 and parts[:3] == ["v2", "transactions", "pending"]:
+            if parts[3] not in self.confirmed_transactions:
+                return "404 Not Found", {"message": "txn does not exist"}
+            return "200 OK", self.confirmed_transactions[parts[3]]
+        return "404 Not Found", {"message": f"{method} {path} is not supported"}
+
+    def get_status(self):
+        return {"last-round": self.round}
+
+    def get_transaction_params(self):
+        sp = get_suggested_params()
+        return {
+            "consensus-version": "future",
+            "fee": 0,
+            "min-fee": MIN_TXN_FEE,
+            "genesis-hash": sp.gh,
+            "genesis-id": sp.gen,
+            "last-round": self.round,
+        }
+
+    def submit_transactions(self, body):
+        """ The body is the concatenated encoded signed transactions of a group """
+        try:
+            stxns = decode_signed_transactions([body])
+        except Exception as e:
+            return "400 Bad Request", {"message": f"msgpack decode error: {e!r}"}
+        try:
+            block = self.ledger.eval_transactions(stxns)
+        except LogicEvalError as e:
+            return "400 Bad Request", {"message": str(e)}
+
+        self.round += 1
+        for stxn, block_txn in zip(stxns, block[b'txns']):
+            self.confirmed_transactions[stxn.transaction.get_txid()] = {
+                "confirmed-round": self.round,
+                "pool-error": "",
+                "logs": [base64.b64encode(log).decode() for log in block_txn.get(b'dt', {}).get(b'lg', [])],
+                "inner-txns": [{} for _ in block_txn.get(b'dt', {}).get(b'itx', [])],
+            }
+        return "200 OK", {"txId": stxns[0].transaction.get_txid()}
+
+    def get_min_balance(self, account):
+        asset_count = sum(1 for asset_id in account['balances'] if asset_id)
+        return ACCOUNT_MIN_BALANCE + ASSET_MIN_BALANCE * asset_count + APP_OPT_IN_MIN_BALANCE * len(account['local_states'])
+
+    def get_account_info(self, address):
+        account = self.ledger.accounts.get(address)
+        if account is None:
+            return {"address": address, "amount": 0, "min-balance": 0, "round": self.round, "assets": [], "apps-local-state": []}
+
+        return {
+            "address": address,
+            "amount": self.ledger.get_account_balance(address)[0] if ALGO_ASSET_ID in account['balances'] else 0,
+            "min-balance": self.get_min_balance(account),
+            "round": self.round,
+            "assets": [
+                {"asset-id": asset_id, "amount": self.ledger.get_account_balance(address, asset_id)[0], "is-frozen": False}
+                for asset_id in account['balances'] if asset_id
+            ],
+            "apps-local-state": [
+                {"id": app_id, "key-value": encode_local_state(local_state)}
+                for app_id, local_state in account['local_states'].items()
+            ],
+        }
+
+
+async def run_benchmark(pool_count, request_count, concurrency):
+    generator = LoadGenerator(seed=0, pool_count=pool_count)
+    workload = generator.generate_workload(request_count // 10)
+    encoded_groups = [b"".join(base64.b64decode(encoding.msgpack_encode(stxn)) for stxn in stxns) for _, stxns in workload]
+    pool_addresses = [pool['address'] for pool in generator.pools]
+
+    server = await AlgodServer(generator.ledger).start()
+    report = {}
+    try:
+        async with AlgodClient(server.host, server.port, max_connections=concurrency) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*[client.get_account_info(pool_addresses[i % len(pool_addresses)]) for i in range(request_count)])
+            duration = time.perf_counter() - start
+            report["account_info"] = dict(requests=request_count, requests_per_second=request_count / duration)
+
+            start = time.perf_counter()
+            for encoded_group in encoded_groups:
+                await client.send_raw_transaction(encoded_group)
+            duration = time.perf_counter() - start
+            report["transactions"] = dict(groups=len(encoded_groups), groups_per_second=len(encoded_groups) / duration)
+    finally:
+        await server.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pools", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run_benchmark(args.pools, args.requests, args.concurrency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+from math import isqrt
+
+from .constants import LOCKED_POOL_TOKENS, MAX_UINT64, PRICE_SCALE_FACTOR
+
+
+class LogicError(Exception):
+    """ Raised by the pool model wherever the approval program would fail. The message is the failing Tealish line if it is an assert. """
+
+
+def require(condition, line):
+    if not condition:
+        raise LogicError(line)
+
+
+def uint64(value):
+    """ Fails like the AVM if the result of an integer operation or btoi is out of the uint64 range """
+    if value < 0:
+        raise LogicError("- would result negative")
+    if value > MAX_UINT64:
+        raise LogicError("uint64 overflow")
+    return value
+
+
+def div(a, b):
+    if b == 0:
+        raise LogicError("division by zero")
+    return a // b
+
+
+def calculate_fixed_input_fee_amounts(input_amount, total_fee_share, protocol_fee_ratio):
+    """ The same as calculate_fixed_input_fee_amounts in amm_approval.tl """
+    total_fee = uint64(input_amount * total_fee_share) // 10000
+    protocol_fee = total_fee // protocol_fee_ratio
+    poolers_fee = total_fee - protocol_fee
+    return total_fee, poolers_fee, protocol_fee
+
+
+def calculate_fixed_output_fee_amounts(swap_amount, total_fee_share, protocol_fee_ratio):
+    """ The same as calculate_fixed_output_fee_amounts in amm_approval.tl """
+    input_amount = uint64(swap_amount * 10000) // (10000 - total_fee_share)
+    total_fee = input_amount - swap_amount
+    protocol_fee = total_fee // protocol_fee_ratio
+    poolers_fee = total_fee - protocol_fee
+    return total_fee, poolers_fee, protocol_fee
+
+
+def calculate_fixed_input_swap(input_supply, output_supply, swap_amount):
+    """ The same as calculate_fixed_input_swap in amm_approval.tl """
+    k = input_supply * output_supply
+    # +1 for Round Up
+    return uint64(output_supply - uint64(div(k, uint64(input_supply + swap_amount)) + 1))
+
+
+def calculate_fixed_output_swap(input_supply, output_supply, output_amount):
+    """ The same as calculate_fixed_output_swap in amm_approval.tl """
+    k = input_supply * output_supply
+    # +1 for Round Up
+    return uint64(uint64(div(k, uint64(output_supply - output_amount)) + 1) - input_supply)
+
+
+def get_swap_reserves(pool_state, input_asset_id):
+    if input_asset_id == pool_state[b'asset_1_id']:
+        return pool_state[b'asset_1_reserves'], pool_state[b'asset_2_reserves']
+    return pool_state[b'asset_2_reserves'], pool_state[b'asset_1_reserves']
+
+
+def get_fixed_input_swap_quote(pool_state, input_asset_id, input_amount):
+    """ Returns (output_amount, total_fee_amount) of a fixed-input swap """
+    input_supply, output_supply = get_swap_reserves(pool_state, input_asset_id)
+    total_fee_amount, _, _ = calculate_fixed_input_fee_amounts(input_amount, pool_state[b'total_fee_share'], pool_state[b'protocol_fee_ratio'])
+    output_amount = calculate_fixed_input_swap(input_supply, output_supply, input_amount - total_fee_amount)
+    return output_amount, total_fee_amount
+
+
+def get_fixed_output_swap_quote(pool_state, input_asset_id, output_amount):
+    """ Returns (required_input_amount, total_fee_amount) of a fixed-output swap """
+    input_supply, output_supply = get_swap_reserves(pool_state, input_asset_id)
+    swap_amount = calculate_fixed_output_swap(input_supply, output_supply, output_amount)
+    total_fee_amount, _, _ = calculate_fixed_output_fee_amounts(swap_amount, pool_state[b'total_fee_share'], pool_state[b'protocol_fee_ratio'])
+    return swap_amount + total_fee_amount, total_fee_amount
+
+
+# The functions below apply an app call to a copy of the pool local state, the same way the approval program does.
+# They return (new_pool_state, result) and raise LogicError if the app call would fail.
+# result contains the amounts which are transferred to the user and the values which are logged.
+
+
+def get_cumulative_price(pool_state, key):
+    value = pool_state.get(key, 0)
+    if isinstance(value, bytes):
+        value = int.from_bytes(value, 'big')
+    return value
+
+
+def get_price_oracle_timestamp(pool_state):
+    """ Evaluating at this timestamp leaves the price oracle unchanged """
+    return pool_state.get(b'cumulative_price_update_timestamp', 0)
+
+
+def update_price_oracle(pool_state, timestamp):
+    time_delta = uint64(timestamp - pool_state.get(b'cumulative_price_update_timestamp', 0))
+    if pool_state[b'issued_pool_tokens'] and time_delta:
+        asset_1_reserves = pool_state[b'asset_1_reserves']
+        asset_2_reserves = pool_state[b'asset_2_reserves']
+        pool_state[b'asset_1_cumulative_price'] = get_cumulative_price(pool_state, b'asset_1_cumulative_price') + div(asset_2_reserves * PRICE_SCALE_FACTOR * time_delta, asset_1_reserves)
+        pool_state[b'asset_2_cumulative_price'] = get_cumulative_price(pool_state, b'asset_2_cumulative_price') + div(asset_1_reserves * PRICE_SCALE_FACTOR * time_delta, asset_2_reserves)
+        pool_state[b'cumulative_price_update_timestamp'] = timestamp
+
+
+def check_lock(pool_state, method):
+    require(pool_state.get(b'lock', 0) == (method == "verify_flash_swap"), 'assert(app_local_get(1, "lock") == (Txn.ApplicationArgs[0] == "verify_flash_swap"))')
+
+
+def check_invariant(initial_state, pool_state, asset_1_poolers_fee_amount, asset_2_poolers_fee_amount):
+    initial_k = initial_state[b'asset_1_reserves'] * initial_state[b'asset_2_reserves']
+    final_k = uint64(pool_state[b'asset_1_reserves'] - asset_1_poolers_fee_amount) * uint64(pool_state[b'asset_2_reserves'] - asset_2_poolers_fee_amount)
+    require(initial_k <= final_k, 'assert((itob(app_local_get(1, "asset_1_reserves")) b* itob(app_local_get(1, "asset_2_reserves"))) b<= (itob(asset_1_reserves - asset_1_poolers_fee_amount) b* itob(asset_2_reserves - asset_2_poolers_fee_amount)))')
+
+
+def check_pool_token_value(initial_state, pool_state):
+    tmp_initial = initial_state[b'asset_1_reserves'] * initial_state[b'asset_2_reserves'] * pool_state[b'issued_pool_tokens'] ** 2
+    tmp_final = pool_state[b'asset_1_reserves'] * pool_state[b'asset_2_reserves'] * initial_state[b'issued_pool_tokens'] ** 2
+    require(tmp_initial <= tmp_final, "assert(tmp_initial b<= tmp_final)")
+
+
+def swap(initial_state, input_asset_id, input_amount, mode, min_output, timestamp=0):
+    check_lock(initial_state, "swap")
+    pool_state = dict(initial_state)
+    update_price_oracle(pool_state, timestamp)
+
+    require(input_amount, "assert(input_amount)")
+    if input_asset_id == pool_state[b'asset_1_id']:
+        output_asset_id = pool_state[b'asset_2_id']
+        input_supply, output_supply = pool_state[b'asset_1_reserves'], pool_state[b'asset_2_reserves']
+    elif input_asset_id == pool_state[b'asset_2_id']:
+        output_asset_id = pool_state[b'asset_1_id']
+        input_supply, output_supply = pool_state[b'asset_2_reserves'], pool_state[b'asset_1_reserves']
+    else:
+        raise LogicError("error()")
+
+    total_fee_share = pool_state[b'total_fee_share']
+    protocol_fee_ratio = pool_state[b'protocol_fee_ratio']
+    change = 0
+    if mode == "fixed-input":
+        total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_input_fee_amounts(input_amount, total_fee_share, protocol_fee_ratio)
+        swap_amount = input_amount - total_fee_amount
+        output_amount = calculate_fixed_input_swap(input_supply, output_supply, swap_amount)
+        require(output_amount, "assert(output_amount)")
+        require(total_fee_amount, "assert(total_fee_amount)")
+        require(output_amount >= min_output, "assert(output_amount >= min_output)")
+    elif mode == "fixed-output":
+        output_amount = min_output
+        swap_amount = calculate_fixed_output_swap(input_supply, output_supply, output_amount)
+        total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_output_fee_amounts(swap_amount, total_fee_share, protocol_fee_ratio)
+        required_input_amount = uint64(swap_amount + total_fee_amount)
+        require(output_amount, "assert(output_amount)")
+        require(total_fee_amount, "assert(total_fee_amount)")
+        require(input_amount >= required_input_amount, "assert(input_amount >= required_input_amount)")
+        change = input_amount - required_input_amount
+    else:
+        raise LogicError("error()")
+
+    if input_asset_id == pool_state[b'asset_1_id']:
+        pool_state[b'asset_1_protocol_fees'] = uint64(pool_state[b'asset_1_protocol_fees'] + protocol_fee_amount)
+        pool_state[b'asset_1_reserves'] = uint64(pool_state[b'asset_1_reserves'] + uint64(swap_amount + poolers_fee_amount))
+        pool_state[b'asset_2_reserves'] = uint64(pool_state[b'asset_2_reserves'] - output_amount)
+        check_invariant(initial_state, pool_state, poolers_fee_amount, 0)
+    else:
+        pool_state[b'asset_2_protocol_fees'] = uint64(pool_state[b'asset_2_protocol_fees'] + protocol_fee_amount)
+        pool_state[b'asset_2_reserves'] = uint64(pool_state[b'asset_2_reserves'] + uint64(swap_amount + poolers_fee_amount))
+        pool_state[b'asset_1_reserves'] = uint64(pool_state[b'asset_1_reserves'] - output_amount)
+        check_invariant(initial_state, pool_state, 0, poolers_fee_amount)
+
+    result = dict(
+        input_asset_id=input_asset_id,
+        input_amount=input_amount,
+        swap_amount=swap_amount,
+        change=change,
+        output_asset_id=output_asset_id,
+        output_amount=output_amount,
+        poolers_fee_amount=poolers_fee_amount,
+        protocol_fee_amount=protocol_fee_amount,
+        total_fee_amount=total_fee_amount,
+    )
+    return pool_state, result
+
+
+def add_initial_liquidity(initial_state, asset_1_amount, asset_2_amount, timestamp=0):
+    check_lock(initial_state, "add_initial_liquidity")
+    pool_state = dict(initial_state)
+    require(pool_state[b'issued_pool_tokens'] == 0, "assert(issued_pool_tokens == 0)")
+    require(asset_1_amount, "assert(asset_1_amount)")
+    require(asset_2_amount, "assert(asset_2_amount)")
+
+    issued_pool_tokens = isqrt(asset_1_amount * asset_2_amount)
+    require(issued_pool_tokens > LOCKED_POOL_TOKENS, "assert(issued_pool_tokens > LOCKED_POOL_TOKENS)")
+
+    pool_state[b'asset_1_reserves'] = asset_1_amount
+    pool_state[b'asset_2_reserves'] = asset_2_amount
+    pool_state[b'issued_pool_tokens'] = issued_pool_tokens
+    return pool_state, dict(pool_tokens_out=issued_pool_tokens - LOCKED_POOL_TOKENS)
+
+
+def add_liquidity(initial_state, asset_1_amount, asset_2_amount, min_output=0, timestamp=0):
+    """ asset_1_amount or asset_2_amount is None for the single mode, as in BaseTestCase.get_add_liquidity_transactions """
+    check_lock(initial_state, "add_liquidity")
+    pool_state = dict(initial_state)
+    issued_pool_tokens = pool_state[b'issued_pool_tokens']
+    require(issued_pool_tokens, "assert(issued_pool_tokens)")
+    update_price_oracle(pool_state, timestamp)
+
+    asset_1_amount = asset_1_amount or 0
+    asset_2_amount = asset_2_amount or 0
+    asset_1_reserves = pool_state[b'asset_1_reserves']
+    asset_2_reserves = pool_state[b'asset_2_reserves']
+
+    new_k = uint64(asset_1_reserves + asset_1_amount) * uint64(asset_2_reserves + asset_2_amount)
+    old_k = asset_1_reserves * asset_2_reserves
+    new_issued_pool_tokens = uint64(isqrt(div(new_k * issued_pool_tokens * issued_pool_tokens, old_k)))
+    pool_tokens_out = uint64(new_issued_pool_tokens - issued_pool_tokens)
+
+    asset_1_reserves = uint64(asset_1_reserves + asset_1_amount)
+    asset_2_reserves = uint64(asset_2_reserves + asset_2_amount)
+    issued_pool_tokens = new_issued_pool_tokens
+
+    z1 = uint64(div(pool_tokens_out * asset_1_reserves, issued_pool_tokens))
+    z2 = uint64(div(pool_tokens_out * asset_2_reserves, issued_pool_tokens))
+
+    # Select the bigger swap amount. Because of the rounding errors both swap amounts can be positive
+    swap_amount = 0
+    asset_1_to_asset_2 = True
+    if asset_1_amount > z1:
+        swap_amount = asset_1_amount - z1
+    if asset_2_amount > z2:
+        if swap_amount <= (asset_2_amount - z2):
+            swap_amount = asset_2_amount - z2
+            asset_1_to_asset_2 = False
+
+    total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_output_fee_amounts(swap_amount, pool_state[b'total_fee_share'], pool_state[b'protocol_fee_ratio'])
+    if asset_1_to_asset_2:
+        input_asset_id, output_asset_id = pool_state[b'asset_1_id'], pool_state[b'asset_2_id']
+        pool_state[b'asset_1_protocol_fees'] = uint64(pool_state[b'asset_1_protocol_fees'] + protocol_fee_amount)
+        fee_as_pool_tokens = uint64(div(total_fee_amount * issued_pool_tokens, asset_1_reserves * 2))
+        asset_1_reserves = uint64(asset_1_reserves - protocol_fee_amount)
+    else:
+        input_asset_id, output_asset_id = pool_state[b'asset_2_id'], pool_state[b'asset_1_id']
+        pool_state[b'asset_2_protocol_fees'] = uint64(pool_state[b'asset_2_protocol_fees'] + protocol_fee_amount)
+        fee_as_pool_tokens = uint64(div(total_fee_amount * issued_pool_tokens, asset_2_reserves * 2))
+        asset_2_reserves = uint64(asset_2_reserves - protocol_fee_amount)
+
+    pool_tokens_out = uint64(pool_tokens_out - fee_as_pool_tokens)
+    issued_pool_tokens = uint64(issued_pool_tokens - fee_as_pool_tokens)
+    require(pool_tokens_out, "assert(pool_tokens_out)")
+    require(pool_tokens_out >= min_output, "assert(pool_tokens_out >= min_output)")
+
+    pool_state[b'asset_1_reserves'] = asset_1_reserves
+    pool_state[b'asset_2_reserves'] = asset_2_reserves
+    pool_state[b'issued_pool_tokens'] = issued_pool_tokens
+    check_pool_token_value(initial_state, pool_state)
+
+    result = dict(
+        input_asset_id=input_asset_id,
+        output_asset_id=output_asset_id,
+        pool_tokens_out=pool_tokens_out,
+        swap_amount=swap_amount,
+        poolers_fee_amount=poolers_fee_amount,
+        protocol_fee_amount=protocol_fee_amount,
+        total_fee_amount=total_fee_amount,
+    )
+    return pool_state, result
+
+
+def remove_liquidity(initial_state, removed_pool_token_amount, min_output_1=0, min_output_2=0, output_asset_id=None, timestamp=0):
+    """ output_asset_id is set for the single asset mode """
+    check_lock(initial_state, "remove_liquidity")
+    pool_state = dict(initial_state)
+    update_price_oracle(pool_state, timestamp)
+    require(removed_pool_token_amount, "assert(removed_pool_token_amount)")
+
+    asset_1_reserves = pool_state[b'asset_1_reserves']
+    asset_2_reserves = pool_state[b'asset_2_reserves']
+    issued_pool_tokens = pool_state[b'issued_pool_tokens']
+    if uint64(removed_pool_token_amount + LOCKED_POOL_TOKENS) == issued_pool_tokens:
+        asset_1_amount = asset_1_reserves
+        asset_2_amount = asset_2_reserves
+        issued_pool_tokens = 0
+    else:
+        asset_1_amount = uint64(div(removed_pool_token_amount * asset_1_reserves, issued_pool_tokens))
+        asset_2_amount = uint64(div(removed_pool_token_amount * asset_2_reserves, issued_pool_tokens))
+        issued_pool_tokens = uint64(issued_pool_tokens - removed_pool_token_amount)
+    require(asset_1_amount and asset_2_amount, "assert(asset_1_amount && asset_2_amount)")
+
+    asset_1_reserves = uint64(asset_1_reserves - asset_1_amount)
+    asset_2_reserves = uint64(asset_2_reserves - asset_2_amount)
+
+    result = dict(asset_1_amount=asset_1_amount, asset_2_amount=asset_2_amount)
+    if output_asset_id is None:
+        require(asset_1_amount >= min_output_1, "assert(asset_1_amount >= min_output_1)")
+        require(asset_2_amount >= min_output_2, "assert(asset_2_amount >= min_output_2)")
+    else:
+        require(issued_pool_tokens > 0, "assert(issued_pool_tokens > 0)")
+        total_fee_share = pool_state[b'total_fee_share']
+        protocol_fee_ratio = pool_state[b'protocol_fee_ratio']
+        if output_asset_id == pool_state[b'asset_1_id']:
+            total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_input_fee_amounts(asset_2_amount, total_fee_share, protocol_fee_ratio)
+            swap_amount = asset_2_amount - total_fee_amount
+            swap_output_amount = calculate_fixed_input_swap(asset_2_reserves, asset_1_reserves, swap_amount)
+            asset_1_reserves = uint64(asset_1_reserves - swap_output_amount)
+            asset_2_reserves = uint64(asset_2_reserves + uint64(swap_amount + poolers_fee_amount))
+            pool_state[b'asset_2_protocol_fees'] = uint64(pool_state[b'asset_2_protocol_fees'] + protocol_fee_amount)
+            final_output_amount = uint64(asset_1_amount + swap_output_amount)
+            require(final_output_amount >= min_output_1, "assert(final_output_amount >= min_output_1)")
+            result.update(input_asset_id=pool_state[b'asset_2_id'], input_amount=asset_2_amount, asset_1_amount=final_output_amount, asset_2_amount=0)
+        elif output_asset_id == pool_state[b'asset_2_id']:
+            total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_input_fee_amounts(asset_1_amount, total_fee_share, protocol_fee_ratio)
+            swap_amount = asset_1_amount - total_fee_amount
+            swap_output_amount = calculate_fixed_input_swap(asset_1_reserves, asset_2_reserves, swap_amount)
+            asset_2_reserves = uint64(asset_2_reserves - swap_output_amount)
+            asset_1_reserves = uint64(asset_1_reserves + uint64(swap_amount + poolers_fee_amount))
+            pool_state[b'asset_1_protocol_fees'] = uint64(pool_state[b'asset_1_protocol_fees'] + protocol_fee_amount)
+            final_output_amount = uint64(asset_2_amount + swap_output_amount)
+            require(final_output_amount >= min_output_2, "assert(final_output_amount >= min_output_2)")
+            result.update(input_asset_id=pool_state[b'asset_1_id'], input_amount=asset_1_amount, asset_1_amount=0, asset_2_amount=final_output_amount)
+        else:
+            raise LogicError("error()")
+        result.update(
+            swap_amount=swap_amount,
+            output_asset_id=output_asset_id,
+            output_amount=swap_output_amount,
+            poolers_fee_amount=poolers_fee_amount,
+            protocol_fee_amount=protocol_fee_amount,
+            total_fee_amount=total_fee_amount,
+        )
+
+    pool_state[b'asset_1_reserves'] = asset_1_reserves
+    pool_state[b'asset_2_reserves'] = asset_2_reserves
+    pool_state[b'issued_pool_tokens'] = issued_pool_tokens
+    if issued_pool_tokens:
+        check_pool_token_value(initial_state, pool_state)
+    return pool_state, result
+
+
+def flash_loan(initial_state, asset_1_amount, asset_2_amount, asset_1_input_amount=0, asset_2_input_amount=0, timestamp=0):
+    """ Applies both flash_loan and verify_flash_loan, asset_x_input_amount is the repayment transferred to the pool """
+    check_lock(initial_state, "flash_loan")
+    pool_state = dict(initial_state)
+    update_price_oracle(pool_state, timestamp)
+    require(asset_1_amount or asset_2_amount, "assert(asset_1_amount || asset_2_amount)")
+    require(asset_1_amount <= pool_state[b'asset_1_reserves'], "assert(asset_1_amount <= asset_1_reserves)")
+    require(asset_2_amount <= pool_state[b'asset_2_reserves'], "assert(asset_2_amount <= asset_2_reserves)")
+
+    result = {}
+    for i, output_amount, input_amount in ((1, asset_1_amount, asset_1_input_amount), (2, asset_2_amount, asset_2_input_amount)):
+        if not output_amount:
+            continue
+        total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_input_fee_amounts(output_amount, pool_state[b'total_fee_share'], pool_state[b'protocol_fee_ratio'])
+        require(total_fee_amount, f"assert(asset_{i}_total_fee_amount)")
+        repayment_amount = uint64(output_amount + total_fee_amount)
+        require(input_amount >= repayment_amount, f"assert(Gtxn[asset_{i}_txn_index].AssetAmount >= asset_{i}_repayment_amount)")
+
+        protocol_fees_key = f'asset_{i}_protocol_fees'.encode()
+        reserves_key = f'asset_{i}_reserves'.encode()
+        pool_state[protocol_fees_key] = uint64(pool_state[protocol_fees_key] + protocol_fee_amount)
+        pool_state[reserves_key] = uint64(pool_state[reserves_key] + poolers_fee_amount)
+        result.update({
+            f'asset_{i}_output_amount': output_amount,
+            f'asset_{i}_input_amount': input_amount,
+            f'asset_{i}_donation_amount': input_amount - repayment_amount,
+            f'asset_{i}_poolers_fee_amount': poolers_fee_amount,
+            f'asset_{i}_protocol_fee_amount': protocol_fee_amount,
+            f'asset_{i}_total_fee_amount': total_fee_amount,
+        })
+    return pool_state, result
+
+
+def flash_swap(initial_state, asset_1_output_amount, asset_2_output_amount, asset_1_input_amount=0, asset_2_input_amount=0, timestamp=0):
+    """ Applies both flash_swap and verify_flash_swap, asset_x_input_amount is the net amount transferred to the pool in between """
+    check_lock(initial_state, "flash_swap")
+    pool_state = dict(initial_state)
+    update_price_oracle(pool_state, timestamp)
+    require(asset_1_output_amount or asset_2_output_amount, "assert(asset_1_output_amount || asset_2_output_amount)")
+    require(asset_1_output_amount <= pool_state[b'asset_1_reserves'], "assert(asset_1_output_amount <= asset_1_reserves)")
+    require(asset_2_output_amount <= pool_state[b'asset_2_reserves'], "assert(asset_2_output_amount <= asset_2_reserves)")
+
+    result = {}
+    poolers_fee_amounts = []
+    total_fee_amounts = []
+    for i, output_amount, input_amount in ((1, asset_1_output_amount, asset_1_input_amount), (2, asset_2_output_amount, asset_2_input_amount)):
+        total_fee_amount = poolers_fee_amount = protocol_fee_amount = 0
+        protocol_fees_key = f'asset_{i}_protocol_fees'.encode()
+        reserves_key = f'asset_{i}_reserves'.encode()
+        if input_amount:
+            total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_input_fee_amounts(input_amount, pool_state[b'total_fee_share'], pool_state[b'protocol_fee_ratio'])
+            pool_state[protocol_fees_key] = uint64(pool_state[protocol_fees_key] + protocol_fee_amount)
+            pool_state[reserves_key] = uint64(uint64(pool_state[reserves_key] - output_amount) + uint64(input_amount - protocol_fee_amount))
+        else:
+            pool_state[reserves_key] = uint64(pool_state[reserves_key] - output_amount)
+        poolers_fee_amounts.append(poolers_fee_amount)
+        total_fee_amounts.append(total_fee_amount)
+        result.update({
+            f'asset_{i}_output_amount': output_amount,
+            f'asset_{i}_input_amount': input_amount,
+            f'asset_{i}_poolers_fee_amount': poolers_fee_amount,
+            f'asset_{i}_protocol_fee_amount': protocol_fee_amount,
+            f'asset_{i}_total_fee_amount': total_fee_amount,
+        })
+
+    require(total_fee_amounts[0] or total_fee_amounts[1], "assert(asset_1_total_fee_amount || asset_2_total_fee_amount)")
+    check_invariant(initial_state, pool_state, *poolers_fee_amounts)
+    return pool_state, result
@@ -0,0 +1,323 @@
+"""
+Cycle arbitrage detector with incremental updates across the pool graph.
+
+Every pool is two directed edges weighted by the log of the marginal exchange rate after the fee. A cycle is profitable
+if the sum of its edge weights is positive. Only the cycles touching updated pools are re-evaluated, the opportunities
+are sized with the exact integer swap math of the contract.
+
+    python -m tests.arbitrage --assets 2000 --pools 20000 --blocks 100 --updates 50
+
+benchmarks the detection latency per block.
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+from math import exp, isqrt, log, sqrt
+
+from algojig import get_suggested_params
+from algosdk import encoding
+from algosdk.future import transaction
+
+from . import amm
+from .constants import *
+from .fees import get_min_fee, set_min_fees
+from .fuzz import get_pool_local_state
+from .load import get_percentiles
+
+MAX_CYCLE_LENGTH = 3
+
+
+def get_edge_weight(pool_state, input_asset_id):
+    input_supply, output_supply = amm.get_swap_reserves(pool_state, input_asset_id)
+    if not input_supply or not output_supply:
+        return float("-inf")
+    return log(output_supply / input_supply * (10000 - pool_state[b'total_fee_share']) / 10000)
+
+
+def get_cycle_output_amount(pool_states, cycle, input_amount):
+    """ Returns the output amount of the chained fixed-input swaps, 0 if one of the swaps would fail """
+    amount = input_amount
+    for pool_address, input_asset_id, _ in cycle:
+        pool_state = pool_states[pool_address]
+        try:
+            amount, total_fee_amount = amm.get_fixed_input_swap_quote(pool_state, input_asset_id, amount)
+        except amm.LogicError:
+            return 0
+        if not amount or not total_fee_amount:
+            return 0
+    return amount
+
+
+def get_optimal_input_estimate(pool_states, cycle):
+    """
+    A chain of constant product swaps is equivalent to a single virtual pool (a, b) with the fee ratio r of the first pool.
+    The profit r * x * b / (a + r * x) - x is maximized at x = (sqrt(r * a * b) - a) / r.
+    """
+    a = b = r = None
+    for pool_address, input_asset_id, _ in cycle:
+        pool_state = pool_states[pool_address]
+        input_supply, output_supply = amm.get_swap_reserves(pool_state, input_asset_id)
+        fee_ratio = (10000 - pool_state[b'total_fee_share']) / 10000
+        if a is None:
+            a, b, r = input_supply, output_supply, fee_ratio
+        else:
+            a, b = a * input_supply / (input_supply + fee_ratio * b), fee_ratio * b * output_supply / (input_supply + fee_ratio * b)
+    if r * b <= a:
+        return 0
+    return (sqrt(r * a * b) - a) / r
+
+
+def get_cycle_profit(pool_states, cycle, input_amount):
+    return get_cycle_output_amount(pool_states, cycle, input_amount) - input_amount
+
+
+def get_optimal_input_amount(pool_states, cycle):
+    """ Returns (input_amount, profit), the estimate is refined with the exact integer math """
+    estimate = int(get_optimal_input_estimate(pool_states, cycle))
+    if estimate <= 0:
+        return 0, 0
+
+    # The exact profit is concave apart from the rounding, a ternary search around the estimate finds the optimum
+    low, high = max(1, estimate // 2), estimate * 2
+    while high - low > 2:
+        m1 = low + (high - low) // 3
+        m2 = high - (high - low) // 3
+        if get_cycle_profit(pool_states, cycle, m1) < get_cycle_profit(pool_states, cycle, m2):
+            low = m1 + 1
+        else:
+            high = m2 - 1
+    input_amount = max(range(low, high + 1), key=lambda x: get_cycle_profit(pool_states, cycle, x))
+    return input_amount, get_cycle_profit(pool_states, cycle, input_amount)
+
+
+def get_cycle_fee(pool_states, cycle, min_fee=MIN_TXN_FEE):
+    """ Returns the minimum total fee of the group of the cycle in microAlgos, see get_cycle_transactions """
+    swaps = [(pool_address, input_asset_id, 1, output_asset_id, 1) for pool_address, input_asset_id, output_asset_id in cycle]
+    txn_group = get_cycle_transactions(get_suggested_params(), cycle[0][0], swaps, pool_states)
+    return sum(get_min_fee(txn_group, index, pool_states, min_fee) for index in range(len(txn_group)))
+
+
+class ArbitrageDetector:
+    """
+    start_asset_ids: the cycles start and end with one of these assets, the profit is in terms of the start asset
+    max_cycle_length: the maximum number of swaps in a cycle
+    min_profit: the minimum profit of an opportunity. The profit of the cycles starting with Algo is net of the group
+    fee (see get_cycle_fee), the fee is not subtracted from the profit in the other start assets.
+
+        detector = ArbitrageDetector([ALGO_ASSET_ID])
+        detector.add_pools(pool_states)
+        ...
+        detector.update_pools(updated_pool_states)
+        opportunities = detector.detect()
+    """
+
+    def __init__(self, start_asset_ids, max_cycle_length=MAX_CYCLE_LENGTH, min_profit=1):
+        self.start_asset_ids = list(start_asset_ids)
+        self.max_cycle_length = max_cycle_length
+        self.min_profit = min_profit
+
+        self.pool_states = {}
+        # asset id -> {pool address: other asset id}
+        self.asset_pools = {}
+        # (pool address, input asset id) -> log of the marginal exchange rate
+        self.edge_weights = {}
+        # A cycle is a tuple of (pool address, input asset id, output asset id)
+        self.cycles = []
+        self.pool_cycles = {}
+        self.opportunities = {}
+        self.updated_pools = set()
+        # The group fee of a cycle of fixed-input swaps only depends on the number of swaps
+        self.cycle_fees = {}
+
+    def add_pools(self, pool_states):
+        """ pool_states maps the pool addresses to the local states """
+        new_pools = set()
+        for pool_address, pool_state in pool_states.items():
+            if pool_address in self.pool_states:
+                continue
+            asset_1_id, asset_2_id = pool_state[b'asset_1_id'], pool_state[b'asset_2_id']
+            self.asset_pools.setdefault(asset_1_id, {})[pool_address] = asset_2_id
+            self.asset_pools.setdefault(asset_2_id, {})[pool_address] = asset_1_id
+            new_pools.add(pool_address)
+        self.update_pools(pool_states)
+
+        # Only the new cycles which contain at least one of the new pools are added
+        for start_asset_id in self.start_asset_ids:
+            for cycle in self.find_cycles(start_asset_id):
+                if any(step[0] in new_pools for step in cycle):
+                    self.add_cycle(cycle)
+
+    def add_cycle(self, cycle):
+        cycle_index = len(self.cycles)
+        self.cycles.append(cycle)
+        for pool_address, _, _ in cycle:
+            self.pool_cycles.setdefault(pool_address, []).append(cycle_index)
+
+    def find_cycles(self, start_asset_id):
+        """ Yields the cycles which start and end with start_asset_id and don't visit an asset twice """
+        path = []
+        visited_assets = {start_asset_id}
+
+        def visit(asset_id):
+            for pool_address, other_asset_id in self.asset_pools.get(asset_id, {}).items():
+                if other_asset_id == start_asset_id:
+                    if len(path) >= 2:
+                        yield tuple(path) + ((pool_address, asset_id, other_asset_id),)
+                elif other_asset_id not in visited_assets and len(path) < self.max_cycle_length - 1:
+                    path.append((pool_address, asset_id, other_asset_id))
+                    visited_assets.add(other_asset_id)
+                    yield from visit(other_asset_id)
+                    visited_assets.remove(other_asset_id)
+                    path.pop()
+
+        yield from visit(start_asset_id)
+
+    def update_pools(self, pool_states):
+        for pool_address, pool_state in pool_states.items():
+            self.pool_states[pool_address] = pool_state
+            self.edge_weights[(pool_address, pool_state[b'asset_1_id'])] = get_edge_weight(pool_state, pool_state[b'asset_1_id'])
+            self.edge_weights[(pool_address, pool_state[b'asset_2_id'])] = get_edge_weight(pool_state, pool_state[b'asset_2_id'])
+            self.updated_pools.add(pool_address)
+
+    def detect(self):
+        """ Re-evaluates the cycles of the updated pools and returns all of the opportunities ordered by profit """
+        cycle_indexes = set()
+        for pool_address in self.updated_pools:
+            cycle_indexes.update(self.pool_cycles.get(pool_address, ()))
+        self.updated_pools = set()
+
+        edge_weights = self.edge_weights
+        for cycle_index in cycle_indexes:
+            cycle = self.cycles[cycle_index]
+            self.opportunities.pop(cycle_index, None)
+            if sum(edge_weights[(pool_address, input_asset_id)] for pool_address, input_asset_id, _ in cycle) <= 0:
+                continue
+            input_amount, profit = get_optimal_input_amount(self.pool_states, cycle)
+            if cycle[0][1] == ALGO_ASSET_ID:
+                profit -= self.get_cycle_fee(cycle)
+            if profit >= self.min_profit:
+                self.opportunities[cycle_index] = dict(cycle=cycle, input_amount=input_amount, profit=profit)
+        return sorted(self.opportunities.values(), key=lambda opportunity: opportunity['profit'], reverse=True)
+
+    def get_cycle_fee(self, cycle):
+        if len(cycle) not in self.cycle_fees:
+            self.cycle_fees[len(cycle)] = get_cycle_fee(self.pool_states, cycle)
+        return self.cycle_fees[len(cycle)]
+
+    def get_swaps(self, opportunity):
+        """ Returns the (pool address, input asset id, input amount, output asset id, output amount) of the chained swaps """
+        swaps = []
+        amount = opportunity['input_amount']
+        for pool_address, input_asset_id, output_asset_id in opportunity['cycle']:
+            # The swap model is exact, it also checks the invariant
+            pool_state = self.pool_states[pool_address]
+            _, result = amm.swap(pool_state, input_asset_id, amount, "fixed-input", 0, timestamp=amm.get_price_oracle_timestamp(pool_state))
+            swaps.append((pool_address, input_asset_id, amount, output_asset_id, result['output_amount']))
+            amount = result['output_amount']
+        return swaps
+
+
+def get_cycle_transactions(sp, sender, swaps, pool_states):
+    """ Returns the group of the chained fixed-input swaps, min outputs are the exact outputs and the fees are the minimum fees """
+    txn_group = []
+    for pool_address, input_asset_id, input_amount, output_asset_id, output_amount in swaps:
+        pool_state = pool_states[pool_address]
+        if input_asset_id == ALGO_ASSET_ID:
+            txn_group.append(transaction.PaymentTxn(sender=sender, sp=sp, receiver=pool_address, amt=input_amount))
+        else:
+            txn_group.append(transaction.AssetTransferTxn(sender=sender, sp=sp, receiver=pool_address, index=input_asset_id, amt=input_amount))
+        txn_group.append(
+            transaction.ApplicationNoOpTxn(
+                sender=sender,
+                sp=sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SWAP, "fixed-input", output_amount],
+                foreign_assets=[pool_state[b'asset_1_id'], pool_state[b'asset_2_id']],
+                accounts=[pool_address],
+            )
+        )
+    return set_min_fees(txn_group, pool_states)
+
+
+def generate_pools(rng, asset_count, pool_count):
+    """ Returns pool states with the reserves close to random asset prices, every asset has a pool with the first asset """
+    prices = [1.0] + [exp(rng.gauss(0, 2)) for _ in range(asset_count - 1)]
+    pairs = {(asset_id, ALGO_ASSET_ID) for asset_id in range(1, asset_count)}
+    while len(pairs) < pool_count:
+        pair = rng.sample(range(1, asset_count), 2)
+        pairs.add((max(pair), min(pair)))
+
+    pool_states = {}
+    for asset_1_id, asset_2_id in sorted(pairs):
+        value = rng.randint(10 ** 9, 10 ** 12)
+        asset_1_reserves = max(1000, int(value / prices[asset_1_id] * rng.uniform(0.998, 1.002)))
+        asset_2_reserves = max(1000, int(value / prices[asset_2_id] * rng.uniform(0.998, 1.002)))
+        pool = dict(
+            asset_1_reserves=asset_1_reserves,
+            asset_2_reserves=asset_2_reserves,
+            issued_pool_tokens=isqrt(asset_1_reserves * asset_2_reserves),
+            total_fee_share=TOTAL_FEE_SHARE,
+            protocol_fee_ratio=PROTOCOL_FEE_RATIO,
+            asset_1_protocol_fees=0,
+            asset_2_protocol_fees=0,
+        )
+        # The addresses are not the logicsig addresses, it is only a benchmark
+        pool_address = encoding.encode_address(hashlib.sha256(f"{asset_1_id}-{asset_2_id}".encode()).digest())
+        pool_states[pool_address] = get_pool_local_state(pool, asset_1_id, asset_2_id, 0)
+    return pool_states
+
+
+def run_benchmark(seed, asset_count, pool_count, block_count, updates_per_block):
+    rng = random.Random(seed)
+    pool_states = generate_pools(rng, asset_count, pool_count)
+    pool_addresses = list(pool_states)
+
+    detector = ArbitrageDetector([ALGO_ASSET_ID])
+    start = time.perf_counter()
+    detector.add_pools(pool_states)
+    initial_seconds = time.perf_counter() - start
+    detector.detect()
+
+    latencies = []
+    opportunity_counts = []
+    for _ in range(block_count):
+        updated_pool_states = {}
+        for pool_address in rng.sample(pool_addresses, updates_per_block):
+            pool_state = detector.pool_states[pool_address]
+            input_asset_id = rng.choice((pool_state[b'asset_1_id'], pool_state[b'asset_2_id']))
+            input_supply, _ = amm.get_swap_reserves(pool_state, input_asset_id)
+            try:
+                updated_pool_states[pool_address], _ = amm.swap(pool_state, input_asset_id, rng.randint(1, input_supply // 1000), "fixed-input", 0)
+            except amm.LogicError:
+                continue
+
+        start = time.perf_counter()
+        detector.update_pools(updated_pool_states)
+        opportunities = detector.detect()
+        latencies.append(time.perf_counter() - start)
+        opportunity_counts.append(len(opportunities))
+
+    return dict(
+        pools=len(pool_states),
+        cycles=len(detector.cycles),
+        initial_seconds=initial_seconds,
+        block_latency_seconds=get_percentiles(latencies),
+        opportunities=get_percentiles(opportunity_counts),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--assets", type=int, default=2_000)
+    parser.add_argument("--pools", type=int, default=20_000)
+    parser.add_argument("--blocks", type=int, default=100)
+    parser.add_argument("--updates", type=int, default=50, help="Updated pools per block")
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.seed, args.assets, args.pools, args.blocks, args.updates), indent=2))
+
+
+if __name__ == "__main__":
+    main()
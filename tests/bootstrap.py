@@ -0,0 +1,159 @@
+"""
+Bulk pool bootstrap planner.
+
+The asset pairs are normalized to asset_1_id > asset_2_id, the pool address is derived from the logicsig and the pool is
+funded with the exact minimum balance. Every pair is one group of [funding payment, bootstrap opt-in with rekey] so the
+funding is not lost if the bootstrap fails. The groups are built and signed in worker processes.
+
+    python -m tests.bootstrap --pairs 500 --workers 1 4
+
+benchmarks the planning time.
+"""
+import argparse
+import base64
+import json
+import multiprocessing
+import time
+
+from algojig import get_suggested_params
+from algosdk import account
+from algosdk.encoding import msgpack_encode
+from algosdk.future import transaction
+from nacl.signing import SigningKey
+
+from . import signing
+from .constants import *
+from .fees import get_min_fee
+from .utils import get_pool_logicsig_bytecode
+
+# Transferred from the pool to the application account to cover the pool token creation
+APPLICATION_FUNDING_AMOUNT = 100_000
+
+
+def normalize_asset_pair(asset_a_id, asset_b_id):
+    """ Returns (asset_1_id, asset_2_id), bootstrap requires asset_1_id > asset_2_id """
+    if asset_a_id == asset_b_id:
+        raise ValueError(f"The assets of a pool must be different: {asset_a_id}")
+    return max(asset_a_id, asset_b_id), min(asset_a_id, asset_b_id)
+
+
+def normalize_asset_pairs(asset_pairs):
+    """ Returns the normalized pairs without duplicates in the first seen order """
+    return list(dict.fromkeys(normalize_asset_pair(asset_a_id, asset_b_id) for asset_a_id, asset_b_id in asset_pairs))
+
+
+def get_pool_funding_amount(asset_2_id, bootstrap_fee):
+    """ The minimum balance of the pool after bootstrap + the payment to the application account + the fee of bootstrap """
+    minimum_balance = MIN_POOL_BALANCE_ASA_ASA_PAIR if asset_2_id else MIN_POOL_BALANCE_ASA_ALGO_PAIR
+    return minimum_balance + APPLICATION_FUNDING_AMOUNT + bootstrap_fee
+
+
+def get_bootstrap_transactions(sp, funder, asset_1_id, asset_2_id):
+    """ Returns (lsig, [funding payment, bootstrap]) with the group id, the pool pays the fee of bootstrap """
+    lsig = get_pool_logicsig_bytecode(amm_pool_template, APPLICATION_ID, asset_1_id, asset_2_id)
+    pool_address = lsig.address()
+    bootstrap_txn = transaction.ApplicationOptInTxn(
+        sender=pool_address,
+        sp=sp,
+        index=APPLICATION_ID,
+        app_args=[METHOD_BOOTSTRAP],
+        foreign_assets=[asset_1_id, asset_2_id],
+        rekey_to=APPLICATION_ADDRESS,
+    )
+    bootstrap_txn.fee = get_min_fee([bootstrap_txn], 0)
+    funding_txn = transaction.PaymentTxn(
+        sender=funder,
+        sp=sp,
+        receiver=pool_address,
+        amt=get_pool_funding_amount(asset_2_id, bootstrap_txn.fee),
+    )
+    funding_txn.fee = MIN_TXN_FEE
+    return lsig, transaction.assign_group_id([funding_txn, bootstrap_txn])
+
+
+def plan_bootstrap(signing_key, sp, funder, asset_1_id, asset_2_id):
+    """ Returns the plan of a normalized pair, stxns are the encoded signed transactions of the group """
+    lsig, txn_group = get_bootstrap_transactions(sp, funder, asset_1_id, asset_2_id)
+    funding_txn, bootstrap_txn = txn_group
+    return dict(
+        asset_1_id=asset_1_id,
+        asset_2_id=asset_2_id,
+        pool_address=bootstrap_txn.sender,
+        funding_amount=funding_txn.amt,
+        stxns=[
+            signing.sign_transaction(signing_key, funding_txn),
+            base64.b64decode(msgpack_encode(transaction.LogicSigTransaction(bootstrap_txn, lsig))),
+        ],
+    )
+
+
+def plan_chunk(args):
+    sp, funder, asset_pairs = args
+    return [plan_bootstrap(signing.worker_signing_key, sp, funder, asset_1_id, asset_2_id) for asset_1_id, asset_2_id in asset_pairs]
+
+
+class BootstrapPlanner:
+    """
+    Plans the bootstrap of many pools, the funding payments are signed by funder_sk.
+    The pool address derivation and the signing run in worker_count processes, 0 plans in the current process.
+
+        with BootstrapPlanner(funder_sk, worker_count=4) as planner:
+            plans = planner.plan(sp, [(asset_a_id, asset_b_id), ...])
+    """
+
+    def __init__(self, funder_sk, worker_count=4, chunk_size=32):
+        self.funder = account.address_from_private_key(funder_sk)
+        self.signing_key = SigningKey(base64.b64decode(funder_sk)[:32])
+        self.worker_count = worker_count
+        self.chunk_size = chunk_size
+        self.pool = None
+        if worker_count:
+            self.pool = multiprocessing.Pool(worker_count, initializer=signing.load_signing_key, initargs=(funder_sk,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+
+    def plan(self, sp, asset_pairs):
+        """ Returns the plans of the normalized pairs in order """
+        asset_pairs = normalize_asset_pairs(asset_pairs)
+        if self.pool is None:
+            return [plan_bootstrap(self.signing_key, sp, self.funder, asset_1_id, asset_2_id) for asset_1_id, asset_2_id in asset_pairs]
+
+        chunks = [(sp, self.funder, asset_pairs[i:i + self.chunk_size]) for i in range(0, len(asset_pairs), self.chunk_size)]
+        plans = []
+        for chunk_plans in self.pool.imap(plan_chunk, chunks):
+            plans += chunk_plans
+        return plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 4])
+    args = parser.parse_args()
+
+    sp = get_suggested_params()
+    funder_sk, _ = account.generate_account()
+    asset_pairs = [(index + 1, index // 2 * 2) for index in range(args.pairs)]
+    report = {}
+    for worker_count in args.workers:
+        # The pool start up is not measured
+        with BootstrapPlanner(funder_sk, worker_count=worker_count) as planner:
+            planner.plan(sp, asset_pairs[:max(worker_count, 1)])
+            start = time.perf_counter()
+            planner.plan(sp, asset_pairs)
+            duration = time.perf_counter() - start
+        report[f"{worker_count}_workers"] = dict(seconds=duration, pairs_per_second=args.pairs / duration)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+OHLCV candles of the pools from the swap events.
+
+The trades are the swaps, the internal swap of the single asset add_liquidity and the single asset remove_liquidity
+(see events.py). The price is asset 2 per asset 1 in base units. The price of a swap is its amounts, the input amount
+includes the fee and excludes the change. The internal swap of add_liquidity has no output log, its price is the price
+of the pool after the addition and its output volume is the swap amount at that price.
+
+A trade updates the open candle of every resolution in O(1). A candle is finished when a trade of the pool falls into
+a later period, the finished candles are passed to the sink. CandleStore is a sink which appends the candles to a file
+per pool and resolution, a candle is a fixed size record of CANDLE_STRUCT.
+
+    store = CandleStore("candles")
+    aggregator = CandleAggregator(store.write)
+    for event in events:
+        aggregator.add_event(event)
+    store.flush()
+
+    python -m tests.candles --pools 1000 --events 200000 --workers 0 4
+
+benchmarks the aggregation and the backfill of the event stream partitioned by pool.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import struct
+import tempfile
+import time
+
+from .constants import *
+from .events import get_partition, get_random_events
+from .pool_table import get_random_pool_states
+
+RESOLUTIONS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+# start, open, high, low, close, asset_1_volume, asset_2_volume, trade count
+CANDLE_STRUCT = struct.Struct("<QddddQQI")
+START, OPEN, HIGH, LOW, CLOSE, ASSET_1_VOLUME, ASSET_2_VOLUME, TRADES = range(8)
+
+
+def get_trade(event):
+    """ Returns (price, asset_1_volume, asset_2_volume) of the event or None if it is not a trade """
+    method, logs = event['method'], event['logs']
+    if method == METHOD_ADD_LIQUIDITY:
+        if not logs.get('swap_amount') or not event['asset_1_reserves'] or event['asset_2_reserves'] is None:
+            return None
+        price = event['asset_2_reserves'] / event['asset_1_reserves']
+        # asset_1_id > asset_2_id
+        if logs['input_asset_id'] > logs['output_asset_id']:
+            return price, logs['swap_amount'], round(logs['swap_amount'] * price)
+        return price, round(logs['swap_amount'] / price) if price else 0, logs['swap_amount']
+    if method in (METHOD_SWAP, METHOD_REMOVE_LIQUIDITY) and 'output_amount' in logs:
+        input_amount = logs['input_amount'] - logs.get('change', 0)
+        if logs['input_asset_id'] > logs['output_asset_id']:
+            asset_1_volume, asset_2_volume = input_amount, logs['output_amount']
+        else:
+            asset_1_volume, asset_2_volume = logs['output_amount'], input_amount
+        if not asset_1_volume:
+            return None
+        return asset_2_volume / asset_1_volume, asset_1_volume, asset_2_volume
+    return None
+
+
+class CandleAggregator:
+
+    def __init__(self, sink, resolutions=RESOLUTIONS):
+        """ sink(pool_address, resolution, candle) is called with the finished candles, a candle is a list in CANDLE_STRUCT order """
+        self.sink = sink
+        self.resolutions = list(resolutions.items())
+        # pool_address: [open candle or None of each resolution]
+        self.open_candles = {}
+
+    def add_trade(self, pool_address, timestamp, price, asset_1_volume, asset_2_volume):
+        candles = self.open_candles.get(pool_address)
+        if candles is None:
+            candles = self.open_candles[pool_address] = [None] * len(self.resolutions)
+        for index, (resolution, seconds) in enumerate(self.resolutions):
+            start = timestamp - timestamp % seconds
+            candle = candles[index]
+            if candle is not None and candle[START] == start:
+                if price > candle[HIGH]:
+                    candle[HIGH] = price
+                elif price < candle[LOW]:
+                    candle[LOW] = price
+                candle[CLOSE] = price
+                candle[ASSET_1_VOLUME] += asset_1_volume
+                candle[ASSET_2_VOLUME] += asset_2_volume
+                candle[TRADES] += 1
+                continue
+            if candle is not None:
+                if start < candle[START]:
+                    raise ValueError(f"The trades of {pool_address} are not in timestamp order")
+                self.sink(pool_address, resolution, candle)
+            candles[index] = [start, price, price, price, price, asset_1_volume, asset_2_volume, 1]
+
+    def add_event(self, event):
+        """ Returns True if the event is a trade """
+        trade = get_trade(event)
+        if trade is not None:
+            self.add_trade(event['pool_address'], event['timestamp'], *trade)
+        return trade is not None
+
+    def flush(self):
+        """ Passes the open candles to the sink, e.g. at the end of a backfill """
+        for pool_address, candles in self.open_candles.items():
+            for (resolution, _), candle in zip(self.resolutions, candles):
+                if candle is not None:
+                    self.sink(pool_address, resolution, candle)
+        self.open_candles = {}
+
+
+class CandleStore:
+    """ The candles of a pool and resolution are appended to {directory}/{pool_address}/{resolution}.bin """
+
+    def __init__(self, directory):
+        self.directory = directory
+        # (pool_address, resolution): packed candles which are not written yet
+        self.buffers = {}
+
+    def get_path(self, pool_address, resolution):
+        return os.path.join(self.directory, pool_address, f"{resolution}.bin")
+
+    def write(self, pool_address, resolution, candle):
+        key = (pool_address, resolution)
+        if key not in self.buffers:
+            self.buffers[key] = bytearray()
+        self.buffers[key] += CANDLE_STRUCT.pack(*candle)
+
+    def flush(self):
+        for (pool_address, resolution), buffer in self.buffers.items():
+            path = self.get_path(pool_address, resolution)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "ab") as f:
+                f.write(buffer)
+        self.buffers = {}
+
+    def read(self, pool_address, resolution):
+        """ Returns the written candles as tuples in CANDLE_STRUCT order """
+        path = self.get_path(pool_address, resolution)
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            return list(CANDLE_STRUCT.iter_unpack(f.read()))
+
+
+def aggregate_trades(args):
+    """ Aggregates the trades of a partition of the pools, returns the number of the written candles """
+    directory, trades = args
+    store = CandleStore(directory)
+    candle_count = 0
+
+    def sink(pool_address, resolution, candle):
+        nonlocal candle_count
+        candle_count += 1
+        store.write(pool_address, resolution, candle)
+
+    aggregator = CandleAggregator(sink)
+    for trade in trades:
+        aggregator.add_trade(*trade)
+    aggregator.flush()
+    store.flush()
+    return candle_count
+
+
+def backfill(events, directory, worker_count=4):
+    """
+    Writes the candles of the historical events in timestamp order to an empty directory, the open candles at the end
+    are written too.
+    The pools are partitioned to the worker processes, worker_count=0 aggregates in the current process.
+    """
+    partitions = [[] for _ in range(max(worker_count, 1))]
+    for event in events:
+        trade = get_trade(event)
+        if trade is not None:
+            pool_address = event['pool_address']
+            partitions[get_partition(pool_address, len(partitions))].append((pool_address, event['timestamp'], *trade))
+    if not worker_count:
+        return aggregate_trades((directory, partitions[0]))
+    with multiprocessing.Pool(worker_count) as pool:
+        return sum(pool.map(aggregate_trades, [(directory, trades) for trades in partitions]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pools", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 4])
+    args = parser.parse_args()
+
+    events = get_random_events(get_random_pool_states(args.pools, args.seed), args.events, seed=args.seed)
+    report = dict(pools=args.pools, events=len(events), candle_bytes=CANDLE_STRUCT.size)
+
+    candle_count = 0
+
+    def count(pool_address, resolution, candle):
+        nonlocal candle_count
+        candle_count += 1
+
+    aggregator = CandleAggregator(count)
+    start = time.perf_counter()
+    for event in events:
+        aggregator.add_event(event)
+    report['events_per_second'] = len(events) / (time.perf_counter() - start)
+
+    for worker_count in args.workers:
+        directory = tempfile.mkdtemp(prefix="candles_")
+        try:
+            start = time.perf_counter()
+            candle_count = backfill(events, directory, worker_count)
+            report[f"backfill_{worker_count}_workers"] = dict(seconds=time.perf_counter() - start, candles=candle_count)
+        finally:
+            shutil.rmtree(directory)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
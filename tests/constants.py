@@ -21,6 +21,8 @@ METHOD_SET_FEE_COLLECTOR = "set_fee_collector"
 METHOD_SET_FEE_SETTER = "set_fee_setter"
 METHOD_SET_FEE_MANAGER = "set_fee_manager"
 
+MIN_TXN_FEE = 1000
+
 TOTAL_FEE_SHARE = 30
 PROTOCOL_FEE_RATIO = 6
 
@@ -8,7 +8,184 @@ from .constants import *
 from .utils import get_pool_logicsig_bytecode
 
 
-class BaseTestCase(unittest.TestCase):
+class TransactionBuilderMixin:
+    """
+    The group builders which are used outside of the test cases as well (see LoadGenerator), they use the sp,
+    user_addr, pool_address, asset_1_id, asset_2_id and pool_token_asset_id attributes.
+    """
+
+    def get_add_liquidity_transactions(self, asset_1_amount, asset_2_amount, min_output=0, app_call_fee=None):
+        txn_group = []
+        if asset_1_amount is not None and asset_2_amount is not None:
+            mode = 'flexible'
+        else:
+            mode = 'single'
+        if asset_1_amount is not None:
+            txn_group.append(
+                transaction.AssetTransferTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    receiver=self.pool_address,
+                    index=self.asset_1_id,
+                    amt=asset_1_amount,
+                )
+            )
+        if asset_2_amount is not None:
+            txn_group.append(
+                transaction.AssetTransferTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    receiver=self.pool_address,
+                    index=self.asset_2_id,
+                    amt=asset_2_amount,
+                ) if self.asset_2_id else transaction.PaymentTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    receiver=self.pool_address,
+                    amt=asset_2_amount,
+                )
+            )
+        txn_group.append(
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_ADD_LIQUIDITY, mode, min_output],
+                foreign_assets=[self.pool_token_asset_id],
+                accounts=[self.pool_address],
+            )
+        )
+        txn_group[-1].fee = app_call_fee or (self.sp.fee * 3)
+        return txn_group
+
+    def get_remove_liquidity_transactions(self, liquidity_asset_amount, min_output_1=0, min_output_2=0, app_call_fee=None):
+        txn_group = [
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.pool_token_asset_id,
+                amt=liquidity_asset_amount,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_REMOVE_LIQUIDITY, min_output_1, min_output_2],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[1].fee = app_call_fee or self.sp.fee
+        return txn_group
+
+    def get_remove_liquidity_single_transactions(self, liquidity_asset_amount, asset_id, min_output=0, app_call_fee=None):
+        min_output_1 = min_output if asset_id == self.asset_1_id else 0
+        min_output_2 = min_output if asset_id == self.asset_1_id else 0
+        txn_group = [
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.pool_token_asset_id,
+                amt=liquidity_asset_amount,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_REMOVE_LIQUIDITY, min_output_1, min_output_2],
+                foreign_assets=[asset_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[1].fee = app_call_fee or self.sp.fee
+        return txn_group
+
+    def get_swap_transactions(self, input_asset_id, input_amount, mode="fixed-input", min_output=0, app_call_fee=None):
+        txn_group = [
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=input_asset_id,
+                amt=input_amount,
+            ) if input_asset_id else transaction.PaymentTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                amt=input_amount,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SWAP, mode, min_output],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[1].fee = app_call_fee or (self.sp.fee * 2)
+        return txn_group
+
+    def get_flash_loan_transactions(self, asset_1_amount, asset_2_amount, asset_1_repayment_amount=0, asset_2_repayment_amount=0, transactions=None, app_call_fee=None):
+        repayment_txns = []
+        if asset_1_amount:
+            repayment_txns.append(
+                transaction.AssetTransferTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    receiver=self.pool_address,
+                    index=self.asset_1_id,
+                    amt=asset_1_repayment_amount,
+                )
+            )
+        if asset_2_amount:
+            repayment_txns.append(
+                transaction.AssetTransferTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    receiver=self.pool_address,
+                    index=self.asset_2_id,
+                    amt=asset_2_repayment_amount,
+                ) if self.asset_2_id else transaction.PaymentTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    receiver=self.pool_address,
+                    amt=asset_2_repayment_amount,
+                )
+            )
+
+        transactions = list(transactions or [])
+        index_diff = len(transactions) + len(repayment_txns) + 1
+        txn_group = [
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_FLASH_LOAN, index_diff, asset_1_amount, asset_2_amount],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            ),
+            *transactions,
+            *repayment_txns,
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_VERIFY_FLASH_LOAN, index_diff],
+                accounts=[self.pool_address],
+            ),
+        ]
+        txn_group[0].fee = app_call_fee or (self.sp.fee * 3)
+        return txn_group
+
+    @classmethod
+    def sign_txns(cls, txns, secret_key):
+        return [txn.sign(secret_key) for txn in txns]
+
+
+class BaseTestCase(TransactionBuilderMixin, unittest.TestCase):
     maxDiff = None
 
     def create_amm_app(self):
@@ -98,6 +275,9 @@ class BaseTestCase(unittest.TestCase):
         self.assertEqual(self.ledger.get_account_balance(pool_address)[0], minimum_balance)
         return pool_address, pool_token_asset_id
 
+    def get_pool_state(self, pool_address=None):
+        return self.ledger.accounts[pool_address or self.pool_address]['local_states'][APPLICATION_ID]
+
     def set_initial_pool_liquidity(self, pool_address, asset_1_id, asset_2_id, pool_token_asset_id, asset_1_reserves, asset_2_reserves, liquidity_provider_address=None):
         issued_pool_token_amount = int(Decimal.sqrt(Decimal(asset_1_reserves) * Decimal(asset_2_reserves)))
         pool_token_out_amount = issued_pool_token_amount - LOCKED_POOL_TOKENS
@@ -168,94 +348,6 @@ class BaseTestCase(unittest.TestCase):
         txn_group[-1].fee = app_call_fee or self.sp.fee
         return txn_group
 
-    def get_add_liquidity_transactions(self, asset_1_amount, asset_2_amount, min_output=0, app_call_fee=None):
-        txn_group = []
-        if asset_1_amount is not None and asset_2_amount is not None:
-            mode = 'flexible'
-        else:
-            mode = 'single'
-        if asset_1_amount is not None:
-            txn_group.append(
-                transaction.AssetTransferTxn(
-                    sender=self.user_addr,
-                    sp=self.sp,
-                    receiver=self.pool_address,
-                    index=self.asset_1_id,
-                    amt=asset_1_amount,
-                )
-            )
-        if asset_2_amount is not None:
-            txn_group.append(
-                transaction.AssetTransferTxn(
-                    sender=self.user_addr,
-                    sp=self.sp,
-                    receiver=self.pool_address,
-                    index=self.asset_2_id,
-                    amt=asset_2_amount,
-                ) if self.asset_2_id else transaction.PaymentTxn(
-                    sender=self.user_addr,
-                    sp=self.sp,
-                    receiver=self.pool_address,
-                    amt=asset_2_amount,
-                )
-            )
-        txn_group.append(
-            transaction.ApplicationNoOpTxn(
-                sender=self.user_addr,
-                sp=self.sp,
-                index=APPLICATION_ID,
-                app_args=[METHOD_ADD_LIQUIDITY, mode, min_output],
-                foreign_assets=[self.pool_token_asset_id],
-                accounts=[self.pool_address],
-            )
-        )
-        txn_group[-1].fee = app_call_fee or (self.sp.fee * 3)
-        return txn_group
-
-    def get_remove_liquidity_transactions(self, liquidity_asset_amount, min_output_1=0, min_output_2=0, app_call_fee=None):
-        txn_group = [
-            transaction.AssetTransferTxn(
-                sender=self.user_addr,
-                sp=self.sp,
-                receiver=self.pool_address,
-                index=self.pool_token_asset_id,
-                amt=liquidity_asset_amount,
-            ),
-            transaction.ApplicationNoOpTxn(
-                sender=self.user_addr,
-                sp=self.sp,
-                index=APPLICATION_ID,
-                app_args=[METHOD_REMOVE_LIQUIDITY, min_output_1, min_output_2],
-                foreign_assets=[self.asset_1_id, self.asset_2_id],
-                accounts=[self.pool_address],
-            )
-        ]
-        txn_group[1].fee = app_call_fee or self.sp.fee
-        return txn_group
-
-    def get_remove_liquidity_single_transactions(self, liquidity_asset_amount, asset_id, min_output=0, app_call_fee=None):
-        min_output_1 = min_output if asset_id == self.asset_1_id else 0
-        min_output_2 = min_output if asset_id == self.asset_1_id else 0
-        txn_group = [
-            transaction.AssetTransferTxn(
-                sender=self.user_addr,
-                sp=self.sp,
-                receiver=self.pool_address,
-                index=self.pool_token_asset_id,
-                amt=liquidity_asset_amount,
-            ),
-            transaction.ApplicationNoOpTxn(
-                sender=self.user_addr,
-                sp=self.sp,
-                index=APPLICATION_ID,
-                app_args=[METHOD_REMOVE_LIQUIDITY, min_output_1, min_output_2],
-                foreign_assets=[asset_id],
-                accounts=[self.pool_address],
-            )
-        ]
-        txn_group[1].fee = app_call_fee or self.sp.fee
-        return txn_group
-
     def get_claim_fee_transactions(self, sender, fee_collector, app_call_fee=None):
         txn_group = [
             transaction.ApplicationNoOpTxn(
@@ -283,7 +375,3 @@ class BaseTestCase(unittest.TestCase):
         ]
         txn_group[0].fee = app_call_fee or self.sp.fee
         return txn_group
-
-    @classmethod
-    def sign_txns(cls, txns, secret_key):
-        return [txn.sign(secret_key) for txn in txns]
@@ -0,0 +1,220 @@
+"""
+Depth ladder of the pools, the largest input amount of a fixed-input swap whose price impact is within each level.
+
+The price impact of a swap is 1 - (output_amount / input_amount) / (output_supply / input_supply), the fee is
+included. Without rounding the largest input amount within the impact level X is
+
+    input_supply * (g - 1 + X) / (g * (1 - X)), g = 1 - total_fee_share / 10000
+
+and 0 if X is not more than the fee. The coefficient only depends on total_fee_share and the level, the coefficients
+are computed once per fee and a rebuild is a pass over the reserve columns of the pool table (see pool_table.py)
+which multiplies them by the coefficients of the fee. Every estimate is then corrected with the integer rounding of
+the contract, the fee is calculated by calculate_fixed_input_fee_amounts and the output by calculate_fixed_input_swap.
+A swap which fails in the contract, e.g. the fee rounds to 0 or the amounts overflow uint64, is not within any level.
+The amount of a level is within the level and the next amount is not. The fee is rounded down, so near the level the
+impact is a sawtooth of the period 10000 / total_fee_share and a few larger amounts can be within the level again.
+
+The ladder is an array('Q') of len(table) * 2 directions * levels entries, a lookup is an index. A pool is
+recomputed only if its reserves or total_fee_share changed since the last computation.
+
+    ladder = DepthLadder(table)
+    ladder.apply_block(block)
+    max_input_amount = ladder.get_max_input_amount(pool_address, input_asset_id, 100)
+
+    python -m tests.depth_ladder --pools 20000
+
+benchmarks the rebuild, the updates and the lookups.
+"""
+import argparse
+import json
+import random
+import time
+from array import array
+
+from . import amm
+from .constants import *
+from .pool_cache import get_local_state_deltas
+from .pool_table import PoolTable, get_random_pool_states
+
+# The price impact levels in basis points, 0.1% to 10%
+IMPACT_LEVELS = (10, 25, 50, 100, 200, 500, 1000)
+
+
+def get_coefficients(total_fee_share, levels=IMPACT_LEVELS):
+    """ Returns the continuous max input amount per input supply of the levels """
+    g = 1 - total_fee_share / 10000
+    coefficients = []
+    for level in levels:
+        x = level / 10000
+        coefficients.append(max((g - 1 + x) / (g * (1 - x)), 0.0))
+    return coefficients
+
+
+def is_within_impact(input_supply, output_supply, input_amount, total_fee_share, level):
+    """ Returns True if the fixed-input swap succeeds in the contract and its price impact is at most level basis points """
+    if not input_amount:
+        return False
+    try:
+        total_fee_amount, _, _ = amm.calculate_fixed_input_fee_amounts(input_amount, total_fee_share, 1)
+        if not total_fee_amount:
+            return False
+        output_amount = amm.calculate_fixed_input_swap(input_supply, output_supply, input_amount - total_fee_amount)
+    except amm.LogicError:
+        return False
+    return output_amount > 0 and output_amount * input_supply * 10000 >= (10000 - level) * input_amount * output_supply
+
+
+def get_max_input_amount(input_supply, output_supply, total_fee_share, level, estimate):
+    """ Returns the input amount around the estimate which is within the level while the next amount is not, 0 if there is none """
+    def within(input_amount):
+        return is_within_impact(input_supply, output_supply, input_amount, total_fee_share, level)
+
+    # The estimate is off by the rounding, a few units for the usual reserves
+    if within(estimate):
+        low, step = estimate, 1
+        while within(low + step):
+            low += step
+            step *= 2
+        high = low + step
+    else:
+        high, step = estimate, 1
+        low = max(estimate - step, 0)
+        while low > 0 and not within(low):
+            high = low
+            step *= 2
+            low = max(estimate - step, 0)
+    # within(low) or low == 0 as the swaps of the smallest amounts fail, not within(high)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if within(middle):
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+class DepthLadder:
+
+    def __init__(self, table, levels=IMPACT_LEVELS):
+        self.table = table
+        self.levels = tuple(levels)
+        self.level_indexes = {level: index for index, level in enumerate(self.levels)}
+        # total_fee_share: coefficients
+        self.coefficients = {}
+        # row * 2 + direction: level entries, direction 0 is the asset 1 input
+        self.amounts = array('Q')
+        # The reserves and the fee of the rows when they were computed
+        self.asset_1_reserves = array('Q')
+        self.asset_2_reserves = array('Q')
+        self.total_fee_shares = array('Q')
+        self.rebuild()
+
+    def get_coefficients(self, total_fee_share):
+        coefficients = self.coefficients.get(total_fee_share)
+        if coefficients is None:
+            coefficients = self.coefficients[total_fee_share] = get_coefficients(total_fee_share, self.levels)
+        return coefficients
+
+    def get_row_amounts(self, asset_1_reserves, asset_2_reserves, total_fee_share):
+        """ Returns the entries of a pool, the levels of the asset 1 input then the levels of the asset 2 input """
+        amounts = []
+        coefficients = self.get_coefficients(total_fee_share)
+        for input_supply, output_supply in ((asset_1_reserves, asset_2_reserves), (asset_2_reserves, asset_1_reserves)):
+            for level, coefficient in zip(self.levels, coefficients):
+                amount = 0
+                if coefficient and input_supply and output_supply:
+                    amount = get_max_input_amount(input_supply, output_supply, total_fee_share, level, int(input_supply * coefficient))
+                amounts.append(amount)
+        return amounts
+
+    def rebuild(self):
+        """ Recomputes every pool of the table """
+        columns = self.table.columns
+        self.asset_1_reserves = array('Q', columns['asset_1_reserves'])
+        self.asset_2_reserves = array('Q', columns['asset_2_reserves'])
+        self.total_fee_shares = array('Q', columns['total_fee_share'])
+        self.amounts = array('Q')
+        for row_values in zip(self.asset_1_reserves, self.asset_2_reserves, self.total_fee_shares):
+            self.amounts.extend(self.get_row_amounts(*row_values))
+
+    def update(self, row):
+        """ Recomputes the pool if its reserves or total_fee_share changed, returns True if it is recomputed """
+        if row >= len(self.asset_1_reserves):
+            # A pool which is added to the table after the build
+            for column in (self.asset_1_reserves, self.asset_2_reserves, self.total_fee_shares):
+                column.extend([0] * (row + 1 - len(column)))
+            self.amounts.extend([0] * ((row + 1) * 2 * len(self.levels) - len(self.amounts)))
+        elif (
+            self.asset_1_reserves[row] == self.table.columns['asset_1_reserves'][row]
+            and self.asset_2_reserves[row] == self.table.columns['asset_2_reserves'][row]
+            and self.total_fee_shares[row] == self.table.columns['total_fee_share'][row]
+        ):
+            return False
+        self.asset_1_reserves[row] = self.table.columns['asset_1_reserves'][row]
+        self.asset_2_reserves[row] = self.table.columns['asset_2_reserves'][row]
+        self.total_fee_shares[row] = self.table.columns['total_fee_share'][row]
+        entry_count = 2 * len(self.levels)
+        self.amounts[row * entry_count:(row + 1) * entry_count] = array('Q', self.get_row_amounts(self.asset_1_reserves[row], self.asset_2_reserves[row], self.total_fee_shares[row]))
+        return True
+
+    def refresh(self):
+        """ Recomputes the changed pools of the table, returns the number of the recomputed pools """
+        return sum(self.update(row) for row in range(len(self.table)))
+
+    def apply_block(self, block, app_id=APPLICATION_ID):
+        """ Applies the local state deltas of the block to the table and recomputes the changed pools, returns the number of the recomputed pools """
+        rows = set()
+        for address, delta in get_local_state_deltas(block, app_id):
+            if self.table.apply_state_delta(address, delta):
+                rows.add(self.table.get_row(address))
+        return sum(self.update(row) for row in rows)
+
+    def get_max_input_amount(self, address, input_asset_id, level):
+        """ Returns the largest input amount of a swap within the impact level in basis points, level is one of the levels """
+        row = self.table.rows[address]
+        direction = 0 if input_asset_id == self.table.columns['asset_1_id'][row] else 1
+        return self.amounts[(row * 2 + direction) * len(self.levels) + self.level_indexes[level]]
+
+    def get_ladder(self, address, input_asset_id):
+        """ Returns {level: max input amount} of the pool and direction """
+        return {level: self.get_max_input_amount(address, input_asset_id, level) for level in self.levels}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pools", type=int, default=20_000)
+    parser.add_argument("--updates", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    table = PoolTable.from_pool_states(get_random_pool_states(args.pools, args.seed))
+    report = dict(pools=args.pools, levels=IMPACT_LEVELS)
+
+    start = time.perf_counter()
+    ladder = DepthLadder(table)
+    report['rebuild_seconds'] = time.perf_counter() - start
+
+    rows = [rng.randrange(len(table)) for _ in range(args.updates)]
+    start = time.perf_counter()
+    recomputed = 0
+    for row in rows:
+        table.columns['asset_1_reserves'][row] += rng.randint(-1000, 1000)
+        recomputed += ladder.update(row)
+    report['update_microseconds'] = (time.perf_counter() - start) / len(rows) * 1e6
+    report['recomputed'] = recomputed
+
+    start = time.perf_counter()
+    report['unchanged_refresh_recomputed'] = ladder.refresh()
+    report['unchanged_refresh_seconds'] = time.perf_counter() - start
+
+    lookups = [(table.addresses[row], table.columns['asset_1_id'][row], rng.choice(IMPACT_LEVELS)) for row in rows]
+    start = time.perf_counter()
+    for lookup in lookups:
+        ladder.get_max_input_amount(*lookup)
+    report['lookup_microseconds'] = (time.perf_counter() - start) / len(lookups) * 1e6
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+claim_extra donation scanner.
+
+The claimable amounts are computed with the arithmetic of claim_extra from balance snapshots of the pools and of
+APPLICATION_ADDRESS. The balances are {asset_id: amount}, the ALGO amount is balance - min balance like get_balance.
+
+    python -m tests.donations --pools 20000
+
+benchmarks the scan time.
+"""
+import argparse
+import json
+import random
+import time
+
+from algosdk.future import transaction
+
+from .constants import *
+from .fees import set_min_fees
+
+MAX_GROUP_SIZE = 16
+# 100000 microAlgo is reserved to cover the temporary extra min balance for increase_cost_budget
+APPLICATION_ALGO_RESERVE = 100_000
+
+
+def get_account_balances(account_info):
+    """ Returns the balances of an algod account information response """
+    balances = {ALGO_ASSET_ID: account_info['amount'] - account_info['min-balance']}
+    for asset in account_info.get('assets', ()):
+        balances[asset['asset-id']] = asset['amount']
+    return balances
+
+
+def get_claimable_amount(pool_state, balances, asset_id):
+    """
+    The same as asset_amount in claim_extra, pool_state is None for APPLICATION_ADDRESS.
+    Returns 0 if claim_extra would fail, the contract panics if the subtraction underflows.
+    """
+    balance = balances.get(asset_id, 0)
+    if pool_state is None:
+        amount = balance if asset_id else balance - APPLICATION_ALGO_RESERVE
+    elif asset_id == pool_state[b'asset_1_id']:
+        amount = balance - (pool_state[b'asset_1_reserves'] + pool_state.get(b'asset_1_protocol_fees', 0))
+    elif asset_id == pool_state[b'asset_2_id']:
+        amount = balance - (pool_state[b'asset_2_reserves'] + pool_state.get(b'asset_2_protocol_fees', 0))
+    elif asset_id == pool_state[b'pool_token_asset_id']:
+        amount = (balance - LOCKED_POOL_TOKENS) - (POOL_TOKEN_TOTAL_SUPPLY - pool_state[b'issued_pool_tokens'])
+    else:
+        amount = balance
+    return amount if amount > 0 else 0
+
+
+def scan_donations(pool_states, pool_balances, application_balances=None):
+    """
+    pool_balances maps the pool addresses to their balances.
+    Returns [(address, asset_id, amount)] of the claimable amounts.
+    """
+    claims = []
+    for pool_address, balances in pool_balances.items():
+        pool_state = pool_states[pool_address]
+        for asset_id in balances:
+            amount = get_claimable_amount(pool_state, balances, asset_id)
+            if amount:
+                claims.append((pool_address, asset_id, amount))
+    for asset_id in (application_balances or ()):
+        amount = get_claimable_amount(None, application_balances, asset_id)
+        if amount:
+            claims.append((APPLICATION_ADDRESS, asset_id, amount))
+    return claims
+
+
+def get_claim_extra_transactions(sp, sender, claims, fee_collector, fee_collector_asset_ids=None):
+    """
+    Returns the claim_extra groups of the claims, a group has up to MAX_GROUP_SIZE app calls.
+    The assets the fee collector is not opted in to are skipped if fee_collector_asset_ids is given.
+    """
+    txns = []
+    for address, asset_id, _ in claims:
+        if asset_id and fee_collector_asset_ids is not None and asset_id not in fee_collector_asset_ids:
+            continue
+        txns.append(
+            transaction.ApplicationNoOpTxn(
+                sender=sender,
+                sp=sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_CLAIM_EXTRA],
+                foreign_assets=[asset_id],
+                accounts=[address, fee_collector],
+            )
+        )
+    return [set_min_fees(txns[index:index + MAX_GROUP_SIZE]) for index in range(0, len(txns), MAX_GROUP_SIZE)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pools", type=int, default=20_000)
+    parser.add_argument("--donation-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool_states, pool_balances = {}, {}
+    for index in range(args.pools):
+        asset_2_id = 3 * index
+        asset_1_id, pool_token_asset_id = asset_2_id + 1, asset_2_id + 2
+        pool_state = {
+            b'asset_1_id': asset_1_id,
+            b'asset_2_id': asset_2_id,
+            b'pool_token_asset_id': pool_token_asset_id,
+            b'asset_1_reserves': rng.randint(10 ** 6, 10 ** 13),
+            b'asset_2_reserves': rng.randint(10 ** 6, 10 ** 13),
+            b'asset_1_protocol_fees': rng.randint(0, 10 ** 6),
+            b'asset_2_protocol_fees': rng.randint(0, 10 ** 6),
+            b'issued_pool_tokens': rng.randint(10 ** 6, 10 ** 13),
+        }
+        balances = {
+            asset_1_id: pool_state[b'asset_1_reserves'] + pool_state[b'asset_1_protocol_fees'],
+            asset_2_id: pool_state[b'asset_2_reserves'] + pool_state[b'asset_2_protocol_fees'],
+            pool_token_asset_id: POOL_TOKEN_TOTAL_SUPPLY - pool_state[b'issued_pool_tokens'] + LOCKED_POOL_TOKENS,
+        }
+        if asset_2_id != ALGO_ASSET_ID:
+            balances[ALGO_ASSET_ID] = 0
+        for asset_id in list(balances):
+            if rng.random() < args.donation_rate:
+                balances[asset_id] += rng.randint(1, 10 ** 6)
+        pool_states[index] = pool_state
+        pool_balances[index] = balances
+
+    start = time.perf_counter()
+    claims = scan_donations(pool_states, pool_balances, {ALGO_ASSET_ID: 150_000})
+    duration = time.perf_counter() - start
+    print(json.dumps(dict(pools=args.pools, claims=len(claims), scan_seconds=duration), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Pool events decoded from the logs of the app calls.
+
+An event is a dict of the app call:
+
+    dict(round, timestamp, pool_address, method, logs={name: int}, asset_1_reserves, asset_2_reserves)
+
+The logs are the "name %i" logs of the contract, EVENT_LOG_NAMES lists them by method. The reserves are the values in
+the local state delta of the pool after the call, None if the call did not change them.
+
+    for event in get_pool_events(block):
+        ...
+
+get_random_events generates a synthetic event stream with the pool model (tests/amm.py) for the benchmarks.
+"""
+import random
+import zlib
+
+from algosdk.encoding import encode_address
+
+from . import amm
+from .constants import *
+from .pool_cache import get_app_calls
+
+# The logs of the events, the flash loan logs of an asset are only present if the asset is borrowed
+EVENT_LOG_NAMES = {
+    METHOD_SWAP: ("input_asset_id", "input_amount", "swap_amount", "change", "output_asset_id", "output_amount", "poolers_fee_amount", "protocol_fee_amount", "total_fee_amount"),
+    # The internal swap of the single asset mode
+    METHOD_ADD_LIQUIDITY: ("input_asset_id", "output_asset_id", "swap_amount", "poolers_fee_amount", "protocol_fee_amount", "total_fee_amount"),
+    # The internal swap of the single asset mode
+    METHOD_REMOVE_LIQUIDITY: ("input_asset_id", "input_amount", "swap_amount", "output_asset_id", "output_amount", "poolers_fee_amount", "protocol_fee_amount", "total_fee_amount"),
+    METHOD_VERIFY_FLASH_LOAN: tuple(f"asset_{i}_{name}" for i in (1, 2) for name in ("output_amount", "input_amount", "donation_amount", "poolers_fee_amount", "protocol_fee_amount", "total_fee_amount")),
+    METHOD_VERIFY_FLASH_SWAP: tuple(f"asset_{i}_{name}" for i in (1, 2) for name in ("output_amount", "input_amount", "poolers_fee_amount", "protocol_fee_amount", "total_fee_amount")),
+}
+
+# The weights of the methods of get_random_events
+RANDOM_EVENT_WEIGHTS = {
+    METHOD_SWAP: 85,
+    METHOD_ADD_LIQUIDITY: 5,
+    METHOD_REMOVE_LIQUIDITY: 5,
+    METHOD_VERIFY_FLASH_LOAN: 3,
+    METHOD_VERIFY_FLASH_SWAP: 2,
+}
+
+
+def decode_logs(logs):
+    """ Returns {name: int} of the "name %i" logs, the other logs are ignored """
+    values = {}
+    for log in logs:
+        name, separator, value = log.partition(b" %i")
+        if separator and len(value) == 8:
+            values[name.decode()] = int.from_bytes(value, 'big')
+    return values
+
+
+def get_partition(pool_address, partition_count):
+    """ Returns the partition of the pool, the same in every process """
+    return zlib.crc32(pool_address.encode()) % partition_count
+
+
+def get_pool_events(block, app_id=APPLICATION_ID):
+    """ Yields the events of the app calls with logs in the block in order, the inner app calls are included """
+    for txn, apply_data in get_app_calls(block, app_id):
+        logs = decode_logs(apply_data.get(b'lg', []))
+        if not logs:
+            continue
+        # The pool is Txn.Accounts[1], the local state delta index 1
+        pool_delta = apply_data.get(b'ld', {}).get(1, {})
+        yield dict(
+            round=block.get(b'rnd', 0),
+            timestamp=block.get(b'ts', 0),
+            pool_address=encode_address(txn[b'apat'][0]),
+            method=txn[b'apaa'][0].decode(),
+            logs=logs,
+            asset_1_reserves=pool_delta.get(b'asset_1_reserves', {}).get(b'ui'),
+            asset_2_reserves=pool_delta.get(b'asset_2_reserves', {}).get(b'ui'),
+        )
+
+
+def get_random_operation(rng, pool_state, method, timestamp):
+    """ Returns (new pool state, result) of a random operation of the method, raises amm.LogicError if it fails """
+    asset_ids = (pool_state[b'asset_1_id'], pool_state[b'asset_2_id'])
+    reserves = (pool_state[b'asset_1_reserves'], pool_state[b'asset_2_reserves'])
+    i = rng.randrange(2)
+    amount = max(reserves[i] * rng.randint(1, 1000) // 100_000, 1)
+    if method == METHOD_SWAP:
+        return amm.swap(pool_state, asset_ids[i], amount, "fixed-input", 0, timestamp=timestamp)
+    if method == METHOD_ADD_LIQUIDITY:
+        amounts = (amount, None) if i == 0 else (None, amount)
+        return amm.add_liquidity(pool_state, *amounts, timestamp=timestamp)
+    if method == METHOD_REMOVE_LIQUIDITY:
+        pool_token_amount = max(pool_state[b'issued_pool_tokens'] * rng.randint(1, 100) // 100_000, 1)
+        return amm.remove_liquidity(pool_state, pool_token_amount, output_asset_id=asset_ids[i], timestamp=timestamp)
+    if method == METHOD_VERIFY_FLASH_LOAN:
+        amounts = [0, 0]
+        amounts[i] = amount
+        # The repayment is enough for a fee of 1%
+        return amm.flash_loan(pool_state, *amounts, *[amount * 101 // 100 + 1 for amount in amounts], timestamp=timestamp)
+    # A flash swap of asset i paid with the other asset at the price of the pool and 1% more
+    output_amounts = [0, 0]
+    input_amounts = [0, 0]
+    output_amounts[i] = amount
+    input_amounts[1 - i] = amount * reserves[1 - i] // reserves[i] * 102 // 100 + 1
+    return amm.flash_swap(pool_state, *output_amounts, *input_amounts, timestamp=timestamp)
+
+
+def get_random_events(pool_states, event_count, seed=0, start_timestamp=0, interval=10):
+    """
+    Returns event_count events of random operations of the pools in timestamp order, a block of events every interval
+    seconds. The pool_states are updated.
+    """
+    rng = random.Random(seed)
+    addresses = list(pool_states)
+    methods = list(RANDOM_EVENT_WEIGHTS)
+    weights = list(RANDOM_EVENT_WEIGHTS.values())
+    events = []
+    timestamp = start_timestamp
+    while len(events) < event_count:
+        if rng.random() < 0.1:
+            timestamp += interval
+        address = rng.choice(addresses)
+        method = rng.choices(methods, weights)[0]
+        try:
+            pool_state, result = get_random_operation(rng, pool_states[address], method, timestamp)
+        except amm.LogicError:
+            continue
+        pool_states[address] = pool_state
+        events.append(dict(
+            round=timestamp // interval,
+            timestamp=timestamp,
+            pool_address=address,
+            method=method,
+            logs={name: result[name] for name in EVENT_LOG_NAMES[method] if name in result},
+            asset_1_reserves=pool_state[b'asset_1_reserves'],
+            asset_2_reserves=pool_state[b'asset_2_reserves'],
+        ))
+    return events
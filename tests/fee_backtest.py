@@ -0,0 +1,211 @@
+"""
+Backtest of the fee settings of set_fee against the historical swap flow.
+
+The swaps of the events (see events.py) are replayed in order on the pool states before the history with the pool
+model (tests/amm.py) for every fee setting, so the fees are calculated by calculate_fixed_input_fee_amounts of the
+contract and the reserves follow the replayed swaps. A swap is replayed as a fixed-input swap of the amount which was
+spent, the input amount without the change. The other events are not replayed, their reserve changes are not known
+without the pool token amounts.
+
+The traders react to the fee by the elasticity model, elasticity_model(base_total_fee_share, total_fee_share) returns
+the multiplier of the input amounts. ConstantElasticity is (total_fee_share / base_total_fee_share) ** -elasticity.
+
+The values are in asset 2 of each pool at the price of the reserves before each swap. The report compares every
+setting with the replay of the current settings of the pools, the changes are the mean of the relative changes of
+the pools.
+
+    with FeeBacktester(pool_states, events, ConstantElasticity(0.5), worker_count=4) as backtester:
+        report = get_report(backtester.run(get_fee_grid()), backtester.run_baseline())
+
+    python -m tests.fee_backtest --pools 100 --events 5000 --workers 0 4
+
+benchmarks the sweep of the whole grid of set_fee.
+"""
+import argparse
+import json
+import multiprocessing
+import time
+
+from . import amm
+from .constants import *
+from .events import get_random_events
+from .pool_table import get_random_pool_states
+
+# The bounds of set_fee
+MIN_TOTAL_FEE_SHARE = 1
+MAX_TOTAL_FEE_SHARE = 100
+MIN_PROTOCOL_FEE_RATIO = 3
+MAX_PROTOCOL_FEE_RATIO = 10
+
+METRIC_KEYS = ("swaps", "failed_swaps", "volume_value", "poolers_fee_value", "protocol_fee_value")
+
+# The history of the worker process, see load_history
+worker_history = None
+
+
+class ConstantElasticity:
+
+    def __init__(self, elasticity=0.0):
+        """ elasticity=0 replays the historical amounts for every setting """
+        self.elasticity = elasticity
+
+    def __call__(self, base_total_fee_share, total_fee_share):
+        return (total_fee_share / base_total_fee_share) ** -self.elasticity
+
+
+def get_fee_grid(total_fee_shares=None, protocol_fee_ratios=None):
+    """ Returns the (total_fee_share, protocol_fee_ratio) settings, the whole grid of set_fee by default """
+    if total_fee_shares is None:
+        total_fee_shares = range(MIN_TOTAL_FEE_SHARE, MAX_TOTAL_FEE_SHARE + 1)
+    if protocol_fee_ratios is None:
+        protocol_fee_ratios = range(MIN_PROTOCOL_FEE_RATIO, MAX_PROTOCOL_FEE_RATIO + 1)
+    grid = [(total_fee_share, protocol_fee_ratio) for total_fee_share in total_fee_shares for protocol_fee_ratio in protocol_fee_ratios]
+    for total_fee_share, protocol_fee_ratio in grid:
+        if not MIN_TOTAL_FEE_SHARE <= total_fee_share <= MAX_TOTAL_FEE_SHARE or not MIN_PROTOCOL_FEE_RATIO <= protocol_fee_ratio <= MAX_PROTOCOL_FEE_RATIO:
+            raise ValueError(f"set_fee would fail with total_fee_share={total_fee_share} protocol_fee_ratio={protocol_fee_ratio}")
+    return grid
+
+
+def get_swap_flow(events):
+    """ Returns {pool_address: [(input_asset_id, spent input amount)]} of the swap events in order """
+    swap_flow = {}
+    for event in events:
+        if event['method'] != METHOD_SWAP:
+            continue
+        logs = event['logs']
+        swap_flow.setdefault(event['pool_address'], []).append((logs['input_asset_id'], logs['input_amount'] - logs.get('change', 0)))
+    return swap_flow
+
+
+def backtest_pool(pool_state, swaps, total_fee_share, protocol_fee_ratio, elasticity_model):
+    """ Returns the metrics of the replay of the swaps of the pool with the fee setting, see METRIC_KEYS """
+    multiplier = elasticity_model(pool_state[b'total_fee_share'], total_fee_share)
+    pool_state = {**pool_state, b'total_fee_share': total_fee_share, b'protocol_fee_ratio': protocol_fee_ratio}
+    metrics = dict.fromkeys(METRIC_KEYS, 0)
+    # The price oracle does not change the swaps
+    timestamp = amm.get_price_oracle_timestamp(pool_state)
+    for input_asset_id, input_amount in swaps:
+        input_amount = int(input_amount * multiplier)
+        # asset 2 per input asset
+        if input_asset_id == pool_state[b'asset_1_id']:
+            price = pool_state[b'asset_2_reserves'] / pool_state[b'asset_1_reserves']
+        else:
+            price = 1
+        try:
+            pool_state, result = amm.swap(pool_state, input_asset_id, input_amount, "fixed-input", 0, timestamp=timestamp)
+        except amm.LogicError:
+            # e.g. the fee or the output rounds to 0
+            metrics['failed_swaps'] += 1
+            continue
+        metrics['swaps'] += 1
+        metrics['volume_value'] += input_amount * price
+        metrics['poolers_fee_value'] += result['poolers_fee_amount'] * price
+        metrics['protocol_fee_value'] += result['protocol_fee_amount'] * price
+    return metrics
+
+
+def load_history(pool_states, swap_flow, elasticity_model):
+    global worker_history
+    worker_history = pool_states, swap_flow, elasticity_model
+
+
+def backtest_fee_setting(fee_setting):
+    """ Returns (fee_setting, {pool_address: metrics}) of the history of the worker process """
+    pool_states, swap_flow, elasticity_model = worker_history
+    return fee_setting, {
+        pool_address: backtest_pool(pool_states[pool_address], swaps, *fee_setting, elasticity_model)
+        for pool_address, swaps in swap_flow.items()
+    }
+
+
+class FeeBacktester:
+    """
+    Replays the swaps of the events on the pool states before the events.
+    The fee settings are replayed in worker_count processes, 0 replays in the current process.
+    """
+
+    def __init__(self, pool_states, events, elasticity_model=ConstantElasticity(), worker_count=4):
+        self.pool_states = pool_states
+        self.swap_flow = get_swap_flow(events)
+        self.elasticity_model = elasticity_model
+        self.pool = None
+        if worker_count:
+            self.pool = multiprocessing.Pool(worker_count, initializer=load_history, initargs=(pool_states, self.swap_flow, elasticity_model))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+
+    def run(self, fee_settings):
+        """ Returns {(total_fee_share, protocol_fee_ratio): {pool_address: metrics}} """
+        if self.pool is None:
+            load_history(self.pool_states, self.swap_flow, self.elasticity_model)
+            return dict(map(backtest_fee_setting, fee_settings))
+        return dict(self.pool.imap_unordered(backtest_fee_setting, fee_settings, chunksize=4))
+
+    def run_baseline(self):
+        """ Returns {pool_address: metrics} of the current fee settings of the pools """
+        return {
+            pool_address: backtest_pool(self.pool_states[pool_address], swaps, self.pool_states[pool_address][b'total_fee_share'], self.pool_states[pool_address][b'protocol_fee_ratio'], self.elasticity_model)
+            for pool_address, swaps in self.swap_flow.items()
+        }
+
+
+def get_mean_change(pool_metrics, baseline, key):
+    changes = [metrics[key] / baseline[pool_address][key] - 1 for pool_address, metrics in pool_metrics.items() if baseline[pool_address][key]]
+    return sum(changes) / len(changes) if changes else None
+
+
+def get_report(results, baseline):
+    """ Returns a row per fee setting ordered by the protocol revenue change, the best first """
+    rows = []
+    for (total_fee_share, protocol_fee_ratio), pool_metrics in results.items():
+        rows.append(dict(
+            total_fee_share=total_fee_share,
+            protocol_fee_ratio=protocol_fee_ratio,
+            swaps=sum(metrics['swaps'] for metrics in pool_metrics.values()),
+            failed_swaps=sum(metrics['failed_swaps'] for metrics in pool_metrics.values()),
+            volume_change=get_mean_change(pool_metrics, baseline, 'volume_value'),
+            poolers_revenue_change=get_mean_change(pool_metrics, baseline, 'poolers_fee_value'),
+            protocol_revenue_change=get_mean_change(pool_metrics, baseline, 'protocol_fee_value'),
+        ))
+    rows.sort(key=lambda row: (row['protocol_revenue_change'] is None, -(row['protocol_revenue_change'] or 0), row['total_fee_share'], row['protocol_fee_ratio']))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pools", type=int, default=100)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--elasticity", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 4])
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    pool_states = get_random_pool_states(args.pools, args.seed)
+    events = get_random_events(dict(pool_states), args.events, seed=args.seed)
+    fee_grid = get_fee_grid()
+    report = dict(pools=args.pools, events=len(events), fee_settings=len(fee_grid), elasticity=args.elasticity)
+
+    for worker_count in args.workers:
+        with FeeBacktester(pool_states, events, ConstantElasticity(args.elasticity), worker_count) as backtester:
+            start = time.perf_counter()
+            results = backtester.run(fee_grid)
+            seconds = time.perf_counter() - start
+            swap_count = sum(len(swaps) for swaps in backtester.swap_flow.values())
+            report[f"sweep_{worker_count}_workers"] = dict(seconds=seconds, swaps_per_second=swap_count * len(fee_grid) / seconds)
+            baseline = backtester.run_baseline()
+    report['best'] = get_report(results, baseline)[:args.top]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+claim_fees sweep scheduler.
+
+The accrued protocol fees of the pools are tracked from the replayed pool states. The pools are ranked in a heap by
+the value of the fees over the cost of claim_fees, an update pushes a new entry for the pool and the outdated entries
+are skipped when they reach the top. A sweep is emitted only if the fees are worth min_ratio times the fee.
+
+    python -m tests.fee_sweep --pools 20000 --updates 1000000
+
+benchmarks the update and the sweep times.
+"""
+import argparse
+import heapq
+import json
+import random
+import time
+from itertools import count
+
+from algojig import get_suggested_params
+from algosdk.future import transaction
+
+from .constants import *
+from .fees import get_min_fee, set_min_fees
+
+
+def get_claim_fees_cost(min_fee=MIN_TXN_FEE):
+    """ The minimum fee of claim_fees, the app call covers the inner transfers of the two assets """
+    txn = transaction.ApplicationNoOpTxn(sender=APPLICATION_ADDRESS, sp=get_suggested_params(), index=APPLICATION_ID, app_args=[METHOD_CLAIM_FEES])
+    return get_min_fee([txn], 0, min_fee=min_fee)
+
+
+CLAIM_FEES_COST = get_claim_fees_cost()
+
+
+def get_protocol_fees_value(pool_state, asset_prices):
+    """ The value of the protocol fees in microAlgos, the fees in assets without a price are not counted """
+    return (
+        pool_state.get(b'asset_1_protocol_fees', 0) * asset_prices.get(pool_state[b'asset_1_id'], 0)
+        + pool_state.get(b'asset_2_protocol_fees', 0) * asset_prices.get(pool_state[b'asset_2_id'], 0)
+    )
+
+
+def get_claim_fees_transactions(sp, sender, pool_states, pool_address, fee_collector):
+    """ The fee collector must be opted in to the assets of the pool """
+    pool_state = pool_states[pool_address]
+    txn_group = [
+        transaction.ApplicationNoOpTxn(
+            sender=sender,
+            sp=sp,
+            index=APPLICATION_ID,
+            app_args=[METHOD_CLAIM_FEES],
+            foreign_assets=[pool_state[b'asset_1_id'], pool_state[b'asset_2_id']],
+            accounts=[pool_address, fee_collector],
+        )
+    ]
+    return set_min_fees(txn_group, pool_states)
+
+
+class FeeSweepScheduler:
+    """
+    asset_prices maps asset ids to prices in microAlgos, ALGO is 1.
+    The claimed pools are not scheduled again until an update with new protocol fees.
+    """
+
+    def __init__(self, asset_prices=None, min_ratio=1, cost=CLAIM_FEES_COST):
+        self.asset_prices = {ALGO_ASSET_ID: 1, **(asset_prices or {})}
+        self.min_ratio = min_ratio
+        self.cost = cost
+        self.pool_states = {}
+        self.values = {}
+        # The sequence of the current heap entry of each scheduled pool
+        self.sequences = {}
+        # (-value / cost, sequence, pool address), the sequence breaks the ties in the update order
+        self.heap = []
+        self.sequence = count()
+
+    def update_pool(self, pool_address, pool_state):
+        self.pool_states[pool_address] = pool_state
+        value = get_protocol_fees_value(pool_state, self.asset_prices)
+        if self.values.get(pool_address) == value:
+            return
+        self.values[pool_address] = value
+        if value:
+            sequence = next(self.sequence)
+            self.sequences[pool_address] = sequence
+            heapq.heappush(self.heap, (-value / self.cost, sequence, pool_address))
+        else:
+            self.sequences.pop(pool_address, None)
+        # The outdated entries are skipped lazily, the heap is rebuilt if they dominate
+        if len(self.heap) > 2 * len(self.sequences) + 64:
+            self.compact()
+
+    def update_pools(self, pool_states):
+        for pool_address, pool_state in pool_states.items():
+            self.update_pool(pool_address, pool_state)
+
+    def compact(self):
+        self.heap = [entry for entry in self.heap if self.sequences.get(entry[2]) == entry[1]]
+        heapq.heapify(self.heap)
+
+    def peek(self):
+        """ Returns (ratio, pool address) of the best pool or None """
+        heap = self.heap
+        while heap:
+            negative_ratio, sequence, pool_address = heap[0]
+            if self.sequences.get(pool_address) == sequence:
+                return -negative_ratio, pool_address
+            heapq.heappop(heap)
+        return None
+
+    def pop_sweeps(self, limit=None):
+        """ Returns [(ratio, pool address)] of the pools worth sweeping, the best first """
+        sweeps = []
+        while limit is None or len(sweeps) < limit:
+            best = self.peek()
+            if best is None or best[0] < self.min_ratio:
+                break
+            heapq.heappop(self.heap)
+            # The value is kept, the same fees are not scheduled again while the claim is pending
+            del self.sequences[best[1]]
+            sweeps.append(best)
+        return sweeps
+
+    def get_sweep_transactions(self, sp, sender, fee_collector, limit=None):
+        """ Returns the claim_fees groups of the pools worth sweeping """
+        return [
+            get_claim_fees_transactions(sp, sender, self.pool_states, pool_address, fee_collector)
+            for _, pool_address in self.pop_sweeps(limit)
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pools", type=int, default=20_000)
+    parser.add_argument("--updates", type=int, default=1_000_000)
+    parser.add_argument("--sweep-interval", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool_states = {}
+    for index in range(args.pools):
+        pool_states[index] = {
+            b'asset_1_id': index + 1,
+            b'asset_2_id': ALGO_ASSET_ID,
+            b'asset_1_protocol_fees': 0,
+            b'asset_2_protocol_fees': 0,
+        }
+    asset_prices = {index + 1: rng.uniform(0.001, 10) for index in range(args.pools)}
+    scheduler = FeeSweepScheduler(asset_prices)
+    scheduler.update_pools(pool_states)
+
+    # The swaps land on random pools and accrue protocol fees on the input asset
+    updates = []
+    for _ in range(args.updates):
+        pool_address = rng.randrange(args.pools)
+        key = rng.choice((b'asset_1_protocol_fees', b'asset_2_protocol_fees'))
+        updates.append((pool_address, key, rng.randint(1, 100)))
+
+    sweep_count = 0
+    start = time.perf_counter()
+    for index, (pool_address, key, fee_amount) in enumerate(updates, start=1):
+        pool_state = dict(pool_states[pool_address])
+        pool_state[key] += fee_amount
+        pool_states[pool_address] = pool_state
+        scheduler.update_pool(pool_address, pool_state)
+        if index % args.sweep_interval == 0:
+            for _, swept_pool_address in scheduler.pop_sweeps():
+                # The claim lands
+                pool_states[swept_pool_address] = {**pool_states[swept_pool_address], b'asset_1_protocol_fees': 0, b'asset_2_protocol_fees': 0}
+                scheduler.update_pool(swept_pool_address, pool_states[swept_pool_address])
+                sweep_count += 1
+    duration = time.perf_counter() - start
+    print(json.dumps(dict(pools=args.pools, updates=args.updates, sweeps=sweep_count, microseconds_per_update=duration / args.updates * 1e6), indent=2))
+
+
+if __name__ == "__main__":
+    main()
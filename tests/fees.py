@@ -0,0 +1,66 @@
+from algosdk.future import transaction
+
+from .amm import get_fixed_output_swap_quote
+from .constants import *
+
+
+def get_app_call_inner_transaction_count(txn_group, index, pool_states):
+    """
+    Returns the number of inner transactions the app call at txn_group[index] will submit.
+    pool_states maps pool addresses to their local states, it is only required by the methods which have state dependent paths.
+    """
+    txn = txn_group[index]
+    method = txn.app_args[0].decode()
+
+    if method == METHOD_BOOTSTRAP:
+        # itxn: Pay, Acfg, Optin Asset 1, Optin Asset 2 (if not Algo), Optin Pool Token, Transfer Pool Token
+        asset_2_id = txn.foreign_assets[1]
+        return 6 if asset_2_id else 5
+    elif method == METHOD_ADD_INITIAL_LIQUIDITY:
+        return 1
+    elif method == METHOD_ADD_LIQUIDITY:
+        # increase_cost_budget + pool token transfer
+        return 2
+    elif method == METHOD_REMOVE_LIQUIDITY:
+        # 2 assets: asset 1 transfer + asset 2 transfer
+        # 1 asset: increase_cost_budget + asset transfer
+        return 2
+    elif method == METHOD_SWAP:
+        mode = txn.app_args[1].decode()
+        if mode == "fixed-input":
+            return 1
+
+        # fixed-output: the change is transferred back to the user if the input amount exceeds the required amount
+        input_txn = txn_group[index - 1]
+        if input_txn.type == transaction.constants.payment_txn:
+            input_asset_id, input_amount = ALGO_ASSET_ID, input_txn.amt
+        else:
+            input_asset_id, input_amount = input_txn.index, input_txn.amount
+        output_amount = int.from_bytes(txn.app_args[2], 'big')
+        required_input_amount, _ = get_fixed_output_swap_quote(pool_states[txn.accounts[0]], input_asset_id, output_amount)
+        return 2 if input_amount > required_input_amount else 1
+    elif method in (METHOD_FLASH_LOAN, METHOD_FLASH_SWAP):
+        asset_1_amount = int.from_bytes(txn.app_args[2], 'big')
+        asset_2_amount = int.from_bytes(txn.app_args[3], 'big')
+        return bool(asset_1_amount) + bool(asset_2_amount)
+    elif method == METHOD_CLAIM_FEES:
+        # Both assets are transferred even if one of the protocol fees is 0
+        return 2
+    elif method == METHOD_CLAIM_EXTRA:
+        return 1
+    return 0
+
+
+def get_min_fee(txn_group, index, pool_states=None, min_fee=MIN_TXN_FEE):
+    """ Returns the minimum fee of txn_group[index], app calls cover the fees of their inner transactions """
+    txn = txn_group[index]
+    if txn.type == transaction.constants.appcall_txn and txn.index == APPLICATION_ID:
+        return min_fee * (1 + get_app_call_inner_transaction_count(txn_group, index, pool_states))
+    return min_fee
+
+
+def set_min_fees(txn_group, pool_states=None, min_fee=MIN_TXN_FEE):
+    """ Sets the minimum fees of an unsigned transaction group, it must be called before assign_group_id """
+    for index, txn in enumerate(txn_group):
+        txn.fee = get_min_fee(txn_group, index, pool_states, min_fee)
+    return txn_group
@@ -0,0 +1,114 @@
+"""
+Flash loan group builder and bulk profitability evaluator.
+
+A strategy borrows from a pool, runs fixed-input swaps and repays the exact minimum amounts:
+
+    strategy = dict(
+        pool_address=pool_address,
+        asset_1_amount=10_000,
+        asset_2_amount=0,
+        swaps=[(pool_address_2, asset_1_id, 10_000), (pool_address_3, asset_3_id, 9_000)],
+    )
+"""
+
+from . import amm
+from .arbitrage import get_cycle_transactions
+from .constants import *
+from .core import TransactionBuilderMixin
+from .fees import set_min_fees
+
+
+def calculate_flash_loan_repayment_amount(pool_state, amount):
+    """ The same as asset_x_repayment_amount in verify_flash_loan """
+    total_fee_amount, _, _ = amm.calculate_fixed_input_fee_amounts(amount, pool_state[b'total_fee_share'], pool_state[b'protocol_fee_ratio'])
+    amm.require(total_fee_amount, "assert(asset_x_total_fee_amount)")
+    return amm.uint64(amount + total_fee_amount)
+
+
+class GroupBuilder(TransactionBuilderMixin):
+    """ The group builders of core.py for a sender and a pool outside of a test case """
+
+    def __init__(self, sp, sender, pool_address, pool_state):
+        self.sp = sp
+        self.user_addr = sender
+        self.pool_address = pool_address
+        self.asset_1_id = pool_state[b'asset_1_id']
+        self.asset_2_id = pool_state[b'asset_2_id']
+
+
+def get_flash_loan_transactions(sp, sender, pool_states, pool_address, asset_1_amount, asset_2_amount, transactions=()):
+    """
+    Returns [flash_loan, *transactions, asset 1 repayment, asset 2 repayment, verify_flash_loan] with the exact repayments
+    and the minimum fees. The repayments are at GroupIndex - 2 and GroupIndex - 1 of verify_flash_loan.
+    """
+    pool_state = pool_states[pool_address]
+    repayment_amounts = [calculate_flash_loan_repayment_amount(pool_state, amount) if amount else 0 for amount in (asset_1_amount, asset_2_amount)]
+    txn_group = GroupBuilder(sp, sender, pool_address, pool_state).get_flash_loan_transactions(asset_1_amount, asset_2_amount, *repayment_amounts, transactions=transactions)
+    return set_min_fees(txn_group, pool_states)
+
+
+def get_strategy_fee(strategy, min_fee=MIN_TXN_FEE):
+    """ The minimum total fee of the group, it is the same as the sum of the fees set by set_min_fees """
+    loan_count = bool(strategy['asset_1_amount']) + bool(strategy['asset_2_amount'])
+    # flash_loan + inner transfers, repayments, verify_flash_loan, swaps (transfer + app call + inner transfer)
+    return min_fee * ((1 + loan_count) + loan_count + 1 + 3 * len(strategy['swaps']))
+
+
+def evaluate_strategy(pool_states, strategy):
+    """ Returns the balance changes of the user by asset id, raises LogicError if the group would fail """
+    pool_address = strategy['pool_address']
+    pool_state = pool_states[pool_address]
+    asset_1_id, asset_2_id = pool_state[b'asset_1_id'], pool_state[b'asset_2_id']
+    asset_1_amount, asset_2_amount = strategy['asset_1_amount'], strategy['asset_2_amount']
+    repayment_amounts = [calculate_flash_loan_repayment_amount(pool_state, amount) if amount else 0 for amount in (asset_1_amount, asset_2_amount)]
+    # The loan amounts are checked against the reserves before the swaps
+    amm.flash_loan(pool_state, asset_1_amount, asset_2_amount, *repayment_amounts, timestamp=amm.get_price_oracle_timestamp(pool_state))
+
+    states = dict(pool_states)
+    deltas = {asset_1_id: asset_1_amount - repayment_amounts[0], asset_2_id: asset_2_amount - repayment_amounts[1]}
+    for swap_pool_address, input_asset_id, input_amount in strategy['swaps']:
+        swap_pool_state = states[swap_pool_address]
+        states[swap_pool_address], result = amm.swap(swap_pool_state, input_asset_id, input_amount, "fixed-input", 0, timestamp=amm.get_price_oracle_timestamp(swap_pool_state))
+        deltas[input_asset_id] = deltas.get(input_asset_id, 0) - input_amount
+        deltas[result['output_asset_id']] = deltas.get(result['output_asset_id'], 0) + result['output_amount']
+    deltas[ALGO_ASSET_ID] = deltas.get(ALGO_ASSET_ID, 0) - get_strategy_fee(strategy)
+    return deltas
+
+
+def score_strategies(pool_states, strategies, asset_prices=None):
+    """
+    Returns the value of each strategy in microAlgos, the transaction fees are included.
+    asset_prices maps asset ids to prices in microAlgos. A failing strategy or a loss in an asset without a price is None.
+    """
+    asset_prices = {ALGO_ASSET_ID: 1, **(asset_prices or {})}
+    scores = []
+    for strategy in strategies:
+        try:
+            deltas = evaluate_strategy(pool_states, strategy)
+        except amm.LogicError:
+            scores.append(None)
+            continue
+        if any(delta < 0 and asset_id not in asset_prices for asset_id, delta in deltas.items()):
+            scores.append(None)
+            continue
+        scores.append(sum(delta * asset_prices.get(asset_id, 0) for asset_id, delta in deltas.items()))
+    return scores
+
+
+def get_profitable_strategies(pool_states, strategies, asset_prices=None, min_profit=1):
+    """ Returns (score, strategy) of the strategies worth at least min_profit microAlgos, the best first """
+    scores = score_strategies(pool_states, strategies, asset_prices)
+    profitable = [(score, strategy) for score, strategy in zip(scores, strategies) if score is not None and score >= min_profit]
+    return sorted(profitable, key=lambda item: item[0], reverse=True)
+
+
+def get_strategy_transactions(sp, sender, pool_states, strategy):
+    """ Returns the group of the strategy, the min outputs of the swaps are the exact outputs """
+    swaps = []
+    states = dict(pool_states)
+    for swap_pool_address, input_asset_id, input_amount in strategy['swaps']:
+        swap_pool_state = states[swap_pool_address]
+        states[swap_pool_address], result = amm.swap(swap_pool_state, input_asset_id, input_amount, "fixed-input", 0, timestamp=amm.get_price_oracle_timestamp(swap_pool_state))
+        swaps.append((swap_pool_address, input_asset_id, input_amount, result['output_asset_id'], result['output_amount']))
+    transactions = get_cycle_transactions(sp, sender, swaps, pool_states)
+    return get_flash_loan_transactions(sp, sender, pool_states, strategy['pool_address'], strategy['asset_1_amount'], strategy['asset_2_amount'], transactions)
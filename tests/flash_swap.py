@@ -0,0 +1,156 @@
+"""
+Flash swap planner, it finds the minimum repayment which passes check_invariant in verify_flash_swap.
+
+    python -m tests.flash_swap --plans 100000
+
+benchmarks the planning time.
+"""
+import argparse
+import json
+import random
+import time
+
+from algosdk.future import transaction
+
+from . import amm
+from .arbitrage import get_cycle_transactions
+from .constants import *
+from .fees import set_min_fees
+
+
+def get_net_input_amount(input_amount, total_fee_share):
+    """ The increase of (reserves - poolers fee) in verify_flash_swap, it is not decreasing in input_amount """
+    return input_amount - input_amount * total_fee_share // 10000
+
+
+def calculate_min_flash_swap_input_amount(pool_state, asset_1_output_amount, asset_2_output_amount, input_asset_id):
+    """
+    Returns the minimum amount of input_asset_id which must be transferred to the pool between flash_swap and verify_flash_swap.
+    The other asset is not repaid.
+
+    verify_flash_swap requires (r_in - o_in + i - fee(i)) * (r_out - o_out) >= r_in * r_out and fee(i) > 0.
+    """
+    total_fee_share = pool_state[b'total_fee_share']
+    if input_asset_id == pool_state[b'asset_1_id']:
+        input_supply, output_supply = pool_state[b'asset_1_reserves'], pool_state[b'asset_2_reserves']
+        input_asset_output_amount, output_amount = asset_1_output_amount, asset_2_output_amount
+    else:
+        input_supply, output_supply = pool_state[b'asset_2_reserves'], pool_state[b'asset_1_reserves']
+        input_asset_output_amount, output_amount = asset_2_output_amount, asset_1_output_amount
+
+    remaining_output_supply = output_supply - output_amount
+    if remaining_output_supply <= 0:
+        raise amm.LogicError("the output reserves can not be drained")
+
+    # The minimum increase of (reserves - poolers fee), rounded up
+    required_net_input_amount = -(-input_supply * output_supply // remaining_output_supply) - (input_supply - input_asset_output_amount)
+    # The total fee must be positive
+    min_input_amount = -(-10000 // total_fee_share)
+    if required_net_input_amount <= get_net_input_amount(min_input_amount, total_fee_share):
+        return min_input_amount
+
+    # The estimate is an upper bound, the floor of the fee can save 1 or 2 units
+    input_amount = -(-required_net_input_amount * 10000 // (10000 - total_fee_share))
+    while get_net_input_amount(input_amount - 1, total_fee_share) >= required_net_input_amount:
+        input_amount -= 1
+    return input_amount
+
+
+def plan_flash_swap(pool_states, pool_address, output_asset_id, output_amount, path):
+    """
+    Borrows output_amount of output_asset_id from the flash swap pool, swaps it through path and repays the other asset
+    of the flash swap pool with the minimum amount.
+    path is a list of (pool address, input asset id), the last swap must output the repayment asset.
+    """
+    pool_state = pool_states[pool_address]
+    asset_1_id, asset_2_id = pool_state[b'asset_1_id'], pool_state[b'asset_2_id']
+    input_asset_id = asset_2_id if output_asset_id == asset_1_id else asset_1_id
+    asset_1_output_amount = output_amount if output_asset_id == asset_1_id else 0
+    asset_2_output_amount = output_amount if output_asset_id == asset_2_id else 0
+
+    swaps = []
+    amount, asset_id = output_amount, output_asset_id
+    for swap_pool_address, swap_input_asset_id in path:
+        assert swap_pool_address != pool_address and swap_input_asset_id == asset_id
+        swap_pool_state = pool_states[swap_pool_address]
+        swap_output_asset_id = swap_pool_state[b'asset_2_id'] if swap_input_asset_id == swap_pool_state[b'asset_1_id'] else swap_pool_state[b'asset_1_id']
+        swap_output_amount, _ = amm.get_fixed_input_swap_quote(swap_pool_state, swap_input_asset_id, amount)
+        swaps.append((swap_pool_address, swap_input_asset_id, amount, swap_output_asset_id, swap_output_amount))
+        amount, asset_id = swap_output_amount, swap_output_asset_id
+    assert asset_id == input_asset_id
+
+    input_amount = calculate_min_flash_swap_input_amount(pool_state, asset_1_output_amount, asset_2_output_amount, input_asset_id)
+    return dict(
+        pool_address=pool_address,
+        asset_1_output_amount=asset_1_output_amount,
+        asset_2_output_amount=asset_2_output_amount,
+        swaps=swaps,
+        input_asset_id=input_asset_id,
+        input_amount=input_amount,
+        profit=amount - input_amount,
+    )
+
+
+def get_flash_swap_transactions(sp, sender, pool_states, plan):
+    """ Returns [flash_swap, *swaps, repayment, verify_flash_swap] with the minimum fees """
+    pool_address = plan['pool_address']
+    pool_state = pool_states[pool_address]
+    foreign_assets = [pool_state[b'asset_1_id'], pool_state[b'asset_2_id']]
+
+    transactions = get_cycle_transactions(sp, sender, plan['swaps'], pool_states)
+    if plan['input_asset_id'] == ALGO_ASSET_ID:
+        repayment = transaction.PaymentTxn(sender=sender, sp=sp, receiver=pool_address, amt=plan['input_amount'])
+    else:
+        repayment = transaction.AssetTransferTxn(sender=sender, sp=sp, receiver=pool_address, index=plan['input_asset_id'], amt=plan['input_amount'])
+
+    index_diff = len(transactions) + 2
+    txn_group = [
+        transaction.ApplicationNoOpTxn(
+            sender=sender,
+            sp=sp,
+            index=APPLICATION_ID,
+            app_args=[METHOD_FLASH_SWAP, index_diff, plan['asset_1_output_amount'], plan['asset_2_output_amount']],
+            foreign_assets=foreign_assets,
+            accounts=[pool_address],
+        ),
+        *transactions,
+        repayment,
+        transaction.ApplicationNoOpTxn(
+            sender=sender,
+            sp=sp,
+            index=APPLICATION_ID,
+            app_args=[METHOD_VERIFY_FLASH_SWAP, index_diff],
+            foreign_assets=foreign_assets,
+            accounts=[pool_address],
+        ),
+    ]
+    return set_min_fees(txn_group, pool_states)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--plans", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = []
+    for _ in range(args.plans):
+        pool_state = {
+            b'asset_1_id': 5,
+            b'asset_2_id': 2,
+            b'asset_1_reserves': rng.randint(10 ** 6, 10 ** 15),
+            b'asset_2_reserves': rng.randint(10 ** 6, 10 ** 15),
+            b'total_fee_share': rng.randint(1, 100),
+        }
+        cases.append((pool_state, rng.randint(1, pool_state[b'asset_1_reserves'] // 10)))
+
+    start = time.perf_counter()
+    for pool_state, output_amount in cases:
+        calculate_min_flash_swap_input_amount(pool_state, output_amount, 0, 2)
+    duration = time.perf_counter() - start
+    print(json.dumps(dict(plans=args.plans, microseconds_per_plan=duration / args.plans * 1e6), indent=2))
+
+
+if __name__ == "__main__":
+    main()
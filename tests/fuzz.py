@@ -0,0 +1,302 @@
+"""
+Differential fuzzing of the pool model (tests/amm.py) against the approval program.
+
+Random pool states and operations are evaluated in bulk with the model and a sample of them is evaluated on the ledger.
+Every model outcome is checked for exceptions and for the conservation of the assets between the pool and the user.
+Many independent pools are packed into each eval_transactions block (see FuzzTestCase in tests_fuzz.py). Mismatches are
+shrunk to minimal cases and formatted as unittest cases subclassing FuzzTestCase.
+
+Only ASA-ASA pools are generated, the model does not account the Algo minimum balances.
+"""
+import random
+from itertools import product
+from math import isqrt
+
+from . import amm
+from .constants import *
+
+FEE_COMBINATIONS = list(product(range(1, 101), range(3, 11)))
+FUZZ_TIMESTAMP = BLOCK_TIME_DELTA
+FUZZ_ASSET_ID_OFFSET = 1_000
+POOLS_PER_BLOCK = 64
+POOL_STATE_KEYS = (
+    b'asset_1_reserves',
+    b'asset_2_reserves',
+    b'issued_pool_tokens',
+    b'asset_1_protocol_fees',
+    b'asset_2_protocol_fees',
+    b'asset_1_cumulative_price',
+    b'asset_2_cumulative_price',
+    b'cumulative_price_update_timestamp',
+)
+
+
+def generate_amount(rng, maximum):
+    """ Returns an amount in [1, maximum], biased to small values and to the values near the limits """
+    if maximum < 1:
+        return 0
+    choice = rng.random()
+    if choice < 0.3:
+        return rng.randint(1, min(maximum, 10_000))
+    if choice < 0.6:
+        return rng.randint(1, min(maximum, 10 ** 12))
+    if choice < 0.8:
+        return rng.randint(1, maximum)
+    if choice < 0.9:
+        return max(1, maximum - rng.randint(0, 1_000))
+    return min(maximum, 2 ** rng.randint(0, 63))
+
+
+def generate_pool(rng, total_fee_share, protocol_fee_ratio):
+    asset_1_reserves = generate_amount(rng, MAX_ASSET_AMOUNT)
+    asset_2_reserves = generate_amount(rng, MAX_ASSET_AMOUNT)
+    issued_pool_tokens = isqrt(asset_1_reserves * asset_2_reserves)
+    if rng.random() < 0.3:
+        issued_pool_tokens += rng.randint(-issued_pool_tokens // 2, issued_pool_tokens // 2)
+    issued_pool_tokens = min(max(issued_pool_tokens, LOCKED_POOL_TOKENS + 1), MAX_ASSET_AMOUNT)
+
+    asset_1_protocol_fees = 0
+    asset_2_protocol_fees = 0
+    if rng.random() < 0.3:
+        asset_1_protocol_fees = generate_amount(rng, MAX_ASSET_AMOUNT - asset_1_reserves)
+        asset_2_protocol_fees = generate_amount(rng, MAX_ASSET_AMOUNT - asset_2_reserves)
+
+    return dict(
+        asset_1_reserves=asset_1_reserves,
+        asset_2_reserves=asset_2_reserves,
+        issued_pool_tokens=issued_pool_tokens,
+        total_fee_share=total_fee_share,
+        protocol_fee_ratio=protocol_fee_ratio,
+        asset_1_protocol_fees=asset_1_protocol_fees,
+        asset_2_protocol_fees=asset_2_protocol_fees,
+    )
+
+
+def get_max_input_amount(pool, asset):
+    # The pool balance cannot exceed MAX_ASSET_AMOUNT after the input transfer
+    return MAX_ASSET_AMOUNT - (pool[f'asset_{asset}_reserves'] + pool[f'asset_{asset}_protocol_fees'])
+
+
+def generate_operation(rng, pool):
+    choice = rng.random()
+    if choice < 0.5:
+        input_asset = rng.choice((1, 2))
+        output_supply = pool[f'asset_{3 - input_asset}_reserves']
+        mode = rng.choice(("fixed-input", "fixed-output"))
+        if mode == "fixed-input":
+            min_output = rng.choice((0, generate_amount(rng, output_supply)))
+        else:
+            min_output = generate_amount(rng, output_supply + 1)
+        args = dict(
+            input_asset=input_asset,
+            input_amount=generate_amount(rng, get_max_input_amount(pool, input_asset)),
+            mode=mode,
+            min_output=min_output,
+        )
+        return METHOD_SWAP, args
+    elif choice < 0.75:
+        asset_1_amount = generate_amount(rng, get_max_input_amount(pool, 1))
+        asset_2_amount = generate_amount(rng, get_max_input_amount(pool, 2))
+        if rng.random() < 0.5:
+            if rng.random() < 0.5:
+                asset_1_amount = None
+            else:
+                asset_2_amount = None
+        return METHOD_ADD_LIQUIDITY, dict(asset_1_amount=asset_1_amount, asset_2_amount=asset_2_amount, min_output=0)
+    else:
+        args = dict(
+            removed_pool_token_amount=generate_amount(rng, pool['issued_pool_tokens'] - LOCKED_POOL_TOKENS),
+            min_output_1=0,
+            min_output_2=0,
+            output_asset=rng.choice((None, 1, 2)),
+        )
+        return METHOD_REMOVE_LIQUIDITY, args
+
+
+def generate_cases(seed, count):
+    """ Generates count cases, every total_fee_share and protocol_fee_ratio combination is covered once count >= 800 """
+    rng = random.Random(seed)
+    cases = []
+    for i in range(count):
+        pool = generate_pool(rng, *FEE_COMBINATIONS[i % len(FEE_COMBINATIONS)])
+        method, args = generate_operation(rng, pool)
+        cases.append(dict(pool=pool, method=method, args=args))
+    return cases
+
+
+def is_valid_case(case):
+    """ Returns False if the case cannot be set up on the ledger, the shrinker must not produce such cases """
+    pool, args = case['pool'], case['args']
+    if pool['issued_pool_tokens'] <= LOCKED_POOL_TOKENS or pool['issued_pool_tokens'] > MAX_ASSET_AMOUNT:
+        return False
+    if not (1 <= pool['total_fee_share'] <= 100 and 3 <= pool['protocol_fee_ratio'] <= 10):
+        return False
+    for asset in (1, 2):
+        if get_max_input_amount(pool, asset) < 0:
+            return False
+    if case['method'] == METHOD_SWAP:
+        return args['input_amount'] <= get_max_input_amount(pool, args['input_asset'])
+    if case['method'] == METHOD_ADD_LIQUIDITY:
+        return all((args[f'asset_{asset}_amount'] or 0) <= get_max_input_amount(pool, asset) for asset in (1, 2))
+    return args['removed_pool_token_amount'] <= pool['issued_pool_tokens'] - LOCKED_POOL_TOKENS
+
+
+def get_asset_ids(index):
+    asset_2_id = FUZZ_ASSET_ID_OFFSET + 3 * index
+    return asset_2_id + 1, asset_2_id, asset_2_id + 2
+
+
+def get_pool_local_state(pool, asset_1_id, asset_2_id, pool_token_asset_id):
+    return {
+        b'asset_1_id': asset_1_id,
+        b'asset_2_id': asset_2_id,
+        b'pool_token_asset_id': pool_token_asset_id,
+        b'total_fee_share': pool['total_fee_share'],
+        b'protocol_fee_ratio': pool['protocol_fee_ratio'],
+        b'asset_1_reserves': pool['asset_1_reserves'],
+        b'asset_2_reserves': pool['asset_2_reserves'],
+        b'issued_pool_tokens': pool['issued_pool_tokens'],
+        b'asset_1_cumulative_price': BYTE_ZERO,
+        b'asset_2_cumulative_price': BYTE_ZERO,
+        b'cumulative_price_update_timestamp': 0,
+        b'lock': 0,
+        b'asset_1_protocol_fees': pool['asset_1_protocol_fees'],
+        b'asset_2_protocol_fees': pool['asset_2_protocol_fees'],
+    }
+
+
+def get_user_input_amounts(case):
+    """ Returns {asset: amount} transferred from the user to the pool, asset 3 is the pool token """
+    args = case['args']
+    if case['method'] == METHOD_SWAP:
+        return {args['input_asset']: args['input_amount']}
+    if case['method'] == METHOD_ADD_LIQUIDITY:
+        return {asset: args[f'asset_{asset}_amount'] for asset in (1, 2) if args[f'asset_{asset}_amount'] is not None}
+    return {3: args['removed_pool_token_amount']}
+
+
+def run_model(case, asset_ids=(2, 1, 3), timestamp=FUZZ_TIMESTAMP):
+    """
+    Returns ("ok", pool_state, user_balance_deltas) or ("error", line).
+    user_balance_deltas are keyed by asset (1, 2 or 3 for the pool token).
+    """
+    initial_state = get_pool_local_state(case['pool'], *asset_ids)
+    args = case['args']
+    deltas = {asset: -amount for asset, amount in get_user_input_amounts(case).items()}
+    try:
+        if case['method'] == METHOD_SWAP:
+            input_asset = args['input_asset']
+            pool_state, result = amm.swap(initial_state, asset_ids[input_asset - 1], args['input_amount'], args['mode'], args['min_output'], timestamp)
+            deltas[input_asset] += result['change']
+            deltas[3 - input_asset] = result['output_amount']
+        elif case['method'] == METHOD_ADD_LIQUIDITY:
+            pool_state, result = amm.add_liquidity(initial_state, args['asset_1_amount'], args['asset_2_amount'], args['min_output'], timestamp)
+            deltas[3] = result['pool_tokens_out']
+        else:
+            output_asset_id = asset_ids[args['output_asset'] - 1] if args['output_asset'] else None
+            pool_state, result = amm.remove_liquidity(initial_state, args['removed_pool_token_amount'], args['min_output_1'], args['min_output_2'], output_asset_id, timestamp)
+            deltas[1] = result['asset_1_amount']
+            deltas[2] = result['asset_2_amount']
+    except amm.LogicError as e:
+        return "error", str(e)
+    return "ok", normalize_pool_state(pool_state), {asset: delta for asset, delta in deltas.items() if delta}
+
+
+def get_model_violations(case, model_outcome):
+    """ Returns the invariants which a successful model outcome violates, the assets are conserved between the pool and the user """
+    if model_outcome[0] != "ok":
+        return []
+    _, pool_state, user_balance_deltas = model_outcome
+    pool = case['pool']
+    violations = []
+    for asset in (1, 2):
+        balance = pool_state[f'asset_{asset}_reserves'.encode()] + pool_state[f'asset_{asset}_protocol_fees'.encode()]
+        if balance - (pool[f'asset_{asset}_reserves'] + pool[f'asset_{asset}_protocol_fees']) != -user_balance_deltas.get(asset, 0):
+            violations.append(f"asset {asset} is not conserved")
+        if balance > MAX_ASSET_AMOUNT:
+            violations.append(f"asset {asset} balance overflows")
+    issued_pool_tokens = pool['issued_pool_tokens'] + user_balance_deltas.get(3, 0)
+    # The locked pool tokens are not issued anymore once the rest is removed
+    if pool_state[b'issued_pool_tokens'] != (0 if issued_pool_tokens == LOCKED_POOL_TOKENS else issued_pool_tokens):
+        violations.append("pool tokens are not conserved")
+    if pool_state[b'issued_pool_tokens'] > POOL_TOKEN_TOTAL_SUPPLY:
+        violations.append("issued pool tokens overflow")
+    return violations
+
+
+def get_model_failure(case):
+    """ Returns the model outcome and the failure of the model itself, an exception or a violated invariant, or None """
+    try:
+        model_outcome = run_model(case)
+    except Exception as e:
+        return None, repr(e)
+    violations = get_model_violations(case, model_outcome)
+    return model_outcome, ", ".join(violations) or None
+
+
+def normalize_pool_state(pool_state):
+    state = {key: pool_state.get(key, 0) for key in POOL_STATE_KEYS}
+    for key in (b'asset_1_cumulative_price', b'asset_2_cumulative_price'):
+        state[key] = amm.get_cumulative_price(pool_state, key)
+    return state
+
+
+def is_matching(model_outcome, ledger_outcome):
+    if model_outcome[0] != ledger_outcome[0]:
+        return False
+    if model_outcome[0] == "error":
+        # Only the asserts have a reliable source line, the other errors (overflow, division by zero) can only be compared by type
+        return not model_outcome[1].startswith("assert(") or model_outcome[1] == ledger_outcome[1]
+    return model_outcome == ledger_outcome
+
+
+def shrink_case(case, is_failing, max_attempts=200):
+    """ Greedily minimizes the integer fields of a failing case while is_failing(case) holds """
+    def get_candidates(key, value):
+        if key == 'total_fee_share':
+            return [TOTAL_FEE_SHARE]
+        if key == 'protocol_fee_ratio':
+            return [PROTOCOL_FEE_RATIO]
+        return [0, 1, LOCKED_POOL_TOKENS + 1, 10 ** 6, value // 2, value - 1]
+
+    attempts = 0
+    improved = True
+    while improved and attempts < max_attempts:
+        improved = False
+        for section in ('pool', 'args'):
+            for key, value in list(case[section].items()):
+                if not isinstance(value, int) or isinstance(value, bool) or key in ('input_asset', 'output_asset'):
+                    continue
+                for candidate in get_candidates(key, value):
+                    if candidate >= value or candidate < 0 or attempts >= max_attempts:
+                        continue
+                    new_case = dict(case, **{section: dict(case[section], **{key: candidate})})
+                    if not is_valid_case(new_case):
+                        continue
+                    attempts += 1
+                    if is_failing(new_case):
+                        case = new_case
+                        improved = True
+                        break
+    return case
+
+
+def format_reproducer(case, name):
+    return (
+        f"    def {name}(self):\n"
+        f"        self.assert_model_matches_ledger(\n"
+        f"            pool={case['pool']!r},\n"
+        f"            method={case['method']!r},\n"
+        f"            args={case['args']!r},\n"
+        f"        )\n"
+    )
+
+
+def format_reproducers(cases):
+    """ Returns the source of a FuzzTestCase (see tests_fuzz.py) with a test per case """
+    methods = "\n".join(format_reproducer(case, f"test_reproducer_{i}") for i, case in enumerate(cases))
+    return (
+        "class TestFuzzReproducers(FuzzTestCase):\n"
+        "\n"
+        f"{methods}"
+    )
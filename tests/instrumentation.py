@@ -0,0 +1,200 @@
+"""
+Instrumentation of the ledger evaluations of the tests.
+
+EvalRecorder wraps JigLedger.eval_transactions while it is enabled and records per group: the wall time, the opcode
+budget, the inner transaction count, the log bytes and the size of the local state deltas. The groups are tagged by
+the methods of the app calls (METHOD_SWAP, METHOD_ADD_LIQUIDITY, ...) and the test they were evaluated in. Nothing is
+wrapped while the recorder is disabled, so the tests run without overhead.
+
+eval_transactions does not report the opcode cost, the opcode budget is the budget pooled by the app calls of the
+group including the inner ones (e.g. the increase_cost_budget calls) so it is the upper bound of the cost.
+
+    with EvalRecorder() as recorder:
+        ...
+    recorder.write_json("eval_report.json")
+
+    python -m tests.instrumentation tests.tests_swap --json eval_report.json --folded eval.folded
+
+runs the tests (all of them by default) with the recorder. The folded file is the input of flamegraph.pl, the stacks
+are test module;test case;test;method and the values are microseconds.
+"""
+import argparse
+import functools
+import json
+import sys
+import time
+import unittest
+from collections import defaultdict
+
+from algojig.ledger import JigLedger
+from algosdk.future import transaction
+
+from .constants import *
+
+APP_CALL_BUDGET = 700
+
+
+def get_group_methods(stxns, app_id=APPLICATION_ID):
+    """ Returns the methods of the app calls of the group joined by "+", "other" if there is not any """
+    methods = []
+    for stxn in stxns:
+        txn = stxn.transaction
+        if txn.type == transaction.constants.appcall_txn and txn.index == app_id and txn.app_args:
+            method = txn.app_args[0].decode(errors="replace")
+            if method not in methods:
+                methods.append(method)
+    return "+".join(methods) or "other"
+
+
+def get_block_metrics(block):
+    """ The inner transactions are included """
+    metrics = dict(app_calls=0, inner_transactions=0, log_bytes=0, local_state_delta_keys=0, local_state_delta_bytes=0)
+    block_txns = [(block_txn, False) for block_txn in block[b'txns']]
+    while block_txns:
+        block_txn, inner = block_txns.pop()
+        apply_data = block_txn.get(b'dt', {})
+        metrics['inner_transactions'] += inner
+        metrics['app_calls'] += block_txn[b'txn'].get(b'type') == b'appl'
+        metrics['log_bytes'] += sum(len(log) for log in apply_data.get(b'lg', []))
+        for delta in apply_data.get(b'ld', {}).values():
+            metrics['local_state_delta_keys'] += len(delta)
+            # ui is 8 bytes
+            metrics['local_state_delta_bytes'] += sum(len(key) + len(value_delta.get(b'bs', b'')) + 8 * (b'ui' in value_delta) for key, value_delta in delta.items())
+        block_txns.extend((inner_block_txn, True) for inner_block_txn in apply_data.get(b'itx', []))
+    return metrics
+
+
+class EvalRecorder:
+
+    def __init__(self, app_id=APPLICATION_ID):
+        self.app_id = app_id
+        self.records = []
+        # The id of the running test, set by the runner
+        self.test_id = None
+        self.eval_transactions = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.disable()
+
+    def enable(self):
+        if self.eval_transactions is not None:
+            return
+        self.eval_transactions = eval_transactions = JigLedger.eval_transactions
+        recorder = self
+
+        @functools.wraps(eval_transactions)
+        def recorded_eval_transactions(ledger, stxns, *args, **kwargs):
+            block = None
+            start = time.perf_counter()
+            try:
+                block = eval_transactions(ledger, stxns, *args, **kwargs)
+                return block
+            finally:
+                recorder.record(stxns, time.perf_counter() - start, block)
+
+        JigLedger.eval_transactions = recorded_eval_transactions
+
+    def disable(self):
+        if self.eval_transactions is not None:
+            JigLedger.eval_transactions = self.eval_transactions
+            self.eval_transactions = None
+
+    def record(self, stxns, duration, block):
+        """ block is None if the evaluation failed """
+        record = dict(
+            test=self.test_id,
+            method=get_group_methods(stxns, self.app_id),
+            transactions=len(stxns),
+            failed=block is None,
+            wall_seconds=duration,
+        )
+        if block is not None:
+            metrics = get_block_metrics(block)
+            record.update(opcode_budget=metrics.pop('app_calls') * APP_CALL_BUDGET, **metrics)
+        self.records.append(record)
+
+    def get_summary(self):
+        """ Returns {method: metrics}, the block metrics are the means of the successful groups """
+        records_by_method = defaultdict(list)
+        for record in self.records:
+            records_by_method[record['method']].append(record)
+
+        summary = {}
+        for method, records in sorted(records_by_method.items()):
+            durations = sorted(record['wall_seconds'] for record in records)
+            successful_records = [record for record in records if not record['failed']]
+            summary[method] = dict(
+                groups=len(records),
+                failed_groups=len(records) - len(successful_records),
+                wall_seconds=sum(durations),
+                p50_milliseconds=durations[len(durations) // 2] * 1000,
+                p99_milliseconds=durations[len(durations) * 99 // 100] * 1000,
+            )
+            for key in ('opcode_budget', 'inner_transactions', 'log_bytes', 'local_state_delta_keys', 'local_state_delta_bytes'):
+                summary[method][f"mean_{key}"] = sum(record[key] for record in successful_records) / len(successful_records) if successful_records else None
+        return summary
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(dict(summary=self.get_summary(), records=self.records), f, indent=2)
+
+    def get_folded_stacks(self):
+        """ Returns {stack: microseconds} in the folded format of flamegraph.pl """
+        stacks = defaultdict(int)
+        for record in self.records:
+            frames = (record['test'] or "unknown").rsplit(".", 2) + [record['method']]
+            stacks[";".join(frames)] += round(record['wall_seconds'] * 1e6)
+        return dict(stacks)
+
+    def write_folded(self, path):
+        with open(path, "w") as f:
+            for stack, microseconds in sorted(self.get_folded_stacks().items()):
+                f.write(f"{stack} {microseconds}\n")
+
+
+class RecordedTestResult(unittest.TextTestResult):
+    """ Sets the test id of the recorder """
+
+    def __init__(self, *args, recorder, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recorder = recorder
+
+    def startTest(self, test):
+        self.recorder.test_id = test.id()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        self.recorder.test_id = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tests", nargs="*", help="test names, e.g. tests.tests_swap.TestSwap, all tests by default")
+    parser.add_argument("--json", default="eval_report.json")
+    parser.add_argument("--folded", default=None)
+    args = parser.parse_args()
+
+    if args.tests:
+        suite = unittest.defaultTestLoader.loadTestsFromNames(args.tests)
+    else:
+        # The same tests as python -m unittest
+        suite = unittest.defaultTestLoader.discover(".")
+    recorder = EvalRecorder()
+    runner = unittest.TextTestRunner(resultclass=functools.partial(RecordedTestResult, recorder=recorder))
+    with recorder:
+        result = runner.run(suite)
+
+    recorder.write_json(args.json)
+    if args.folded:
+        recorder.write_folded(args.folded)
+    print(json.dumps(recorder.get_summary(), indent=2))
+    sys.exit(not result.wasSuccessful())
+
+
+if __name__ == "__main__":
+    main()
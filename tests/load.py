@@ -0,0 +1,291 @@
+"""
+Synthetic load generator and throughput benchmark against the local ledger.
+
+    python -m tests.load --seed 1 --users 100 --pools 50 --groups 10000
+
+The workload is mostly swaps with some add/remove liquidity and occasional flash loans spread across many pools.
+Every group is validated against a shadow pool model (tests/amm.py) while the workload is generated so full blocks
+can be evaluated without failures. The same seed always generates the same signed workload.
+"""
+import argparse
+import base64
+import json
+import random
+import time
+from math import isqrt
+
+import msgpack
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk import encoding
+from algosdk.future import transaction
+from nacl.signing import SigningKey
+
+from . import amm
+from .constants import *
+from .core import BaseTestCase, TransactionBuilderMixin
+from .fees import set_min_fees
+from .fuzz import get_asset_ids, get_pool_local_state
+from .utils import get_pool_logicsig_bytecode
+
+METHOD_WEIGHTS = {
+    METHOD_SWAP: 85,
+    METHOD_ADD_LIQUIDITY: 7,
+    METHOD_REMOVE_LIQUIDITY: 6,
+    METHOD_FLASH_LOAN: 2,
+}
+BLOCK_TIMESTAMP_DELTA = 4
+USER_ASSET_BALANCE = 10 ** 15
+
+
+def generate_deterministic_account(rng):
+    signing_key = SigningKey(rng.randbytes(32))
+    private_key = base64.b64encode(bytes(signing_key) + bytes(signing_key.verify_key)).decode()
+    return private_key, encoding.encode_address(bytes(signing_key.verify_key))
+
+
+def get_percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    return {f'p{q}': values[round(q / 100 * (len(values) - 1))] for q in (50, 90, 99)}
+
+
+class LoadGenerator(TransactionBuilderMixin):
+    # The ledger helpers of BaseTestCase use only the ledger, app_creator_address and pool_address attributes
+    create_amm_app = BaseTestCase.create_amm_app
+    get_pool_state = BaseTestCase.get_pool_state
+
+    def __init__(self, seed=0, user_count=100, pool_count=50):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.sp = get_suggested_params()
+        self.app_creator_sk, self.app_creator_address = generate_deterministic_account(self.rng)
+        self.users = [generate_deterministic_account(self.rng) for _ in range(user_count)]
+        self.pools = []
+        # Shadow model state of the pools and the user balances, keyed by pool address and (user index, asset id)
+        self.pool_states = {}
+        self.balances = {}
+        self.setup_ledger(pool_count)
+
+    def setup_ledger(self, pool_count):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        for user_sk, user_addr in self.users:
+            self.ledger.set_account_balance(user_addr, 10 ** 12)
+
+        for index in range(pool_count):
+            asset_1_id, asset_2_id, pool_token_asset_id = get_asset_ids(index)
+            pool_address = get_pool_logicsig_bytecode(amm_pool_template, APPLICATION_ID, asset_1_id, asset_2_id).address()
+            asset_1_reserves = self.rng.randint(10 ** 9, 10 ** 13)
+            asset_2_reserves = self.rng.randint(10 ** 9, 10 ** 13)
+            issued_pool_tokens = isqrt(asset_1_reserves * asset_2_reserves)
+            pool = dict(
+                asset_1_reserves=asset_1_reserves,
+                asset_2_reserves=asset_2_reserves,
+                issued_pool_tokens=issued_pool_tokens,
+                total_fee_share=TOTAL_FEE_SHARE,
+                protocol_fee_ratio=PROTOCOL_FEE_RATIO,
+                asset_1_protocol_fees=0,
+                asset_2_protocol_fees=0,
+            )
+            pool_state = get_pool_local_state(pool, asset_1_id, asset_2_id, pool_token_asset_id)
+
+            self.ledger.set_account_balance(pool_address, 1_000_000)
+            self.ledger.set_auth_addr(pool_address, APPLICATION_ADDRESS)
+            self.ledger.set_account_balance(pool_address, asset_1_reserves, asset_id=asset_1_id)
+            self.ledger.set_account_balance(pool_address, asset_2_reserves, asset_id=asset_2_id)
+            self.ledger.create_asset(asset_id=pool_token_asset_id, params=dict(creator=APPLICATION_ADDRESS))
+            self.ledger.set_account_balance(pool_address, POOL_TOKEN_TOTAL_SUPPLY - (issued_pool_tokens - LOCKED_POOL_TOKENS), asset_id=pool_token_asset_id)
+            self.ledger.set_local_state(address=pool_address, app_id=APPLICATION_ID, state=pool_state)
+
+            # The pool tokens are distributed to the users
+            user_pool_tokens = (issued_pool_tokens - LOCKED_POOL_TOKENS) // len(self.users)
+            for user_index, (user_sk, user_addr) in enumerate(self.users):
+                for asset_id, amount in ((asset_1_id, USER_ASSET_BALANCE), (asset_2_id, USER_ASSET_BALANCE), (pool_token_asset_id, user_pool_tokens)):
+                    self.ledger.set_account_balance(user_addr, amount, asset_id=asset_id)
+                    self.balances[(user_index, asset_id)] = amount
+
+            self.pools.append(dict(address=pool_address, asset_1_id=asset_1_id, asset_2_id=asset_2_id, pool_token_asset_id=pool_token_asset_id))
+            self.pool_states[pool_address] = pool_state
+
+    def use(self, user_index, pool):
+        # The group builders use the user and pool attributes
+        self.user_sk, self.user_addr = self.users[user_index]
+        self.pool_address = pool['address']
+        self.asset_1_id = pool['asset_1_id']
+        self.asset_2_id = pool['asset_2_id']
+        self.pool_token_asset_id = pool['pool_token_asset_id']
+
+    def generate_operation(self, user_index, pool, method):
+        """
+        Returns (new_pool_state, user_balance_deltas, txn_group) of a random operation or raises LogicError.
+        user_balance_deltas are keyed by asset id.
+        """
+        rng = self.rng
+        state = self.pool_states[pool['address']]
+        asset_ids = (pool['asset_1_id'], pool['asset_2_id'])
+
+        if method == METHOD_SWAP:
+            input_asset = rng.choice((1, 2))
+            input_asset_id, output_asset_id = asset_ids[input_asset - 1], asset_ids[2 - input_asset]
+            input_supply, output_supply = amm.get_swap_reserves(state, input_asset_id)
+            if rng.random() < 0.9:
+                mode = "fixed-input"
+                input_amount = rng.randint(1, max(1, input_supply // 1000))
+                min_output = 0
+            else:
+                mode = "fixed-output"
+                min_output = rng.randint(1, max(1, output_supply // 1000))
+                required_input_amount, _ = amm.get_fixed_output_swap_quote(state, input_asset_id, min_output)
+                input_amount = required_input_amount + rng.choice((0, rng.randint(1, 1000)))
+            new_state, result = amm.swap(state, input_asset_id, input_amount, mode, min_output)
+            deltas = {input_asset_id: result['change'] - input_amount, output_asset_id: result['output_amount']}
+            txn_group = self.get_swap_transactions(input_asset_id, input_amount, mode, min_output)
+
+        elif method == METHOD_ADD_LIQUIDITY:
+            asset_1_amount = rng.randint(1, max(1, state[b'asset_1_reserves'] // 1000))
+            asset_2_amount = rng.randint(1, max(1, state[b'asset_2_reserves'] // 1000))
+            mode = rng.choice(("flexible", "single_1", "single_2"))
+            if mode == "single_1":
+                asset_2_amount = None
+            elif mode == "single_2":
+                asset_1_amount = None
+            new_state, result = amm.add_liquidity(state, asset_1_amount, asset_2_amount)
+            deltas = {asset_ids[0]: -(asset_1_amount or 0), asset_ids[1]: -(asset_2_amount or 0), pool['pool_token_asset_id']: result['pool_tokens_out']}
+            txn_group = self.get_add_liquidity_transactions(asset_1_amount, asset_2_amount)
+
+        elif method == METHOD_REMOVE_LIQUIDITY:
+            user_pool_tokens = self.balances[(user_index, pool['pool_token_asset_id'])]
+            removed_pool_token_amount = rng.randint(1, max(1, user_pool_tokens // 10))
+            output_asset_id = rng.choice((None, *asset_ids))
+            new_state, result = amm.remove_liquidity(state, removed_pool_token_amount, output_asset_id=output_asset_id)
+            deltas = {asset_ids[0]: result['asset_1_amount'], asset_ids[1]: result['asset_2_amount'], pool['pool_token_asset_id']: -removed_pool_token_amount}
+            if output_asset_id:
+                txn_group = self.get_remove_liquidity_single_transactions(removed_pool_token_amount, output_asset_id)
+            else:
+                txn_group = self.get_remove_liquidity_transactions(removed_pool_token_amount)
+
+        else:
+            amounts = [rng.randint(1, max(1, state[b'asset_1_reserves'] // 100)), rng.randint(1, max(1, state[b'asset_2_reserves'] // 100))]
+            if rng.random() < 0.8:
+                amounts[rng.randrange(2)] = 0
+            repayment_amounts = [
+                amount + amm.calculate_fixed_input_fee_amounts(amount, state[b'total_fee_share'], state[b'protocol_fee_ratio'])[0] if amount else 0
+                for amount in amounts
+            ]
+            new_state, result = amm.flash_loan(state, *amounts, *repayment_amounts)
+            deltas = {asset_ids[i]: amounts[i] - repayment_amounts[i] for i in range(2)}
+            txn_group = self.get_flash_loan_transactions(*amounts, *repayment_amounts)
+
+        for asset_id, delta in deltas.items():
+            if self.balances[(user_index, asset_id)] + delta < 0:
+                raise amm.LogicError("insufficient user balance")
+        return new_state, deltas, txn_group
+
+    def generate_workload(self, group_count):
+        """ Returns a list of (method, signed transactions), it only depends on the seed and the initial state """
+        methods = list(METHOD_WEIGHTS)
+        weights = list(METHOD_WEIGHTS.values())
+        workload = []
+        while len(workload) < group_count:
+            user_index = self.rng.randrange(len(self.users))
+            pool = self.rng.choice(self.pools)
+            method = self.rng.choices(methods, weights)[0]
+            self.use(user_index, pool)
+            try:
+                new_state, deltas, txn_group = self.generate_operation(user_index, pool, method)
+            except amm.LogicError:
+                continue
+
+            set_min_fees(txn_group, self.pool_states)
+            # Identical groups would have the same transaction ids
+            txn_group[-1].note = len(workload).to_bytes(8, 'big')
+            txn_group = transaction.assign_group_id(txn_group)
+            workload.append((method, self.sign_txns(txn_group, self.user_sk)))
+
+            self.pool_states[pool['address']] = new_state
+            for asset_id, delta in deltas.items():
+                self.balances[(user_index, asset_id)] += delta
+        return workload
+
+    def get_pool_local_state_size(self):
+        return sum(len(msgpack.packb(self.get_pool_state(pool['address']))) for pool in self.pools)
+
+    def run(self, workload, txns_per_block=1_000, latency_sample_rate=0.01):
+        """
+        Evaluates the workload in full blocks and returns a report.
+        A sample of the groups is evaluated in single group blocks to measure the latency per method.
+        """
+        rng = random.Random(self.seed)
+        block_timestamp = BLOCK_TIME_DELTA
+        latencies = {method: [] for method in METHOD_WEIGHTS}
+        block_stxns = []
+        eval_seconds = 0
+        block_count = 0
+        transaction_count = 0
+        state_growth = [dict(block=0, accounts=len(self.ledger.accounts), pool_local_state_bytes=self.get_pool_local_state_size())]
+
+        def eval_block(stxns):
+            nonlocal block_timestamp, eval_seconds, block_count, transaction_count
+            start = time.perf_counter()
+            self.ledger.eval_transactions(stxns, block_timestamp=block_timestamp)
+            duration = time.perf_counter() - start
+            eval_seconds += duration
+            block_count += 1
+            transaction_count += len(stxns)
+            block_timestamp += BLOCK_TIMESTAMP_DELTA
+            state_growth.append(dict(block=block_count, accounts=len(self.ledger.accounts), pool_local_state_bytes=self.get_pool_local_state_size()))
+            return duration
+
+        for method, stxns in workload:
+            if rng.random() < latency_sample_rate:
+                if block_stxns:
+                    eval_block(block_stxns)
+                    block_stxns = []
+                latencies[method].append(eval_block(stxns))
+                continue
+            if len(block_stxns) + len(stxns) > txns_per_block:
+                eval_block(block_stxns)
+                block_stxns = []
+            block_stxns += stxns
+        if block_stxns:
+            eval_block(block_stxns)
+
+        return dict(
+            seed=self.seed,
+            users=len(self.users),
+            pools=len(self.pools),
+            groups=len(workload),
+            transactions=transaction_count,
+            blocks=block_count,
+            eval_seconds=eval_seconds,
+            transactions_per_second=transaction_count / eval_seconds if eval_seconds else 0,
+            latency={method: dict(count=len(values), **get_percentiles(values)) for method, values in latencies.items()},
+            state_growth=state_growth,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--pools", type=int, default=50)
+    parser.add_argument("--groups", type=int, default=10_000)
+    parser.add_argument("--txns-per-block", type=int, default=1_000)
+    parser.add_argument("--latency-sample-rate", type=float, default=0.01)
+    parser.add_argument("--output", help="Writes the JSON report to the file instead of stdout")
+    args = parser.parse_args()
+
+    generator = LoadGenerator(seed=args.seed, user_count=args.users, pool_count=args.pools)
+    workload = generator.generate_workload(args.groups)
+    report = generator.run(workload, txns_per_block=args.txns_per_block, latency_sample_rate=args.latency_sample_rate)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Round-aware pool state cache.
+
+An entry is valid from the round it was loaded until a block changes the local state of the pool, the blocks are applied
+with apply_block and the entries of the pools in the ld deltas of the app calls to APPLICATION_ID are dropped.
+
+The read path takes no lock: a dict lookup and a store of the access tick are atomic. The writes (loads, invalidations
+and evictions) are serialized by a lock. The eviction is approximate LRU, the least recently read entries are dropped
+in batches when the size bound is exceeded.
+
+    cache = PoolStateCache(lambda address: dict(ledger.accounts[address]['local_states'][APPLICATION_ID]))
+    pool_state = cache.get(pool_address)
+"""
+import threading
+from itertools import count
+from types import MappingProxyType
+
+from algosdk.encoding import encode_address
+
+from .constants import *
+
+
+def get_app_calls(block, app_id=APPLICATION_ID):
+    """ Yields (txn, apply data) of the calls of the app in the block in order, the inner transactions are included """
+    block_txns = list(reversed(block[b'txns']))
+    while block_txns:
+        block_txn = block_txns.pop()
+        txn = block_txn[b'txn']
+        apply_data = block_txn.get(b'dt', {})
+        if txn.get(b'apid') == app_id:
+            yield txn, apply_data
+        block_txns.extend(reversed(apply_data.get(b'itx', [])))
+
+
+def get_local_state_deltas(block, app_id=APPLICATION_ID):
+    """ Yields (address, local state delta) of the app calls in the block in order """
+    for txn, apply_data in get_app_calls(block, app_id):
+        # The account index 0 is the sender, the others are the indexes of Txn.Accounts + 1
+        accounts = [txn[b'snd'], *txn.get(b'apat', [])]
+        for account_index, delta in apply_data.get(b'ld', {}).items():
+            yield encode_address(accounts[account_index]), delta
+
+
+def get_touched_pool_addresses(block, app_id=APPLICATION_ID):
+    """ Returns the addresses with local state changes of the app in the block """
+    return {address for address, _ in get_local_state_deltas(block, app_id)}
+
+
+class PoolStateCache:
+
+    def __init__(self, loader, max_size=10_000, round=0):
+        """ loader(address) returns the pool state of the current round """
+        self.loader = loader
+        self.max_size = max_size
+        self.round = round
+        # address: (valid from round, read-only pool state, [last access tick])
+        self.entries = {}
+        # address: [[valid]] of the loads in progress
+        self.pending_loads = {}
+        self.ticks = count()
+        self.lock = threading.Lock()
+        # The metrics are counted per thread so the reads do not share a counter
+        self.thread_metrics = threading.local()
+        self.all_thread_metrics = []
+
+    def get_thread_metrics(self):
+        metrics = getattr(self.thread_metrics, 'metrics', None)
+        if metrics is None:
+            metrics = self.thread_metrics.metrics = dict(hits=0, misses=0)
+            with self.lock:
+                self.all_thread_metrics.append(metrics)
+        return metrics
+
+    def get(self, address, round=None):
+        """
+        Returns the read-only pool state of the round, the current round by default.
+        A past round is served only if the cached entry is still valid at that round.
+        """
+        if round is None:
+            round = self.round
+        metrics = self.get_thread_metrics()
+        entry = self.entries.get(address)
+        if entry is not None and entry[0] <= round <= self.round:
+            entry[2][0] = next(self.ticks)
+            metrics['hits'] += 1
+            return entry[1]
+
+        metrics['misses'] += 1
+        if round != self.round:
+            raise LookupError(f"The state of {address} at round {round} is not cached")
+        return self.load(address)
+
+    def load(self, address):
+        """ The loaded state is not cached if a block is applied or the pool is invalidated while it is loaded """
+        valid = [True]
+        with self.lock:
+            round = self.round
+            self.pending_loads.setdefault(address, []).append(valid)
+        try:
+            pool_state = MappingProxyType(self.loader(address))
+        finally:
+            with self.lock:
+                pending_loads = [flag for flag in self.pending_loads[address] if flag is not valid]
+                if pending_loads:
+                    self.pending_loads[address] = pending_loads
+                else:
+                    del self.pending_loads[address]
+        with self.lock:
+            if valid[0] and round == self.round:
+                self.entries[address] = (round, pool_state, [next(self.ticks)])
+                if len(self.entries) > self.max_size:
+                    self.evict(address)
+        return pool_state
+
+    def evict(self, loaded_address):
+        """ Drops the least recently read entries down to 90% of max_size but the loaded one, it is called with the lock """
+        entries = sorted((item for item in self.entries.items() if item[0] != loaded_address), key=lambda item: item[1][2][0])
+        for address, _ in entries[:len(self.entries) - max(self.max_size * 9 // 10, 1)]:
+            del self.entries[address]
+
+    def invalidate(self, addresses):
+        with self.lock:
+            for address in addresses:
+                self.entries.pop(address, None)
+                for valid in self.pending_loads.get(address, ()):
+                    valid[0] = False
+
+    def apply_block(self, round, block):
+        """ The block of the round is evaluated, the entries of the changed pools are dropped """
+        self.invalidate(get_touched_pool_addresses(block))
+        self.round = round
+
+    def get_metrics(self):
+        with self.lock:
+            hits = sum(metrics['hits'] for metrics in self.all_thread_metrics)
+            misses = sum(metrics['misses'] for metrics in self.all_thread_metrics)
+        return dict(hits=hits, misses=misses, hit_rate=hits / (hits + misses) if hits + misses else 0.0, size=len(self.entries))
@@ -0,0 +1,244 @@
+"""
+Struct-of-arrays table of the pools.
+
+The integer fields of the pool states are uint64 columns aligned by row, a pool is found by its address or its asset
+pair in O(1). The cumulative prices do not fit in uint64 and they are kept in a side dict by row.
+
+The columns are array('Q') in memory. A saved table is loaded with mmap and the columns are memoryviews of the file,
+slices of a column are memoryviews too so nothing is copied. The delta updates of the columns of a loaded table are
+written to the file if it is opened writable. The cumulative prices of a loaded table are in memory only, their updates
+are lost unless the table is saved to another path.
+
+    table = PoolTable.from_pool_states(pool_states)
+    table.apply_block(block)
+    asset_1_reserves = table.columns['asset_1_reserves'][table.get_row(pool_address)]
+
+    python -m tests.pool_table --pools 20000
+
+benchmarks the lookups, the updates and the persistence.
+"""
+import argparse
+import json
+import mmap
+import os
+import random
+import time
+from array import array
+from math import isqrt
+
+from .constants import *
+from .pool_cache import get_local_state_deltas
+
+COLUMN_KEYS = (
+    'asset_1_id',
+    'asset_2_id',
+    'pool_token_asset_id',
+    'asset_1_reserves',
+    'asset_2_reserves',
+    'issued_pool_tokens',
+    'asset_1_protocol_fees',
+    'asset_2_protocol_fees',
+    'total_fee_share',
+    'protocol_fee_ratio',
+    'cumulative_price_update_timestamp',
+)
+CUMULATIVE_PRICE_KEYS = ('asset_1_cumulative_price', 'asset_2_cumulative_price')
+COLUMN_INDEXES = {key.encode(): index for index, key in enumerate(COLUMN_KEYS)}
+CUMULATIVE_PRICE_INDEXES = {key.encode(): index for index, key in enumerate(CUMULATIVE_PRICE_KEYS)}
+
+FILE_MAGIC = b"POOLTBL1"
+# magic, header length, the JSON header is padded to 8 bytes so the columns are aligned
+HEADER_PREFIX_SIZE = 16
+
+
+def get_cumulative_price(value):
+    return int.from_bytes(value, 'big') if isinstance(value, bytes) else value
+
+
+class PoolTable:
+
+    def __init__(self, addresses, columns, cumulative_prices=None, file=None, path=None):
+        """ columns are in COLUMN_KEYS order, use from_pool_states or load """
+        self.addresses = addresses
+        self.columns = dict(zip(COLUMN_KEYS, columns))
+        self.column_list = columns
+        # row: [asset_1_cumulative_price, asset_2_cumulative_price]
+        self.cumulative_prices = cumulative_prices or {}
+        self.file = file
+        # The path of the memory mapped file of a loaded table
+        self.path = path
+        self.rows = {address: row for row, address in enumerate(addresses)}
+        asset_1_ids, asset_2_ids = self.columns['asset_1_id'], self.columns['asset_2_id']
+        self.pair_rows = {(asset_1_ids[row], asset_2_ids[row]): row for row in range(len(addresses))}
+
+    @classmethod
+    def from_pool_states(cls, pool_states):
+        table = cls([], [array('Q') for _ in COLUMN_KEYS])
+        for address, pool_state in pool_states.items():
+            table.add(address, pool_state)
+        return table
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def add(self, address, pool_state):
+        """ Returns the row of the new pool, the columns of a loaded table can not grow """
+        if self.file is not None:
+            raise ValueError("A loaded table can not grow")
+        if address in self.rows:
+            raise ValueError(f"{address} is already in the table")
+        row = len(self.addresses)
+        for key, column in zip(COLUMN_KEYS, self.column_list):
+            column.append(pool_state.get(key.encode(), 0))
+        self.addresses.append(address)
+        self.rows[address] = row
+        self.pair_rows[(pool_state[b'asset_1_id'], pool_state[b'asset_2_id'])] = row
+        cumulative_prices = [get_cumulative_price(pool_state.get(key.encode(), 0)) for key in CUMULATIVE_PRICE_KEYS]
+        if any(cumulative_prices):
+            self.cumulative_prices[row] = cumulative_prices
+        return row
+
+    def get_row(self, address):
+        return self.rows[address]
+
+    def find(self, asset_a_id, asset_b_id):
+        """ Returns the row of the pool of the asset pair in any order or None """
+        return self.pair_rows.get((max(asset_a_id, asset_b_id), min(asset_a_id, asset_b_id)))
+
+    def get_pool_state(self, row):
+        pool_state = {key.encode(): column[row] for key, column in zip(COLUMN_KEYS, self.column_list)}
+        for key, value in zip(CUMULATIVE_PRICE_KEYS, self.cumulative_prices.get(row, (0, 0))):
+            pool_state[key.encode()] = value
+        return pool_state
+
+    def get_slice(self, start, stop):
+        """ Returns the columns of the rows [start, stop) without copying """
+        return {key: memoryview(column)[start:stop] for key, column in self.columns.items()}
+
+    def apply_state_delta(self, address, delta):
+        """ Applies a local state delta of a block (b'ld'), the deltas of the unknown addresses are ignored """
+        row = self.rows.get(address)
+        if row is None:
+            return False
+        for key, value_delta in delta.items():
+            # at: 1 sets bytes, 2 sets an integer, 3 deletes
+            value = value_delta.get(b'bs', b'') if value_delta[b'at'] == 1 else value_delta.get(b'ui', 0)
+            if key in COLUMN_INDEXES:
+                self.column_list[COLUMN_INDEXES[key]][row] = value
+            elif key in CUMULATIVE_PRICE_INDEXES:
+                self.cumulative_prices.setdefault(row, [0, 0])[CUMULATIVE_PRICE_INDEXES[key]] = get_cumulative_price(value)
+        return True
+
+    def apply_block(self, block, app_id=APPLICATION_ID):
+        """ Returns the number of the applied deltas """
+        return sum(self.apply_state_delta(address, delta) for address, delta in get_local_state_deltas(block, app_id))
+
+    def save(self, path):
+        """ The columns of a loaded table are views of its file, it can not be saved to the same file """
+        if self.file is not None and os.path.exists(path) and os.path.samefile(path, self.path):
+            raise ValueError(f"{path} is the file of the loaded table")
+        header = json.dumps(dict(
+            addresses=self.addresses,
+            columns=COLUMN_KEYS,
+            cumulative_prices={row: [str(price) for price in prices] for row, prices in self.cumulative_prices.items()},
+        )).encode()
+        header += b" " * (-len(header) % 8)
+        with open(path, "wb") as f:
+            f.write(FILE_MAGIC + len(header).to_bytes(8, 'little') + header)
+            for column in self.column_list:
+                f.write(column)
+
+    @classmethod
+    def load(cls, path, writable=False):
+        """
+        The columns are views of the memory mapped file, the cumulative prices are loaded into memory and the updates of
+        them are not written to the file.
+        """
+        with open(path, "r+b" if writable else "rb") as f:
+            file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        view = memoryview(file)
+        if view[:len(FILE_MAGIC)] != FILE_MAGIC:
+            raise ValueError(f"{path} is not a pool table")
+        header_size = int.from_bytes(view[len(FILE_MAGIC):HEADER_PREFIX_SIZE], 'little')
+        header = json.loads(bytes(view[HEADER_PREFIX_SIZE:HEADER_PREFIX_SIZE + header_size]))
+        if tuple(header['columns']) != COLUMN_KEYS:
+            raise ValueError(f"{path} has different columns")
+
+        row_count = len(header['addresses'])
+        offset = HEADER_PREFIX_SIZE + header_size
+        columns = []
+        for _ in COLUMN_KEYS:
+            columns.append(view[offset:offset + row_count * 8].cast('Q'))
+            offset += row_count * 8
+        cumulative_prices = {int(row): [int(price) for price in prices] for row, prices in header['cumulative_prices'].items()}
+        return cls(header['addresses'], columns, cumulative_prices, file=file, path=path)
+
+    def close(self):
+        """ Releases the memory mapped file of a loaded table """
+        if self.file is not None:
+            for column in self.column_list:
+                column.release()
+            self.file.close()
+            self.file = None
+            self.path = None
+
+
+def get_random_pool_states(pool_count, seed=0):
+    """ Returns {address: pool_state} of pool_count pools with random reserves, the addresses are pool_{index} """
+    rng = random.Random(seed)
+    pool_states = {}
+    for index in range(pool_count):
+        asset_1_reserves = rng.randint(10 ** 6, 10 ** 13)
+        asset_2_reserves = rng.randint(10 ** 6, 10 ** 13)
+        pool_states[f"pool_{index}"] = {
+            b'asset_1_id': 2 * index + 2,
+            b'asset_2_id': 2 * index + 1 if index % 3 else ALGO_ASSET_ID,
+            b'pool_token_asset_id': 10 ** 9 + index,
+            b'asset_1_reserves': asset_1_reserves,
+            b'asset_2_reserves': asset_2_reserves,
+            b'issued_pool_tokens': isqrt(asset_1_reserves * asset_2_reserves),
+            b'asset_1_protocol_fees': 0,
+            b'asset_2_protocol_fees': 0,
+            b'total_fee_share': TOTAL_FEE_SHARE,
+            b'protocol_fee_ratio': PROTOCOL_FEE_RATIO,
+        }
+    return pool_states
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pools", type=int, default=20_000)
+    parser.add_argument("--path", default="/tmp/pool_table.bin")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool_states = get_random_pool_states(args.pools, args.seed)
+    report = dict(pools=args.pools)
+
+    start = time.perf_counter()
+    table = PoolTable.from_pool_states(pool_states)
+    report['build_seconds'] = time.perf_counter() - start
+
+    addresses = [rng.choice(table.addresses) for _ in range(100_000)]
+    start = time.perf_counter()
+    for address in addresses:
+        table.apply_state_delta(address, {b'asset_1_reserves': {b'at': 2, b'ui': 1}, b'asset_2_reserves': {b'at': 2, b'ui': 2}})
+    report['update_microseconds'] = (time.perf_counter() - start) / len(addresses) * 1e6
+
+    start = time.perf_counter()
+    table.save(args.path)
+    report['save_seconds'] = time.perf_counter() - start
+    start = time.perf_counter()
+    loaded_table = PoolTable.load(args.path)
+    report['load_seconds'] = time.perf_counter() - start
+    start = time.perf_counter()
+    total_reserves = sum(loaded_table.columns['asset_1_reserves'])
+    report['column_sum_seconds'] = time.perf_counter() - start
+    assert total_reserves == sum(table.columns['asset_1_reserves'])
+    loaded_table.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
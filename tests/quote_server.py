@@ -0,0 +1,264 @@
+"""
+Local quote service of the pools of a PoolTable.
+
+    GET /v1/status
+    GET /v1/quotes/swap?pool={address}&asset_id={input asset id}&amount={amount}&mode=fixed-input|fixed-output
+    GET /v1/quotes/add-liquidity?pool={address}&asset_1_amount={amount}&asset_2_amount={amount}
+    GET /v1/quotes/remove-liquidity?pool={address}&pool_token_amount={amount}[&asset_id={single output asset id}]
+
+The quotes are the results of the functions of amm.py at the price oracle timestamp of the pool, so they are exactly
+the amounts of the contract. The amount of a fixed-output swap is the output amount and the quote has the required
+input amount. A quote which would fail in the contract is a 400 response with the failing line.
+
+The concurrent requests are coalesced: the requests received in the same iteration of the event loop are answered in
+one batch for the same round, the identical requests of a batch are computed once and the state of a pool is read from
+the table once per batch. The blocks are applied with apply_block between the batches.
+
+    python -m tests.quote_server --pools 1000 --requests 20000 --concurrency 1 16 64 256
+
+benchmarks the p50/p99 latencies and the throughput at the concurrency levels.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from urllib.parse import parse_qsl
+
+from . import amm
+from .algod import AlgodClient, AlgodError
+from .constants import *
+from .pool_table import PoolTable, get_random_pool_states
+
+# The query parameters of the quotes, the missing ones are None as in amm.py, the amounts and the asset ids are integers
+QUOTE_PARAMETERS = {
+    "swap": ("asset_id", "amount", "mode"),
+    "add-liquidity": ("asset_1_amount", "asset_2_amount"),
+    "remove-liquidity": ("pool_token_amount", "asset_id"),
+}
+
+
+class QuoteError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+def parse_quote_request(method, query):
+    """ Returns (pool address, method, args) of the query parameters, args is hashable so the requests can be coalesced """
+    if method not in QUOTE_PARAMETERS:
+        raise QuoteError("404 Not Found", f"{method} is not a quote")
+    params = dict(parse_qsl(query))
+    if "pool" not in params:
+        raise QuoteError("400 Bad Request", "pool is required")
+    try:
+        args = tuple(params.get(key) if key == "mode" or key not in params else int(params[key]) for key in QUOTE_PARAMETERS[method])
+    except ValueError as e:
+        raise QuoteError("400 Bad Request", str(e))
+    return params["pool"], method, args
+
+
+def get_quote(pool_state, method, args):
+    """ Returns the result of amm.py, raises amm.LogicError if the operation fails in the contract """
+    timestamp = amm.get_price_oracle_timestamp(pool_state)
+    if method == "swap":
+        asset_id, amount, mode = args
+        if mode in (None, "fixed-input"):
+            _, result = amm.swap(pool_state, asset_id, amount, "fixed-input", 0, timestamp=timestamp)
+        else:
+            # The change of the maximum input amount is the excess
+            _, result = amm.swap(pool_state, asset_id, MAX_ASSET_AMOUNT, mode, amount, timestamp=timestamp)
+            result.update(input_amount=MAX_ASSET_AMOUNT - result['change'], change=0)
+    elif method == "add-liquidity":
+        _, result = amm.add_liquidity(pool_state, *args, timestamp=timestamp)
+    else:
+        pool_token_amount, output_asset_id = args
+        _, result = amm.remove_liquidity(pool_state, pool_token_amount, output_asset_id=output_asset_id, timestamp=timestamp)
+    return result
+
+
+class QuoteServer:
+    """
+    Serves the quotes of the pools of the table over HTTP/1.1 with keep-alive.
+
+        server = await QuoteServer(PoolTable.from_pool_states(pool_states)).start()
+        server.apply_block(round, block)
+        await server.close()
+    """
+
+    def __init__(self, table, host="127.0.0.1", port=0, round=0):
+        self.table = table
+        self.host = host
+        self.port = port
+        self.round = round
+        self.request_count = 0
+        self.quote_count = 0
+        self.batch_count = 0
+        # The futures of the requests of the next batch by (pool address, method, args)
+        self.pending = {}
+        self.server = None
+        # The connection handler tasks by writer
+        self.connections = {}
+
+    async def start(self):
+        # The default backlog of 100 drops the connections of a burst of clients, they are retried after a second
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port, backlog=1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        for writer in list(self.connections):
+            writer.close()
+        await asyncio.gather(*self.connections.values(), return_exceptions=True)
+        await self.server.wait_closed()
+
+    def apply_block(self, round, block):
+        """ The quotes of the following batches are of the round """
+        self.table.apply_block(block)
+        self.round = round
+
+    async def handle_connection(self, reader, writer):
+        self.connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, value = line.decode().split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                await reader.readexactly(int(headers.get("content-length", 0)))
+
+                self.request_count += 1
+                status, response = await self.handle_request(method, path)
+                response_body = json.dumps(response).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(response_body)}\r\n\r\n".encode()
+                    + response_body
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections.pop(writer, None)
+            writer.close()
+
+    async def handle_request(self, method, path):
+        path, _, query = path.partition("?")
+        parts = path.strip("/").split("/")
+        if method == "GET" and parts == ["v1", "status"]:
+            return "200 OK", dict(round=self.round, pools=len(self.table))
+        if method != "GET" or len(parts) != 3 or parts[:2] != ["v1", "quotes"]:
+            return "404 Not Found", {"message": f"{method} {path} is not supported"}
+        try:
+            return "200 OK", await self.quote(*parse_quote_request(parts[2], query))
+        except QuoteError as e:
+            return e.status, {"message": e.message}
+
+    async def quote(self, pool_address, method, args):
+        """ Returns dict(round, quote), the request joins the next batch """
+        key = (pool_address, method, args)
+        if key not in self.pending:
+            if not self.pending:
+                asyncio.get_running_loop().call_soon(self.flush)
+            self.pending[key] = asyncio.get_running_loop().create_future()
+        # shield keeps the shared future if one of the requests is cancelled
+        return await asyncio.shield(self.pending[key])
+
+    def flush(self):
+        """ Answers the pending requests, the batch is computed without yielding so it sees a single round """
+        pending, self.pending = self.pending, {}
+        self.batch_count += 1
+        requests_by_pool = defaultdict(list)
+        for key in pending:
+            requests_by_pool[key[0]].append(key)
+
+        for pool_address, keys in requests_by_pool.items():
+            row = self.table.rows.get(pool_address)
+            pool_state = None if row is None else self.table.get_pool_state(row)
+            for key in keys:
+                future = pending[key]
+                if pool_state is None:
+                    future.set_exception(QuoteError("404 Not Found", f"{pool_address} is not a pool"))
+                    continue
+                self.quote_count += 1
+                try:
+                    future.set_result(dict(round=self.round, quote=get_quote(pool_state, key[1], key[2])))
+                except amm.LogicError as e:
+                    future.set_exception(QuoteError("400 Bad Request", str(e)))
+
+
+def get_random_paths(pool_states, request_count, seed=0):
+    rng = random.Random(seed)
+    addresses = list(pool_states)
+    paths = []
+    for _ in range(request_count):
+        address = rng.choice(addresses)
+        pool_state = pool_states[address]
+        kind = rng.random()
+        if kind < 0.8:
+            asset_id = pool_state[rng.choice([b'asset_1_id', b'asset_2_id'])]
+            # Round amounts so the identical requests can be coalesced
+            paths.append(f"/v1/quotes/swap?pool={address}&asset_id={asset_id}&amount={rng.choice([10 ** 4, 10 ** 5, 10 ** 6])}")
+        elif kind < 0.9:
+            paths.append(f"/v1/quotes/add-liquidity?pool={address}&asset_1_amount={10 ** 6}&asset_2_amount={10 ** 6}")
+        else:
+            paths.append(f"/v1/quotes/remove-liquidity?pool={address}&pool_token_amount={10 ** 5}&asset_id={pool_state[b'asset_1_id']}")
+    return paths
+
+
+async def run_benchmark(pool_count, request_count, concurrency_levels):
+    pool_states = get_random_pool_states(pool_count)
+    paths = get_random_paths(pool_states, request_count)
+    server = await QuoteServer(PoolTable.from_pool_states(pool_states)).start()
+    report = {}
+    try:
+        for concurrency in concurrency_levels:
+            latencies = []
+
+            async def run_worker(client, worker_paths):
+                for path in worker_paths:
+                    start = time.perf_counter()
+                    try:
+                        await client.request("GET", path)
+                    except AlgodError:
+                        pass
+                    latencies.append(time.perf_counter() - start)
+
+            request_count, quote_count, batch_count = server.request_count, server.quote_count, server.batch_count
+            async with AlgodClient(server.host, server.port, max_connections=concurrency) as client:
+                start = time.perf_counter()
+                await asyncio.gather(*[run_worker(client, paths[i::concurrency]) for i in range(concurrency)])
+                duration = time.perf_counter() - start
+
+            latencies.sort()
+            batch_count = server.batch_count - batch_count
+            report[f"concurrency_{concurrency}"] = dict(
+                requests_per_second=len(paths) / duration,
+                p50_milliseconds=latencies[len(latencies) // 2] * 1000,
+                p99_milliseconds=latencies[len(latencies) * 99 // 100] * 1000,
+                requests_per_batch=(server.request_count - request_count) / batch_count,
+                computed_quote_ratio=(server.quote_count - quote_count) / (server.request_count - request_count),
+            )
+    finally:
+        await server.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pools", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256])
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run_benchmark(args.pools, args.requests, args.concurrency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
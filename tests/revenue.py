@@ -0,0 +1,198 @@
+"""
+Fee revenue and LP APR of the pools per period from the pool events.
+
+The fees are the logged poolers_fee_amount and protocol_fee_amount of the swaps, the internal swaps of add_liquidity
+and remove_liquidity, the flash loans and the flash swaps (see events.py). The poolers fees stay in the reserves, the
+protocol fees are claimable by the fee collector.
+
+The fees of the events of a pool are summed per period. A period row is finished when an event of the pool falls into
+a later period and it is passed to the sink. The values are in asset 2 at the price of the reserves after the last
+event of the period, the APR is the poolers fee value over the value of the reserves, annualized:
+
+    apr = (asset_1_poolers_fee_amount * price + asset_2_poolers_fee_amount) / (2 * asset_2_reserves) * YEAR / period
+
+The periods without events are not reported.
+
+    with open("revenue.jsonl", "w") as f:
+        aggregator = RevenueAggregator(JsonLinesWriter(f))
+        for event in events:
+            aggregator.add_event(event)
+        aggregator.flush()
+
+    python -m tests.revenue --pools 1000 --events 200000 --workers 0 4
+
+benchmarks the streaming aggregation and the parallel recomputation of the history.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from .constants import *
+from .events import get_partition, get_random_events
+from .pool_table import get_random_pool_states
+
+DAY = 86400
+YEAR = 365 * DAY
+
+
+def get_fee_amounts(event):
+    """ Returns (asset_1_poolers_fee_amount, asset_1_protocol_fee_amount, asset_2_poolers_fee_amount, asset_2_protocol_fee_amount) """
+    logs = event['logs']
+    if event['method'] in (METHOD_VERIFY_FLASH_LOAN, METHOD_VERIFY_FLASH_SWAP):
+        return (
+            logs.get('asset_1_poolers_fee_amount', 0),
+            logs.get('asset_1_protocol_fee_amount', 0),
+            logs.get('asset_2_poolers_fee_amount', 0),
+            logs.get('asset_2_protocol_fee_amount', 0),
+        )
+    if 'poolers_fee_amount' not in logs:
+        return 0, 0, 0, 0
+    # The fee is in the input asset, asset_1_id > asset_2_id
+    if logs['input_asset_id'] > logs['output_asset_id']:
+        return logs['poolers_fee_amount'], logs['protocol_fee_amount'], 0, 0
+    return 0, 0, logs['poolers_fee_amount'], logs['protocol_fee_amount']
+
+
+def get_revenue_row(pool_address, period_start, period, fee_amounts, reserves):
+    asset_1_poolers_fee_amount, asset_1_protocol_fee_amount, asset_2_poolers_fee_amount, asset_2_protocol_fee_amount = fee_amounts
+    asset_1_reserves, asset_2_reserves = reserves
+    row = dict(
+        pool_address=pool_address,
+        period_start=period_start,
+        asset_1_poolers_fee_amount=asset_1_poolers_fee_amount,
+        asset_1_protocol_fee_amount=asset_1_protocol_fee_amount,
+        asset_2_poolers_fee_amount=asset_2_poolers_fee_amount,
+        asset_2_protocol_fee_amount=asset_2_protocol_fee_amount,
+        asset_1_reserves=asset_1_reserves,
+        asset_2_reserves=asset_2_reserves,
+        poolers_fee_value=None,
+        protocol_fee_value=None,
+        apr=None,
+    )
+    # The reserves are unknown until an event of the pool changes them
+    if asset_1_reserves and asset_2_reserves:
+        price = asset_2_reserves / asset_1_reserves
+        row['poolers_fee_value'] = asset_1_poolers_fee_amount * price + asset_2_poolers_fee_amount
+        row['protocol_fee_value'] = asset_1_protocol_fee_amount * price + asset_2_protocol_fee_amount
+        row['apr'] = row['poolers_fee_value'] / (2 * asset_2_reserves) * YEAR / period
+    return row
+
+
+class RevenueAggregator:
+
+    def __init__(self, sink, period=DAY):
+        """ sink(row) is called with the finished period rows, see get_revenue_row """
+        self.sink = sink
+        self.period = period
+        # pool_address: [period start, [fee amounts], [asset_1_reserves, asset_2_reserves]]
+        self.open_periods = {}
+
+    def add_event(self, event):
+        pool_address = event['pool_address']
+        period_start = event['timestamp'] - event['timestamp'] % self.period
+        open_period = self.open_periods.get(pool_address)
+        if open_period is None:
+            open_period = self.open_periods[pool_address] = [period_start, [0, 0, 0, 0], [None, None]]
+        elif open_period[0] != period_start:
+            if period_start < open_period[0]:
+                raise ValueError(f"The events of {pool_address} are not in timestamp order")
+            self.sink(get_revenue_row(pool_address, open_period[0], self.period, *open_period[1:]))
+            # The reserves are carried to the next period
+            open_period[0:2] = [period_start, [0, 0, 0, 0]]
+
+        fee_amounts = open_period[1]
+        for index, amount in enumerate(get_fee_amounts(event)):
+            fee_amounts[index] += amount
+        reserves = open_period[2]
+        if event['asset_1_reserves'] is not None:
+            reserves[0] = event['asset_1_reserves']
+        if event['asset_2_reserves'] is not None:
+            reserves[1] = event['asset_2_reserves']
+
+    def flush(self):
+        """ Passes the open periods to the sink, e.g. at the end of the history """
+        for pool_address, (period_start, fee_amounts, reserves) in self.open_periods.items():
+            self.sink(get_revenue_row(pool_address, period_start, self.period, fee_amounts, reserves))
+        self.open_periods = {}
+
+
+class JsonLinesWriter:
+    """ A sink which writes the rows to the file as they are finished, a JSON object per line """
+
+    def __init__(self, f):
+        self.f = f
+
+    def __call__(self, row):
+        self.f.write(json.dumps(row) + "\n")
+
+
+def aggregate_events(args):
+    """ Returns the rows of the events of a partition of the pools """
+    events, period = args
+    rows = []
+    aggregator = RevenueAggregator(rows.append, period)
+    for event in events:
+        aggregator.add_event(event)
+    aggregator.flush()
+    return rows
+
+
+def recompute(events, path, period=DAY, worker_count=4):
+    """
+    Writes the rows of the historical events in timestamp order to the file, ordered by period and pool.
+    The pools are partitioned to the worker processes, worker_count=0 aggregates in the current process.
+    """
+    partitions = [[] for _ in range(max(worker_count, 1))]
+    for event in events:
+        partitions[get_partition(event['pool_address'], len(partitions))].append(event)
+    if worker_count:
+        with multiprocessing.Pool(worker_count) as pool:
+            rows = [row for partition_rows in pool.map(aggregate_events, [(partition, period) for partition in partitions]) for row in partition_rows]
+    else:
+        rows = aggregate_events((partitions[0], period))
+
+    rows.sort(key=lambda row: (row['period_start'], row['pool_address']))
+    with open(path, "w") as f:
+        writer = JsonLinesWriter(f)
+        for row in rows:
+            writer(row)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pools", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--period", type=int, default=3600)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 4])
+    args = parser.parse_args()
+
+    events = get_random_events(get_random_pool_states(args.pools, args.seed), args.events, seed=args.seed)
+    report = dict(pools=args.pools, events=len(events))
+
+    rows = []
+    aggregator = RevenueAggregator(rows.append, args.period)
+    start = time.perf_counter()
+    for event in events:
+        aggregator.add_event(event)
+    aggregator.flush()
+    report['events_per_second'] = len(events) / (time.perf_counter() - start)
+
+    fd, path = tempfile.mkstemp(prefix="revenue_", suffix=".jsonl")
+    os.close(fd)
+    try:
+        for worker_count in args.workers:
+            start = time.perf_counter()
+            row_count = recompute(events, path, args.period, worker_count)
+            report[f"recompute_{worker_count}_workers"] = dict(seconds=time.perf_counter() - start, rows=row_count)
+    finally:
+        os.remove(path)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Batch transaction signing across a process pool.
+
+    python -m tests.signing --groups 10000
+
+benchmarks the serial sign_txns path against the batch signer with 1, 4 and 16 workers.
+"""
+import argparse
+import base64
+import json
+import multiprocessing
+import time
+
+import msgpack
+from algojig import get_suggested_params
+from algosdk import account, constants
+from algosdk.encoding import msgpack_encode
+from algosdk.future import transaction
+from nacl.signing import SigningKey
+
+from .constants import *
+from .core import TransactionBuilderMixin
+from .utils import get_pool_logicsig_bytecode
+
+packer = msgpack.Packer()
+SIGNATURE_PREFIX = packer.pack_map_header(2) + packer.pack("sig") + packer.pack(bytes(64))[:-64]
+TRANSACTION_PREFIX = packer.pack("txn")
+
+# The signing key of the worker process, it is loaded once by the pool initializer
+worker_signing_key = None
+
+
+def load_signing_key(secret_key):
+    global worker_signing_key
+    worker_signing_key = SigningKey(base64.b64decode(secret_key)[:32])
+
+
+def sign_encoded_transaction(signing_key, encoded_txn):
+    """ Returns the encoded signed transaction of the msgpack encoded transaction, the map of sig and txn """
+    signature = signing_key.sign(constants.txid_prefix + encoded_txn).signature
+    return SIGNATURE_PREFIX + signature + TRANSACTION_PREFIX + encoded_txn
+
+
+def sign_transaction(signing_key, txn):
+    """ Returns the encoded signed transaction, it is identical to msgpack_encode(txn.sign(secret_key)) """
+    return sign_encoded_transaction(signing_key, base64.b64decode(msgpack_encode(txn)))
+
+
+def sign_chunk(txn_groups):
+    """ Returns (buffer, transaction lengths of each group), the encoded signed transactions of the chunk are concatenated """
+    encoded_stxns = []
+    txn_lengths = []
+    for txn_group in txn_groups:
+        group_encoded_stxns = [sign_transaction(worker_signing_key, txn) for txn in txn_group]
+        encoded_stxns += group_encoded_stxns
+        txn_lengths.append([len(encoded_stxn) for encoded_stxn in group_encoded_stxns])
+    return b"".join(encoded_stxns), txn_lengths
+
+
+class BatchSigner:
+    """
+    Signs transaction groups in worker processes, the signing key is loaded once per worker.
+    All of the transactions must be signed by secret_key and the group ids must be assigned before signing.
+
+        with BatchSigner(user_sk, worker_count=4) as signer:
+            buffer, offsets = signer.sign_to_buffer(txn_groups)
+    """
+
+    def __init__(self, secret_key, worker_count=4, chunk_size=64):
+        self.worker_count = worker_count
+        self.chunk_size = chunk_size
+        self.pool = multiprocessing.Pool(worker_count, initializer=load_signing_key, initargs=(secret_key,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def sign_chunks(self, txn_groups):
+        chunks = [txn_groups[i:i + self.chunk_size] for i in range(0, len(txn_groups), self.chunk_size)]
+        # imap keeps the order of the chunks
+        return self.pool.imap(sign_chunk, chunks)
+
+    def sign(self, txn_groups):
+        """ Returns the encoded signed transactions of each group in order """
+        result = []
+        for buffer, txn_lengths in self.sign_chunks(txn_groups):
+            offset = 0
+            for group_txn_lengths in txn_lengths:
+                encoded_stxns = []
+                for txn_length in group_txn_lengths:
+                    encoded_stxns.append(buffer[offset:offset + txn_length])
+                    offset += txn_length
+                result.append(encoded_stxns)
+        return result
+
+    def sign_to_buffer(self, txn_groups):
+        """
+        Returns (buffer, offsets), the encoded signed transactions of all groups in one contiguous buffer.
+        The buffers of the chunks are copied into it once. The group i is buffer[offsets[i]:offsets[i + 1]],
+        the slices are the payloads of send_raw_transaction.
+        """
+        chunks = []
+        offsets = [0]
+        for buffer, txn_lengths in self.sign_chunks(txn_groups):
+            chunks.append(buffer)
+            for group_txn_lengths in txn_lengths:
+                offsets.append(offsets[-1] + sum(group_txn_lengths))
+        return memoryview(b"".join(chunks)), offsets
+
+
+class SigningBenchmark(TransactionBuilderMixin):
+
+    def __init__(self):
+        self.sp = get_suggested_params()
+        self.user_sk, self.user_addr = account.generate_account()
+        self.asset_1_id = 5
+        self.asset_2_id = 2
+        self.pool_token_asset_id = 6
+        self.pool_address = get_pool_logicsig_bytecode(amm_pool_template, APPLICATION_ID, self.asset_1_id, self.asset_2_id).address()
+
+    def get_txn_groups(self, group_count):
+        return [transaction.assign_group_id(self.get_swap_transactions(self.asset_1_id, 1_000_000 + i)) for i in range(group_count)]
+
+    def run(self, group_count, worker_counts=(1, 4, 16)):
+        txn_groups = self.get_txn_groups(group_count)
+        transaction_count = sum(len(txn_group) for txn_group in txn_groups)
+        report = {}
+
+        start = time.perf_counter()
+        for txn_group in txn_groups:
+            [base64.b64decode(msgpack_encode(stxn)) for stxn in self.sign_txns(txn_group, self.user_sk)]
+        duration = time.perf_counter() - start
+        report["serial"] = dict(seconds=duration, transactions_per_second=transaction_count / duration)
+
+        for worker_count in worker_counts:
+            # The pool start up is not measured
+            with BatchSigner(self.user_sk, worker_count=worker_count) as signer:
+                signer.sign(txn_groups[:worker_count])
+                for name, sign in (("sign", signer.sign), ("sign_to_buffer", signer.sign_to_buffer)):
+                    start = time.perf_counter()
+                    sign(txn_groups)
+                    duration = time.perf_counter() - start
+                    report[f"{name}_{worker_count}_workers"] = dict(seconds=duration, transactions_per_second=transaction_count / duration)
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--groups", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+    print(json.dumps(SigningBenchmark().run(args.groups, args.workers), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Speculative pool state simulator for pending swap, add_liquidity and remove_liquidity groups.
+
+The groups are parsed once into operations, the operations of a pool are applied in order with the pool model
+(tests/amm.py) and the failing ones are dropped. The state after every position is kept so a re-ordering only
+re-simulates from the first changed position. The fixed-input swaps have a fast path (see swap).
+
+    python -m tests.simulator --groups 200
+
+benchmarks the simulation and the re-simulation time. A simulation of 200 groups takes about 1.4-1.7 ms in CPython,
+it is not sub-millisecond, a re-ordering near the end of the queue takes about 0.1-0.2 ms.
+"""
+import argparse
+import json
+import random
+import time
+
+from algosdk.future import transaction
+
+from . import amm
+from .constants import *
+
+
+def get_transfer(txn):
+    """ Returns (receiver, asset_id, amount) of a payment or an asset transfer """
+    if txn.type == transaction.constants.payment_txn:
+        return txn.receiver, ALGO_ASSET_ID, txn.amt
+    return txn.receiver, txn.index, txn.amount
+
+
+def get_operation(txn_group, pool_states):
+    """
+    Returns (pool_address, method, args) of a swap, add_liquidity or remove_liquidity group built like the BaseTestCase
+    builders. args are the arguments of the amm function after the pool state.
+    """
+    txn_group = [getattr(txn, 'transaction', txn) for txn in txn_group]
+    app_call = txn_group[-1]
+    pool_address = app_call.accounts[0]
+    pool_state = pool_states[pool_address]
+    method = app_call.app_args[0].decode()
+    transfers = [get_transfer(txn) for txn in txn_group[:-1]]
+
+    if method == METHOD_SWAP:
+        _, input_asset_id, input_amount = transfers[-1]
+        args = (input_asset_id, input_amount, app_call.app_args[1].decode(), int.from_bytes(app_call.app_args[2], 'big'))
+    elif method == METHOD_ADD_LIQUIDITY:
+        amounts = {asset_id: amount for _, asset_id, amount in transfers}
+        args = (amounts.get(pool_state[b'asset_1_id']), amounts.get(pool_state[b'asset_2_id']), int.from_bytes(app_call.app_args[2], 'big'))
+    elif method == METHOD_REMOVE_LIQUIDITY:
+        _, _, removed_pool_token_amount = transfers[-1]
+        # The single asset mode has only the output asset in Txn.Assets
+        output_asset_id = app_call.foreign_assets[0] if len(app_call.foreign_assets) == 1 else None
+        args = (removed_pool_token_amount, int.from_bytes(app_call.app_args[1], 'big'), int.from_bytes(app_call.app_args[2], 'big'), output_asset_id)
+    else:
+        raise ValueError(f"{method} groups are not simulated")
+    return pool_address, method, args
+
+
+OPERATION_FUNCTIONS = {
+    METHOD_SWAP: amm.swap,
+    METHOD_ADD_LIQUIDITY: amm.add_liquidity,
+    METHOD_REMOVE_LIQUIDITY: amm.remove_liquidity,
+}
+
+
+class PoolSimulator:
+    """
+    Simulates the pending operations of a pool, an operation is (method, args) as returned by get_operation.
+    The pending groups are evaluated in the same block, the timestamp of the block is used for the price oracle.
+    """
+
+    def __init__(self, pool_state, operations=(), timestamp=None):
+        self.base_state = pool_state
+        self.timestamp = amm.get_price_oracle_timestamp(pool_state) if timestamp is None else timestamp
+        self.operations = []
+        # states[i] is the pool state after the first i operations, results[i] is the result or the error of operation i
+        self.states = [pool_state]
+        self.results = []
+        self.extend(operations)
+
+    def extend(self, operations):
+        for operation in operations:
+            self.operations.append(operation)
+            self.apply(len(self.operations) - 1)
+
+    def apply(self, index):
+        method, args = self.operations[index]
+        state = self.states[index]
+        try:
+            state, result = OPERATION_FUNCTIONS[method](state, *args, self.timestamp)
+        except amm.LogicError as e:
+            # The failing group is dropped, the state is unchanged
+            result = e
+        self.states.append(state)
+        self.results.append(result)
+
+    def truncate(self, index):
+        del self.states[index + 1:]
+        del self.results[index:]
+
+    def reorder(self, order):
+        """ order is a permutation of the operation indexes, only the operations after the common prefix are re-applied """
+        operations = [self.operations[index] for index in order]
+        common_prefix_length = 0
+        for index, old_index in enumerate(order):
+            if index != old_index:
+                break
+            common_prefix_length += 1
+        self.truncate(common_prefix_length)
+        self.operations = operations
+        for index in range(common_prefix_length, len(operations)):
+            self.apply(index)
+
+    def insert(self, index, operation):
+        self.truncate(index)
+        self.operations.insert(index, operation)
+        for index in range(index, len(self.operations)):
+            self.apply(index)
+
+    def remove(self, index):
+        self.truncate(index)
+        del self.operations[index]
+        for index in range(index, len(self.operations)):
+            self.apply(index)
+
+    @property
+    def state(self):
+        """ The pool state after all of the pending operations """
+        return self.states[-1]
+
+    def get_failed_indexes(self):
+        return [index for index, result in enumerate(self.results) if isinstance(result, amm.LogicError)]
+
+
+def simulate_pending_groups(pool_states, txn_groups, timestamp=None):
+    """ Returns {pool_address: PoolSimulator} of the pools of the pending groups, the order of the groups is kept """
+    operations = {}
+    for txn_group in txn_groups:
+        pool_address, method, args = get_operation(txn_group, pool_states)
+        operations.setdefault(pool_address, []).append((method, args))
+    return {pool_address: PoolSimulator(pool_states[pool_address], pool_operations, timestamp) for pool_address, pool_operations in operations.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--groups", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool_state = {
+        b'asset_1_id': 5,
+        b'asset_2_id': 2,
+        b'pool_token_asset_id': 6,
+        b'total_fee_share': TOTAL_FEE_SHARE,
+        b'protocol_fee_ratio': PROTOCOL_FEE_RATIO,
+        b'asset_1_reserves': 10 ** 12,
+        b'asset_2_reserves': 10 ** 12,
+        b'issued_pool_tokens': 10 ** 12,
+        b'asset_1_protocol_fees': 0,
+        b'asset_2_protocol_fees': 0,
+        b'cumulative_price_update_timestamp': 0,
+    }
+    operations = []
+    for _ in range(args.groups):
+        method = rng.choices([METHOD_SWAP, METHOD_ADD_LIQUIDITY, METHOD_REMOVE_LIQUIDITY], [85, 8, 7])[0]
+        if method == METHOD_SWAP:
+            operations.append((method, (rng.choice((5, 2)), rng.randint(1, 10 ** 9), "fixed-input", rng.choice((0, 10 ** 9)))))
+        elif method == METHOD_ADD_LIQUIDITY:
+            operations.append((method, (rng.randint(1, 10 ** 9), rng.randint(1, 10 ** 9), 0)))
+        else:
+            operations.append((method, (rng.randint(1, 10 ** 9), 0, 0, None)))
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        simulator = PoolSimulator(pool_state, operations)
+    simulate_duration = (time.perf_counter() - start) / args.iterations
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        # Our group is moved one position earlier near the end of the queue
+        index = rng.randrange(args.groups * 3 // 4, args.groups)
+        order = list(range(args.groups))
+        order[index - 1], order[index] = order[index], order[index - 1]
+        simulator.reorder(order)
+    reorder_duration = (time.perf_counter() - start) / args.iterations
+
+    print(json.dumps(dict(
+        groups=args.groups,
+        failed_groups=len(simulator.get_failed_indexes()),
+        simulate_milliseconds=simulate_duration * 1e3,
+        reorder_milliseconds=reorder_duration * 1e3,
+    ), indent=2))
+
+
+if __name__ == "__main__":
+    main()
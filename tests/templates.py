@@ -0,0 +1,223 @@
+"""
+Pre-encoded transaction group templates for the hot trading paths.
+
+A group is built and encoded once per pool and method with the existing builders. For each trade only the amounts,
+the min output app args, the validity rounds and the group id are patched into the encoded buffers before signing.
+msgpack_encode omits the zero fields, a zero validity round is omitted with its key and the field count of the map
+header is decreased, the amounts must be positive.
+
+    python -m tests.templates --trades 10000
+
+benchmarks group build + sign + encode time per trade against the object path.
+"""
+import argparse
+import base64
+import copy
+import json
+import time
+
+import msgpack
+from algojig import get_suggested_params
+from algosdk import account, constants
+from algosdk.encoding import checksum, msgpack_encode
+from algosdk.future import transaction
+from nacl.signing import SigningKey
+
+from .constants import *
+from .core import TransactionBuilderMixin
+from .signing import sign_encoded_transaction
+from .utils import get_pool_logicsig_bytecode
+
+FIRST_VALID = "first_valid"
+LAST_VALID = "last_valid"
+AMOUNT = "amount"
+MIN_OUTPUT = "min_output"
+GROUP = "group"
+
+# The placeholders are wide enough to have a fixed encoding which is split out of the encoded transaction
+FIRST_VALID_PLACEHOLDER = 0xfffffffffffff001
+LAST_VALID_PLACEHOLDER = 0xfffffffffffff002
+AMOUNT_PLACEHOLDER = 0xfffffffffffff003
+GROUP_PLACEHOLDER = b"\xff" * 30 + b"\xf0\x05"
+
+# The validity rounds are split out with their keys so the zero rounds can be omitted
+PLACEHOLDERS = {
+    msgpack.packb("fv") + msgpack.packb(FIRST_VALID_PLACEHOLDER): FIRST_VALID,
+    msgpack.packb("lv") + msgpack.packb(LAST_VALID_PLACEHOLDER): LAST_VALID,
+    msgpack.packb(AMOUNT_PLACEHOLDER): AMOUNT,
+    GROUP_PLACEHOLDER: GROUP,
+}
+# A min output app arg is the field (MIN_OUTPUT, app arg index), a transaction can have more than one
+MIN_OUTPUT_PLACEHOLDERS = {arg_index: b"\xff\xff\xff\xff\xff\xff\xf1" + bytes([arg_index]) for arg_index in range(16)}
+PLACEHOLDERS.update({placeholder: (MIN_OUTPUT, arg_index) for arg_index, placeholder in MIN_OUTPUT_PLACEHOLDERS.items()})
+
+packer = msgpack.Packer()
+
+
+def split_placeholders(encoded):
+    """ Splits the encoded transaction to a list of static bytes and field names """
+    segments = [encoded]
+    for placeholder, field in PLACEHOLDERS.items():
+        result = []
+        for segment in segments:
+            if isinstance(segment, bytes):
+                parts = segment.split(placeholder)
+                for part in parts[:-1]:
+                    result += [part, field]
+                result.append(parts[-1])
+            else:
+                result.append(segment)
+        segments = result
+    return [segment for segment in segments if segment != b""]
+
+
+def get_transaction_id(encoded_txn):
+    return checksum(constants.txid_prefix + encoded_txn)
+
+
+def get_group_id(transaction_ids):
+    encoded = packer.pack_map_header(1) + packer.pack("txlist") + packer.pack(transaction_ids)
+    return checksum(constants.tgid_prefix + encoded)
+
+
+class TransactionTemplate:
+
+    def __init__(self, txn, amount=False, min_output_arg_indexes=()):
+        txn = copy.deepcopy(txn)
+        txn.first_valid_round = FIRST_VALID_PLACEHOLDER
+        txn.last_valid_round = LAST_VALID_PLACEHOLDER
+        txn.group = None
+        if amount:
+            if txn.type == constants.payment_txn:
+                txn.amt = AMOUNT_PLACEHOLDER
+            else:
+                txn.amount = AMOUNT_PLACEHOLDER
+        for arg_index in min_output_arg_indexes:
+            txn.app_args[arg_index] = MIN_OUTPUT_PLACEHOLDERS[arg_index]
+
+        # The transaction id is calculated without the group, the signature covers the transaction with the group
+        self.segments = split_placeholders(base64.b64decode(msgpack_encode(txn)))
+        txn.group = GROUP_PLACEHOLDER
+        self.grouped_segments = split_placeholders(base64.b64decode(msgpack_encode(txn)))
+        # The field count is patched in the fixmap header
+        assert self.segments[0][0] & 0xf0 == 0x80 and self.grouped_segments[0][0] & 0xf0 == 0x80
+
+    def encode(self, values, grouped=False, omitted_field_count=0):
+        segments = self.grouped_segments if grouped else self.segments
+        encoded = b"".join(segment if segment.__class__ is bytes else values[segment] for segment in segments)
+        if omitted_field_count:
+            encoded = bytes([encoded[0] - omitted_field_count]) + encoded[1:]
+        return encoded
+
+
+class TransactionGroupTemplate:
+    """
+    amount_indexes: indexes of the transactions whose amounts are patched, the amounts must be positive
+    min_output_args: (transaction index, app arg index) pairs of the patched min output app args
+    All of the transactions must be signed by secret_key.
+    """
+
+    def __init__(self, txn_group, secret_key, amount_indexes=(), min_output_args=()):
+        self.amount_indexes = list(amount_indexes)
+        self.min_output_args = list(min_output_args)
+        self.templates = [
+            TransactionTemplate(txn, amount=index in self.amount_indexes, min_output_arg_indexes=[arg_index for txn_index, arg_index in self.min_output_args if txn_index == index])
+            for index, txn in enumerate(txn_group)
+        ]
+        self.signing_key = SigningKey(base64.b64decode(secret_key)[:32])
+
+    def encode(self, first_valid, last_valid, amounts=(), min_outputs=()):
+        """ Returns the encoded signed transactions, the concatenation is the payload of send_raw_transaction """
+        first_valid_field = packer.pack("fv") + packer.pack(first_valid) if first_valid else b""
+        last_valid_field = packer.pack("lv") + packer.pack(last_valid) if last_valid else b""
+        omitted_field_count = (not first_valid) + (not last_valid)
+        values = [{FIRST_VALID: first_valid_field, LAST_VALID: last_valid_field} for _ in self.templates]
+        for index, amount in zip(self.amount_indexes, amounts):
+            assert amount > 0
+            values[index][AMOUNT] = packer.pack(amount)
+        for (index, arg_index), min_output in zip(self.min_output_args, min_outputs):
+            values[index][MIN_OUTPUT, arg_index] = min_output.to_bytes(8, "big")
+
+        group_id = get_group_id([get_transaction_id(template.encode(v, omitted_field_count=omitted_field_count)) for template, v in zip(self.templates, values)])
+        encoded_stxns = []
+        for template, v in zip(self.templates, values):
+            v[GROUP] = group_id
+            encoded_txn = template.encode(v, grouped=True, omitted_field_count=omitted_field_count)
+            encoded_stxns.append(sign_encoded_transaction(self.signing_key, encoded_txn))
+        return encoded_stxns
+
+    def get_signed_transactions(self, *args, **kwargs):
+        return [transaction.SignedTransaction.undictify(msgpack.unpackb(encoded_stxn, raw=False)) for encoded_stxn in self.encode(*args, **kwargs)]
+
+
+class TemplateBenchmark(TransactionBuilderMixin):
+
+    def __init__(self):
+        self.sp = get_suggested_params()
+        self.user_sk, self.user_addr = account.generate_account()
+        self.asset_1_id = 5
+        self.asset_2_id = 2
+        self.pool_token_asset_id = 6
+        self.pool_address = get_pool_logicsig_bytecode(amm_pool_template, APPLICATION_ID, self.asset_1_id, self.asset_2_id).address()
+
+    def get_trades(self):
+        """ Returns {method: (object path, template path)}, both take (round, amount) and return the encoded signed transactions """
+        swap_template = TransactionGroupTemplate(
+            self.get_swap_transactions(self.asset_1_id, 1), self.user_sk,
+            amount_indexes=[0], min_output_args=[(1, 2)],
+        )
+        add_liquidity_template = TransactionGroupTemplate(
+            self.get_add_liquidity_transactions(1, 1), self.user_sk,
+            amount_indexes=[0, 1], min_output_args=[(2, 2)],
+        )
+        remove_liquidity_template = TransactionGroupTemplate(
+            self.get_remove_liquidity_transactions(1), self.user_sk,
+            amount_indexes=[0], min_output_args=[(1, 1), (1, 2)],
+        )
+        return {
+            METHOD_SWAP: (
+                lambda r, amount: self.encode_txn_group(r, self.get_swap_transactions, self.asset_1_id, amount, min_output=amount // 2),
+                lambda r, amount: swap_template.encode(r, r + 1000, amounts=[amount], min_outputs=[amount // 2]),
+            ),
+            METHOD_ADD_LIQUIDITY: (
+                lambda r, amount: self.encode_txn_group(r, self.get_add_liquidity_transactions, amount, amount + 1, min_output=amount // 2),
+                lambda r, amount: add_liquidity_template.encode(r, r + 1000, amounts=[amount, amount + 1], min_outputs=[amount // 2]),
+            ),
+            METHOD_REMOVE_LIQUIDITY: (
+                lambda r, amount: self.encode_txn_group(r, self.get_remove_liquidity_transactions, amount, min_output_1=amount // 2, min_output_2=amount // 3),
+                lambda r, amount: remove_liquidity_template.encode(r, r + 1000, amounts=[amount], min_outputs=[amount // 2, amount // 3]),
+            ),
+        }
+
+    def encode_txn_group(self, first_valid, get_txn_group, *args, **kwargs):
+        self.sp.first = first_valid
+        self.sp.last = first_valid + 1000
+        txn_group = transaction.assign_group_id(get_txn_group(*args, **kwargs))
+        return [base64.b64decode(msgpack_encode(stxn)) for stxn in self.sign_txns(txn_group, self.user_sk)]
+
+    def run(self, trade_count):
+        report = {}
+        for method, (object_path, template_path) in self.get_trades().items():
+            durations = []
+            for path in (object_path, template_path):
+                start = time.perf_counter()
+                for i in range(trade_count):
+                    path(1_000 + i, 1_000_000 + i)
+                durations.append((time.perf_counter() - start) / trade_count)
+            report[method] = dict(
+                object_microseconds_per_trade=durations[0] * 1e6,
+                template_microseconds_per_trade=durations[1] * 1e6,
+                speedup=durations[0] / durations[1],
+            )
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trades", type=int, default=10_000)
+    args = parser.parse_args()
+    print(json.dumps(TemplateBenchmark().run(args.trades), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import asyncio
+import base64
+
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.encoding import msgpack_encode
+from algosdk.future import transaction
+
+from .algod import AlgodClient, AlgodError
+from .algod_server import AlgodServer
+from .amm import get_fixed_input_swap_quote
+from .constants import *
+from .core import BaseTestCase
+
+
+class TestAlgodClient(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=2_000_000, liquidity_provider_address=self.user_addr)
+
+    def test_pool_snapshots(self):
+        async def run():
+            server = await AlgodServer(self.ledger).start()
+            try:
+                async with AlgodClient(server.host, server.port, max_connections=4) as client:
+                    # The concurrent requests of the same pool are sent once
+                    snapshots = await asyncio.gather(*[client.get_pool_snapshot(self.pool_address) for _ in range(10)])
+                    self.assertEqual(server.request_count, 1)
+
+                    snapshots_by_address = await client.get_pool_snapshots([self.pool_address, self.user_addr])
+                    self.assertEqual(server.request_count, 3)
+                    self.assertLessEqual(len(client.connections), 4)
+                    return snapshots, snapshots_by_address
+            finally:
+                await server.close()
+
+        snapshots, snapshots_by_address = asyncio.run(run())
+        snapshot = snapshots[0]
+        self.assertEqual(snapshot['round'], 1)
+        self.assertEqual(snapshot['address'], self.pool_address)
+        self.assertEqual(snapshot['pool_state'], self.get_pool_state())
+        self.assertEqual(snapshot['balances'][self.asset_1_id], 1_000_000)
+        self.assertEqual(snapshot['balances'][self.asset_2_id], 2_000_000)
+        self.assertEqual(snapshots_by_address[self.pool_address]['pool_state'], self.get_pool_state())
+        self.assertIsNone(snapshots_by_address[self.user_addr]['pool_state'])
+
+    def test_algo_donation(self):
+        self.ledger.move(1_345, ALGO_ASSET_ID, receiver=self.pool_address)
+
+        async def run():
+            server = await AlgodServer(self.ledger).start()
+            try:
+                async with AlgodClient(server.host, server.port) as client:
+                    return await client.get_pool_snapshot(self.pool_address)
+            finally:
+                await server.close()
+
+        # The donation is the balance above the min balance which claim_extra sees
+        snapshot = asyncio.run(run())
+        self.assertEqual(snapshot['balances'][ALGO_ASSET_ID], 1_345)
+
+    def test_submit(self):
+        output_amount, _ = get_fixed_input_swap_quote(self.get_pool_state(), self.asset_1_id, 10_000)
+        txn_group = transaction.assign_group_id(self.get_swap_transactions(self.asset_1_id, 10_000, min_output=output_amount))
+        encoded_stxns = b"".join(base64.b64decode(msgpack_encode(stxn)) for stxn in self.sign_txns(txn_group, self.user_sk))
+        failing_txn_group = transaction.assign_group_id(self.get_swap_transactions(self.asset_1_id, 10_000, min_output=output_amount + 1))
+        failing_encoded_stxns = b"".join(base64.b64decode(msgpack_encode(stxn)) for stxn in self.sign_txns(failing_txn_group, self.user_sk))
+
+        async def run():
+            server = await AlgodServer(self.ledger).start()
+            try:
+                async with AlgodClient(server.host, server.port) as client:
+                    txid = await client.send_raw_transaction(encoded_stxns)
+                    self.assertEqual(txid, txn_group[0].get_txid())
+                    pending_transaction_info = await client.get_pending_transaction_info(txn_group[1].get_txid())
+                    self.assertEqual(pending_transaction_info['confirmed-round'], 2)
+                    self.assertEqual(len(pending_transaction_info['inner-txns']), 1)
+                    self.assertEqual((await client.get_status())['last-round'], 2)
+
+                    snapshot = await client.get_pool_snapshot(self.pool_address)
+                    self.assertEqual(snapshot['round'], 2)
+                    self.assertEqual(snapshot['pool_state'], self.get_pool_state())
+                    self.assertEqual(snapshot['balances'][self.asset_1_id], 1_010_000)
+
+                    # The rejected group does not change the round
+                    with self.assertRaises(AlgodError) as e:
+                        await client.send_raw_transaction(failing_encoded_stxns)
+                    self.assertEqual(e.exception.status, 400)
+                    self.assertEqual((await client.get_status())['last-round'], 2)
+            finally:
+                await server.close()
+
+        asyncio.run(run())
@@ -0,0 +1,72 @@
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .arbitrage import ArbitrageDetector, get_cycle_transactions
+from .constants import *
+from .core import BaseTestCase
+
+
+class TestArbitrageDetector(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 7
+        cls.asset_2_id = 5
+        cls.asset_3_id = 2
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        for asset_id in (self.asset_1_id, self.asset_2_id, self.asset_3_id):
+            self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=asset_id)
+
+        self.pool_addresses = []
+        for asset_1_id, asset_2_id, asset_1_reserves, asset_2_reserves in [
+            (self.asset_2_id, self.asset_3_id, 1_000_000, 1_000_000),
+            (self.asset_1_id, self.asset_3_id, 1_000_000, 1_000_000),
+            # Asset 2 is cheaper in this pool
+            (self.asset_1_id, self.asset_2_id, 1_000_000, 1_100_000),
+        ]:
+            pool_address, pool_token_asset_id = self.bootstrap_pool(asset_1_id, asset_2_id)
+            self.ledger.opt_in_asset(self.user_addr, pool_token_asset_id)
+            self.set_initial_pool_liquidity(pool_address, asset_1_id, asset_2_id, pool_token_asset_id, asset_1_reserves=asset_1_reserves, asset_2_reserves=asset_2_reserves, liquidity_provider_address=self.user_addr)
+            self.pool_addresses.append(pool_address)
+
+    def get_pool_states(self):
+        return {pool_address: self.get_pool_state(pool_address) for pool_address in self.pool_addresses}
+
+    def test_cycle(self):
+        detector = ArbitrageDetector([self.asset_2_id])
+        detector.add_pools(self.get_pool_states())
+        self.assertEqual(len(detector.cycles), 2)
+
+        opportunities = detector.detect()
+        self.assertEqual(len(opportunities), 1)
+        opportunity = opportunities[0]
+        self.assertEqual(
+            opportunity['cycle'],
+            (
+                (self.pool_addresses[0], self.asset_2_id, self.asset_3_id),
+                (self.pool_addresses[1], self.asset_3_id, self.asset_1_id),
+                (self.pool_addresses[2], self.asset_1_id, self.asset_2_id),
+            )
+        )
+        self.assertEqual(opportunity['input_amount'], 14453)
+        self.assertEqual(opportunity['profit'], 653)
+
+        swaps = detector.get_swaps(opportunity)
+        txn_group = get_cycle_transactions(self.sp, self.user_addr, swaps, detector.pool_states)
+        txn_group = transaction.assign_group_id(txn_group)
+        balance = self.ledger.get_account_balance(self.user_addr, self.asset_2_id)[0]
+        self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk))
+        self.assertEqual(self.ledger.get_account_balance(self.user_addr, self.asset_2_id)[0], balance + opportunity['profit'])
+
+        # Only the updated pools are re-evaluated, the opportunity is taken
+        detector.update_pools(self.get_pool_states())
+        self.assertEqual(detector.detect(), [])
@@ -5,9 +5,10 @@ from algosdk.account import generate_account
 from algosdk.encoding import decode_address
 from algosdk.future import transaction
 
+from .bootstrap import BootstrapPlanner
 from .constants import *
 from .core import BaseTestCase
-from .utils import get_pool_logicsig_bytecode
+from .utils import decode_signed_transactions, get_pool_logicsig_bytecode
 
 
 class TestBootstrap(BaseTestCase):
@@ -617,3 +618,39 @@ class TestBootstrapAlgoPair(BaseTestCase):
                 b'asset_2_protocol_fees': {b'at': 2},
             }
         )
+
+
+class TestBootstrapPlanner(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.funder_sk, cls.funder_addr = generate_account()
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.funder_addr, 10_000_000)
+        self.asset_ids = [self.ledger.create_asset(asset_id=None, params=dict(unit_name=unit_name)) for unit_name in ("BTC", "USD", "ETH")]
+
+    def test_plan(self):
+        asset_a_id, asset_b_id, asset_c_id = self.asset_ids
+        asset_pairs = [(min(asset_a_id, asset_b_id), max(asset_a_id, asset_b_id)), (asset_b_id, asset_a_id), (ALGO_ASSET_ID, asset_c_id)]
+        with BootstrapPlanner(self.funder_sk, worker_count=2, chunk_size=1) as planner:
+            plans = planner.plan(self.sp, asset_pairs)
+        with BootstrapPlanner(self.funder_sk, worker_count=0) as planner:
+            self.assertEqual(planner.plan(self.sp, asset_pairs), plans)
+
+        # The duplicate pair is removed
+        self.assertEqual([(plan['asset_1_id'], plan['asset_2_id']) for plan in plans], [(max(asset_a_id, asset_b_id), min(asset_a_id, asset_b_id)), (asset_c_id, ALGO_ASSET_ID)])
+        self.assertEqual([plan['funding_amount'] for plan in plans], [MIN_POOL_BALANCE_ASA_ASA_PAIR + 100_000 + 7_000, MIN_POOL_BALANCE_ASA_ALGO_PAIR + 100_000 + 6_000])
+
+        for plan in plans:
+            funder_balance = self.ledger.get_account_balance(self.funder_addr)[0]
+            self.ledger.eval_transactions(decode_signed_transactions(plan['stxns']))
+            self.assertEqual(self.ledger.get_account_balance(self.funder_addr)[0], funder_balance - plan['funding_amount'] - MIN_TXN_FEE)
+
+            pool_state = self.get_pool_state(plan['pool_address'])
+            self.assertEqual(pool_state[b'asset_1_id'], plan['asset_1_id'])
+            self.assertEqual(pool_state.get(b'asset_2_id', 0), plan['asset_2_id'])
@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+
+from .candles import CANDLE_STRUCT, CandleAggregator, CandleStore, backfill, get_trade
+from .constants import *
+from .events import get_random_events
+from .pool_table import get_random_pool_states
+
+
+class TestCandles(unittest.TestCase):
+
+    def test_trades(self):
+        swap = dict(method=METHOD_SWAP, logs=dict(input_asset_id=5, input_amount=1_000, change=0, output_asset_id=2, output_amount=1_990), asset_1_reserves=None, asset_2_reserves=None)
+        self.assertEqual(get_trade(swap), (1.99, 1_000, 1_990))
+        # The change of a fixed output swap is not traded
+        swap = dict(method=METHOD_SWAP, logs=dict(input_asset_id=2, input_amount=2_500, change=500, output_asset_id=5, output_amount=1_000), asset_1_reserves=None, asset_2_reserves=None)
+        self.assertEqual(get_trade(swap), (2.0, 1_000, 2_000))
+        add_liquidity = dict(method=METHOD_ADD_LIQUIDITY, logs=dict(input_asset_id=2, output_asset_id=5, swap_amount=1_000), asset_1_reserves=1_000_000, asset_2_reserves=4_000_000)
+        self.assertEqual(get_trade(add_liquidity), (4.0, 250, 1_000))
+        remove_liquidity = dict(method=METHOD_REMOVE_LIQUIDITY, logs=dict(input_asset_id=5, input_amount=1_000, swap_amount=997, output_asset_id=2, output_amount=3_980), asset_1_reserves=None, asset_2_reserves=None)
+        self.assertEqual(get_trade(remove_liquidity), (3.98, 1_000, 3_980))
+        # The two asset remove_liquidity and the flash loans are not trades
+        self.assertIsNone(get_trade(dict(method=METHOD_REMOVE_LIQUIDITY, logs={}, asset_1_reserves=None, asset_2_reserves=None)))
+        self.assertIsNone(get_trade(dict(method=METHOD_VERIFY_FLASH_LOAN, logs=dict(asset_1_output_amount=1), asset_1_reserves=None, asset_2_reserves=None)))
+
+    def test_aggregator(self):
+        candles = []
+        aggregator = CandleAggregator(lambda *args: candles.append(args), resolutions={"1m": 60, "5m": 300})
+        aggregator.add_trade('pool', 0, 2.0, 10, 20)
+        aggregator.add_trade('pool', 30, 3.0, 10, 30)
+        aggregator.add_trade('pool', 59, 1.5, 10, 15)
+        aggregator.add_trade('pool', 61, 2.5, 10, 25)
+        self.assertEqual(candles, [('pool', '1m', [0, 2.0, 3.0, 1.5, 1.5, 30, 65, 3])])
+        aggregator.add_trade('pool', 400, 4.0, 1, 4)
+        self.assertEqual(candles[1:], [
+            ('pool', '1m', [60, 2.5, 2.5, 2.5, 2.5, 10, 25, 1]),
+            ('pool', '5m', [0, 2.0, 3.0, 1.5, 2.5, 40, 90, 4]),
+        ])
+        with self.assertRaises(ValueError):
+            aggregator.add_trade('pool', 100, 4.0, 1, 4)
+
+        candles.clear()
+        aggregator.flush()
+        self.assertEqual(candles, [
+            ('pool', '1m', [360, 4.0, 4.0, 4.0, 4.0, 1, 4, 1]),
+            ('pool', '5m', [300, 4.0, 4.0, 4.0, 4.0, 1, 4, 1]),
+        ])
+
+    def test_backfill(self):
+        events = get_random_events(get_random_pool_states(20), 2000, interval=60)
+        results = []
+        for worker_count in (0, 2):
+            with tempfile.TemporaryDirectory() as directory:
+                candle_count = backfill(events, directory, worker_count)
+                store = CandleStore(directory)
+                results.append((candle_count, {(address, resolution): store.read(address, resolution) for address in get_random_pool_states(20) for resolution in ("1m", "1d")}))
+        self.assertEqual(results[0], results[1])
+
+        candles = results[0][1]
+        trades = [(event['pool_address'], get_trade(event)) for event in events if get_trade(event)]
+        for address in get_random_pool_states(20):
+            pool_trades = [trade for pool_address, trade in trades if pool_address == address]
+            day_candles = candles[(address, "1d")]
+            self.assertEqual(sum(candle[-1] for candle in day_candles), len(pool_trades))
+            self.assertEqual(sum(candle[5] for candle in day_candles), sum(trade[1] for trade in pool_trades))
+        self.assertEqual(CANDLE_STRUCT.size, 60)
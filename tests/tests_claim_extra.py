@@ -10,6 +10,7 @@ from algosdk.future import transaction
 
 from .constants import *
 from .core import BaseTestCase
+from .donations import get_claim_extra_transactions, scan_donations
 
 
 class TestClaimExtra(BaseTestCase):
@@ -484,3 +485,80 @@ class TestClaimExtraAlgoPair(BaseTestCase):
         with self.assertRaises(LogicEvalError) as e:
             self.ledger.eval_transactions(stxns)
         self.assertEqual(e.exception.source['line'], 'assert(asset_amount)')
+
+
+class TestDonationScanner(BaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+
+    def get_balances(self, address, asset_ids, min_balance):
+        balances = {asset_id: self.ledger.get_account_balance(address, asset_id)[0] for asset_id in asset_ids}
+        balances[ALGO_ASSET_ID] = self.ledger.get_account_balance(address)[0] - min_balance
+        return balances
+
+    def get_pool_balances(self):
+        # The min balance of algojig, it does not account the application opt-in requirements (see bootstrap_pool)
+        min_balance = MIN_POOL_BALANCE_ASA_ASA_PAIR - ((25000 + 3500) * APP_LOCAL_INTS + (25000 + 25000) * APP_LOCAL_BYTES)
+        return {self.pool_address: self.get_balances(self.pool_address, [self.asset_1_id, self.asset_2_id, self.pool_token_asset_id], min_balance)}
+
+    def get_application_balances(self):
+        # The basic min balance and the min balance of the created pool token
+        return self.get_balances(APPLICATION_ADDRESS, [], 200_000)
+
+    def test_scan(self):
+        fee_collector = self.app_creator_address
+        self.ledger.set_account_balance(fee_collector, 1_000_000)
+        for asset_id in (self.asset_1_id, self.asset_2_id, self.pool_token_asset_id):
+            self.ledger.opt_in_asset(fee_collector, asset_id)
+
+        self.set_pool_protocol_fees(1_000, 0)
+        self.ledger.move(5_000, self.asset_1_id, receiver=self.pool_address)
+        self.ledger.move(6_000, self.asset_2_id, receiver=self.pool_address)
+        self.ledger.move(7_000, self.pool_token_asset_id, sender=self.user_addr, receiver=self.pool_address)
+        self.ledger.move(1_345, ALGO_ASSET_ID, receiver=self.pool_address)
+        self.ledger.move(2_345, ALGO_ASSET_ID, receiver=APPLICATION_ADDRESS)
+
+        pool_states = {self.pool_address: self.get_pool_state()}
+        pool_balances = self.get_pool_balances()
+        application_balances = self.get_application_balances()
+        claims = scan_donations(pool_states, pool_balances, application_balances)
+        self.assertEqual(
+            sorted(claims),
+            sorted([
+                (self.pool_address, self.asset_1_id, 5_000),
+                (self.pool_address, self.asset_2_id, 6_000),
+                (self.pool_address, self.pool_token_asset_id, 7_000),
+                (self.pool_address, ALGO_ASSET_ID, 1_345),
+                (APPLICATION_ADDRESS, ALGO_ASSET_ID, 2_345),
+            ])
+        )
+
+        txn_groups = get_claim_extra_transactions(self.sp, self.user_addr, claims, fee_collector)
+        self.assertEqual(len(txn_groups), 1)
+        algo_balance = self.ledger.get_account_balance(fee_collector)[0]
+        self.ledger.eval_transactions(self.sign_txns(transaction.assign_group_id(txn_groups[0]), self.user_sk))
+        self.assertEqual(self.ledger.get_account_balance(fee_collector)[0], algo_balance + 1_345 + 2_345)
+        self.assertEqual(self.ledger.get_account_balance(fee_collector, self.asset_1_id)[0], 5_000)
+        self.assertEqual(self.ledger.get_account_balance(fee_collector, self.asset_2_id)[0], 6_000)
+        self.assertEqual(self.ledger.get_account_balance(fee_collector, self.pool_token_asset_id)[0], 7_000)
+
+        # Nothing is left to claim
+        pool_balances = self.get_pool_balances()
+        application_balances = self.get_application_balances()
+        self.assertEqual(scan_donations(pool_states, pool_balances, application_balances), [])
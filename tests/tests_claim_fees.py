@@ -8,6 +8,7 @@ from algosdk.encoding import decode_address
 
 from .constants import *
 from .core import BaseTestCase
+from .fee_sweep import FeeSweepScheduler
 
 
 class TestClaimFees(BaseTestCase):
@@ -288,3 +289,65 @@ class TestClaimFeesAlgoPair(BaseTestCase):
                 b'asset_2_protocol_fees': {b'at': 2}    # -> 0
             }
         )
+
+
+class TestFeeSweepScheduler(BaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+
+    def test_sweep(self):
+        fee_collector = self.app_creator_address
+        self.ledger.set_account_balance(fee_collector, 1_000_000)
+        self.ledger.opt_in_asset(fee_collector, self.asset_1_id)
+        self.ledger.opt_in_asset(fee_collector, self.asset_2_id)
+        scheduler = FeeSweepScheduler(asset_prices={self.asset_1_id: 2, self.asset_2_id: 1})
+
+        # The fees are worth 1400 microAlgos, claim_fees costs 3000 microAlgos
+        self.set_pool_protocol_fees(500, 400)
+        scheduler.update_pool(self.pool_address, self.get_pool_state())
+        self.assertEqual(scheduler.get_sweep_transactions(self.sp, self.user_addr, fee_collector), [])
+
+        self.set_pool_protocol_fees(1_000, 1_500)
+        scheduler.update_pool(self.pool_address, self.get_pool_state())
+        txn_groups = scheduler.get_sweep_transactions(self.sp, self.user_addr, fee_collector)
+        self.assertEqual(len(txn_groups), 1)
+        self.assertEqual(txn_groups[0][0].fee, 3_000)
+        self.ledger.eval_transactions(self.sign_txns(txn_groups[0], self.user_sk))
+        self.assertEqual(self.ledger.get_account_balance(fee_collector, self.asset_1_id)[0], 1_000)
+        self.assertEqual(self.ledger.get_account_balance(fee_collector, self.asset_2_id)[0], 1_500)
+
+        scheduler.update_pool(self.pool_address, self.get_pool_state())
+        self.assertEqual(scheduler.pop_sweeps(), [])
+
+    def test_ranking(self):
+        scheduler = FeeSweepScheduler(asset_prices={self.asset_1_id: 2})
+        pool_state = {b'asset_1_id': self.asset_1_id, b'asset_2_id': ALGO_ASSET_ID, b'asset_1_protocol_fees': 0, b'asset_2_protocol_fees': 0}
+        scheduler.update_pools({
+            'pool_1': {**pool_state, b'asset_1_protocol_fees': 3_000},
+            'pool_2': {**pool_state, b'asset_2_protocol_fees': 9_000},
+            'pool_3': {**pool_state, b'asset_2_protocol_fees': 2_999},
+        })
+        # Only the updated pool is re-ranked
+        scheduler.update_pool('pool_3', {**pool_state, b'asset_1_protocol_fees': 6_000})
+        self.assertEqual(scheduler.pop_sweeps(limit=2), [(4.0, 'pool_3'), (3.0, 'pool_2')])
+
+        # The claim is pending, the same fees are not scheduled again
+        scheduler.update_pool('pool_3', {**pool_state, b'asset_1_protocol_fees': 6_000})
+        self.assertEqual(scheduler.pop_sweeps(), [(2.0, 'pool_1')])
+        self.assertEqual(scheduler.pop_sweeps(), [])
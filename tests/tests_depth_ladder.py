@@ -0,0 +1,121 @@
+import unittest
+
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+
+from . import amm
+from .constants import *
+from .depth_ladder import IMPACT_LEVELS, DepthLadder, is_within_impact
+from .pool_table import PoolTable, get_random_pool_states
+
+
+class TestDepthLadder(unittest.TestCase):
+
+    def setUp(self):
+        self.pool_states = get_random_pool_states(20)
+        _, self.pool_address = generate_account()
+        self.pool_states[self.pool_address] = {
+            b'asset_1_id': 5,
+            b'asset_2_id': ALGO_ASSET_ID,
+            b'pool_token_asset_id': 10,
+            b'asset_1_reserves': 1_000,
+            b'asset_2_reserves': 4_000,
+            b'issued_pool_tokens': 2_000,
+            b'asset_1_protocol_fees': 0,
+            b'asset_2_protocol_fees': 0,
+            b'total_fee_share': TOTAL_FEE_SHARE,
+            b'protocol_fee_ratio': PROTOCOL_FEE_RATIO,
+        }
+        self.table = PoolTable.from_pool_states(self.pool_states)
+        self.ladder = DepthLadder(self.table)
+
+    def test_contract_rounding(self):
+        # The amount of every level is within it and the next amount is not
+        for address, pool_state in self.pool_states.items():
+            for input_asset_id, input_supply, output_supply in (
+                (pool_state[b'asset_1_id'], pool_state[b'asset_1_reserves'], pool_state[b'asset_2_reserves']),
+                (pool_state[b'asset_2_id'], pool_state[b'asset_2_reserves'], pool_state[b'asset_1_reserves']),
+            ):
+                for level in IMPACT_LEVELS:
+                    amount = self.ladder.get_max_input_amount(address, input_asset_id, level)
+                    if amount:
+                        self.assertTrue(is_within_impact(input_supply, output_supply, amount, TOTAL_FEE_SHARE, level))
+                    self.assertFalse(is_within_impact(input_supply, output_supply, amount + 1, TOTAL_FEE_SHARE, level))
+
+    def test_small_pool(self):
+        # Brute force of the small pool, the swaps of the smaller amounts fail as the fee rounds to 0
+        for level in IMPACT_LEVELS:
+            amounts = [amount for amount in range(1, 1_000) if is_within_impact(1_000, 4_000, amount, TOTAL_FEE_SHARE, level)]
+            self.assertEqual(self.ladder.get_max_input_amount(self.pool_address, 5, level), max(amounts, default=0))
+
+        # The swap of the largest amount has the impact of the level
+        pool_state = self.pool_states[self.pool_address]
+        amount = self.ladder.get_max_input_amount(self.pool_address, ALGO_ASSET_ID, 1000)
+        _, result = amm.swap(pool_state, ALGO_ASSET_ID, amount, "fixed-input", 0)
+        self.assertGreaterEqual(result['output_amount'] / amount / (1_000 / 4_000), 0.9)
+
+    def test_small_reserves(self):
+        # The estimate of the levels is 0 below about 1 / coefficient of the input supply
+        pool_state = {**self.pool_states["pool_0"], b'asset_1_reserves': 100, b'asset_2_reserves': 100}
+        ladder = DepthLadder(PoolTable.from_pool_states({"pool_0": pool_state}))
+        for level in IMPACT_LEVELS:
+            amounts = [amount for amount in range(1, 100) if is_within_impact(100, 100, amount, TOTAL_FEE_SHARE, level)]
+            self.assertEqual(ladder.get_max_input_amount("pool_0", pool_state[b'asset_1_id'], level), max(amounts, default=0))
+
+    def test_large_reserves(self):
+        # The fee of the larger amounts overflows uint64 in the contract
+        pool_state = {**self.pool_states["pool_0"], b'asset_1_reserves': 10 ** 19}
+        ladder = DepthLadder(PoolTable.from_pool_states({"pool_0": pool_state}))
+        for level in IMPACT_LEVELS:
+            amount = ladder.get_max_input_amount("pool_0", pool_state[b'asset_1_id'], level)
+            self.assertLess(amount * TOTAL_FEE_SHARE, MAX_UINT64)
+            self.assertFalse(is_within_impact(10 ** 19, pool_state[b'asset_2_reserves'], amount + 1, TOTAL_FEE_SHARE, level))
+
+    def test_fee_levels(self):
+        # The fee of 0.3% is more than the impact level of 0.1% and 0.25%
+        ladder = self.ladder.get_ladder("pool_0", self.pool_states["pool_0"][b'asset_1_id'])
+        self.assertEqual((ladder[10], ladder[25]), (0, 0))
+        self.assertGreater(ladder[50], 0)
+        amounts = list(ladder.values())
+        self.assertEqual(amounts, sorted(amounts))
+
+    def test_update(self):
+        row = self.table.get_row("pool_1")
+        amounts = self.ladder.get_ladder("pool_1", self.pool_states["pool_1"][b'asset_2_id'])
+        self.assertEqual(self.ladder.refresh(), 0)
+
+        # The protocol fees do not change the ladder
+        self.table.columns['asset_1_protocol_fees'][row] = 100
+        self.assertFalse(self.ladder.update(row))
+
+        self.table.columns['asset_2_reserves'][row] *= 2
+        self.assertTrue(self.ladder.update(row))
+        self.assertFalse(self.ladder.update(row))
+        new_amounts = self.ladder.get_ladder("pool_1", self.pool_states["pool_1"][b'asset_2_id'])
+        self.assertGreater(new_amounts[1000], amounts[1000])
+
+        # The other pools are not changed
+        self.assertEqual(self.ladder.amounts, DepthLadder(self.table).amounts)
+
+        self.table.columns['total_fee_share'][row] = 100
+        self.assertEqual(self.ladder.refresh(), 1)
+        self.assertEqual(self.ladder.get_max_input_amount("pool_1", self.pool_states["pool_1"][b'asset_2_id'], 50), 0)
+
+    def test_apply_block(self):
+        _, user_address = generate_account()
+        block = {
+            b'txns': [
+                {
+                    b'txn': {b'apid': APPLICATION_ID, b'snd': decode_address(user_address), b'apat': [decode_address(self.pool_address)]},
+                    b'dt': {b'ld': {1: {b'asset_1_reserves': {b'at': 2, b'ui': 1_100}, b'asset_2_reserves': {b'at': 2, b'ui': 3_640}}}},
+                },
+            ],
+        }
+        self.assertEqual(self.ladder.apply_block(block), 1)
+        self.assertEqual(self.ladder.amounts, DepthLadder(self.table).amounts)
+
+    def test_added_pool(self):
+        pool_state = {**self.pool_states["pool_2"], b'asset_1_id': 1_000_001, b'asset_2_id': 1_000_000}
+        self.table.add("new_pool", pool_state)
+        self.assertTrue(self.ladder.update(self.table.get_row("new_pool")))
+        self.assertEqual(self.ladder.get_ladder("new_pool", 1_000_000), self.ladder.get_ladder("pool_2", self.pool_states["pool_2"][b'asset_2_id']))
@@ -0,0 +1,54 @@
+import unittest
+
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+
+from .constants import *
+from .events import EVENT_LOG_NAMES, decode_logs, get_pool_events, get_random_events
+from .pool_table import get_random_pool_states
+from .utils import itob
+
+
+class TestEvents(unittest.TestCase):
+
+    def test_contract_logs(self):
+        with open("contracts/amm_approval.tl") as f:
+            contract = f.read()
+        for names in EVENT_LOG_NAMES.values():
+            for name in names:
+                self.assertIn(f'log(concat("{name} %i"', contract)
+
+    def test_pool_events(self):
+        _, user_address = generate_account()
+        _, pool_address = generate_account()
+        logs = [b'input_asset_id %i' + itob(5), b'input_amount %i' + itob(10_000), b'change %i' + itob(0), b'output_asset_id %i' + itob(2), b'output_amount %i' + itob(9_871), itob(1)]
+        block = {
+            b'rnd': 10,
+            b'ts': 1000,
+            b'txns': [
+                {b'txn': {b'type': b'axfer'}},
+                {
+                    b'txn': {b'apid': APPLICATION_ID, b'snd': decode_address(user_address), b'apat': [decode_address(pool_address)], b'apaa': [METHOD_SWAP.encode(), b'fixed-input', itob(0)]},
+                    b'dt': {b'lg': logs, b'ld': {1: {b'asset_1_reserves': {b'at': 2, b'ui': 1_010_000}, b'asset_2_reserves': {b'at': 2, b'ui': 990_129}}}},
+                },
+                # Without logs
+                {b'txn': {b'apid': APPLICATION_ID, b'snd': decode_address(user_address), b'apat': [decode_address(pool_address)], b'apaa': [METHOD_FLASH_LOAN.encode()]}},
+            ],
+        }
+        self.assertEqual(list(get_pool_events(block)), [dict(
+            round=10,
+            timestamp=1000,
+            pool_address=pool_address,
+            method=METHOD_SWAP,
+            logs=decode_logs(logs),
+            asset_1_reserves=1_010_000,
+            asset_2_reserves=990_129,
+        )])
+        self.assertEqual(decode_logs(logs), dict(input_asset_id=5, input_amount=10_000, change=0, output_asset_id=2, output_amount=9_871))
+
+    def test_random_events(self):
+        events = get_random_events(get_random_pool_states(10), 1000)
+        self.assertEqual({event['method'] for event in events}, set(EVENT_LOG_NAMES))
+        self.assertEqual([event['timestamp'] for event in events], sorted(event['timestamp'] for event in events))
+        for event in events:
+            self.assertLessEqual(set(event['logs']), set(EVENT_LOG_NAMES[event['method']]))
@@ -0,0 +1,82 @@
+import unittest
+from unittest import mock
+
+from .constants import *
+from .events import RANDOM_EVENT_WEIGHTS, get_random_events
+from .fee_backtest import ConstantElasticity, FeeBacktester, backtest_pool, get_fee_grid, get_report, get_swap_flow
+from .pool_table import get_random_pool_states
+
+
+class TestFeeBacktest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool_states = get_random_pool_states(10)
+        self.events = get_random_events(dict(self.pool_states), 1000)
+
+    def test_fee_grid(self):
+        grid = get_fee_grid()
+        self.assertEqual(len(grid), 100 * 8)
+        self.assertEqual((grid[0], grid[-1]), ((1, 3), (100, 10)))
+        with self.assertRaises(ValueError):
+            get_fee_grid([0])
+        with self.assertRaises(ValueError):
+            get_fee_grid([30], [11])
+
+    def test_elasticity(self):
+        self.assertEqual(ConstantElasticity()(30, 60), 1)
+        self.assertEqual(ConstantElasticity(1)(30, 60), 0.5)
+        self.assertEqual(ConstantElasticity(2)(30, 15), 4)
+
+    def test_current_settings_reproduce_history(self):
+        # Only the swaps change the reserves in this history
+        with mock.patch.dict(RANDOM_EVENT_WEIGHTS, {METHOD_SWAP: 1}, clear=True):
+            events = get_random_events(dict(self.pool_states), 1000)
+        swap_flow = get_swap_flow(events)
+        for pool_address, swaps in swap_flow.items():
+            pool_state = self.pool_states[pool_address]
+            metrics = backtest_pool(pool_state, swaps, pool_state[b'total_fee_share'], pool_state[b'protocol_fee_ratio'], ConstantElasticity(1))
+            pool_events = [event for event in events if event['pool_address'] == pool_address]
+            self.assertEqual(metrics['swaps'], len(pool_events))
+            self.assertEqual(metrics['failed_swaps'], 0)
+            expected = sum(event['logs']['protocol_fee_amount'] * price for event, price in self.get_event_prices(pool_state, pool_events))
+            self.assertAlmostEqual(metrics['protocol_fee_value'], expected)
+
+    def get_event_prices(self, pool_state, pool_events):
+        """ Yields (event, asset 2 per input asset before the swap) """
+        asset_1_reserves, asset_2_reserves = pool_state[b'asset_1_reserves'], pool_state[b'asset_2_reserves']
+        for event in pool_events:
+            if event['logs']['input_asset_id'] == pool_state[b'asset_1_id']:
+                yield event, asset_2_reserves / asset_1_reserves
+            else:
+                yield event, 1
+            asset_1_reserves, asset_2_reserves = event['asset_1_reserves'], event['asset_2_reserves']
+
+    def test_fee_setting(self):
+        swap_flow = get_swap_flow(self.events)
+        pool_address, swaps = next(iter(swap_flow.items()))
+        pool_state = self.pool_states[pool_address]
+        low = backtest_pool(pool_state, swaps, 10, 5, ConstantElasticity())
+        high = backtest_pool(pool_state, swaps, 100, 5, ConstantElasticity())
+        self.assertGreater(high['protocol_fee_value'], low['protocol_fee_value'])
+        # A higher ratio is a smaller protocol share of the same total fee
+        self.assertGreater(backtest_pool(pool_state, swaps, 100, 3, ConstantElasticity())['protocol_fee_value'], high['protocol_fee_value'])
+        # The traders trade less at a higher fee
+        elastic = backtest_pool(pool_state, swaps, 100, 5, ConstantElasticity(1))
+        self.assertLess(elastic['volume_value'], high['volume_value'])
+
+    def test_sweep(self):
+        fee_grid = get_fee_grid([1, TOTAL_FEE_SHARE, 100], [3, PROTOCOL_FEE_RATIO, 10])
+        results = []
+        for worker_count in (0, 2):
+            with FeeBacktester(self.pool_states, self.events, ConstantElasticity(0.5), worker_count) as backtester:
+                results.append(backtester.run(fee_grid))
+                baseline = backtester.run_baseline()
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(set(results[0]), set(fee_grid))
+
+        rows = get_report(results[0], baseline)
+        self.assertEqual(len(rows), len(fee_grid))
+        current = next(row for row in rows if (row['total_fee_share'], row['protocol_fee_ratio']) == (TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO))
+        self.assertEqual((current['volume_change'], current['protocol_revenue_change']), (0, 0))
+        changes = [row['protocol_revenue_change'] for row in rows]
+        self.assertEqual(changes, sorted(changes, reverse=True))
@@ -0,0 +1,214 @@
+from algojig import get_suggested_params
+from algojig.exceptions import LogicEvalError
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+from .fees import set_min_fees
+from .utils import get_pool_logicsig_bytecode
+
+
+class TestMinFees(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+
+        self.fee_collector = self.app_creator_address
+        self.ledger.set_account_balance(self.fee_collector, 1_000_000)
+        self.ledger.opt_in_asset(self.fee_collector, self.asset_1_id)
+        self.ledger.opt_in_asset(self.fee_collector, self.asset_2_id)
+
+    def assert_min_app_call_fee(self, get_txn_group, app_call_index, expected_fee, sender_sk=None, sign=None):
+        sender_sk = sender_sk or self.user_sk
+        sign = sign or (lambda txn_group: self.sign_txns(txn_group, sender_sk))
+        pool_states = {self.pool_address: self.get_pool_state()}
+
+        txn_group = set_min_fees(get_txn_group(), pool_states)
+        self.assertEqual(txn_group[app_call_index].fee, expected_fee)
+
+        # Minimum fee - 1 must fail
+        txn_group[app_call_index].fee -= 1
+        txn_group = transaction.assign_group_id(txn_group)
+        with self.assertRaises(LogicEvalError) as e:
+            self.ledger.eval_transactions(sign(txn_group))
+        self.assertIn('fee too small', e.exception.error)
+
+        txn_group = set_min_fees(get_txn_group(), pool_states)
+        txn_group = transaction.assign_group_id(txn_group)
+        self.ledger.eval_transactions(sign(txn_group))
+
+    def assert_min_bootstrap_fee(self, asset_1_id, asset_2_id, min_pool_balance, expected_fee):
+        lsig = get_pool_logicsig_bytecode(amm_pool_template, APPLICATION_ID, asset_1_id, asset_2_id)
+        self.ledger.set_account_balance(lsig.address(), min_pool_balance + expected_fee + 100_000)
+
+        def get_txn_group():
+            return [
+                transaction.ApplicationOptInTxn(
+                    sender=lsig.address(),
+                    sp=self.sp,
+                    index=APPLICATION_ID,
+                    app_args=[METHOD_BOOTSTRAP],
+                    foreign_assets=[asset_1_id, asset_2_id],
+                    rekey_to=APPLICATION_ADDRESS,
+                ),
+            ]
+
+        self.assert_min_app_call_fee(get_txn_group, app_call_index=0, expected_fee=expected_fee, sign=lambda txn_group: [transaction.LogicSigTransaction(txn, lsig) for txn in txn_group])
+
+    def test_bootstrap(self):
+        # Pay, Acfg, Optin Asset 1, Optin Asset 2, Optin Pool Token, Transfer Pool Token
+        asset_2_id = self.ledger.create_asset(asset_id=None, params=dict(unit_name="BTC"))
+        asset_1_id = self.ledger.create_asset(asset_id=None, params=dict(unit_name="USD"))
+        self.assert_min_bootstrap_fee(asset_1_id, asset_2_id, MIN_POOL_BALANCE_ASA_ASA_PAIR, expected_fee=7_000)
+
+    def test_bootstrap_algo_pair(self):
+        # The Algo pair does not opt in to asset 2
+        asset_1_id = self.ledger.create_asset(asset_id=None, params=dict(unit_name="USD"))
+        self.assert_min_bootstrap_fee(asset_1_id, ALGO_ASSET_ID, MIN_POOL_BALANCE_ASA_ALGO_PAIR, expected_fee=6_000)
+
+    def test_swap_fixed_input(self):
+        self.assert_min_app_call_fee(
+            lambda: self.get_swap_transactions(self.asset_1_id, 10_000, "fixed-input", 9000),
+            app_call_index=1,
+            expected_fee=2_000,
+        )
+
+    def test_swap_fixed_output(self):
+        self.assert_min_app_call_fee(
+            lambda: self.get_swap_transactions(self.asset_1_id, 10_000, "fixed-output", 9871),
+            app_call_index=1,
+            expected_fee=2_000,
+        )
+
+    def test_swap_fixed_output_with_change(self):
+        self.assert_min_app_call_fee(
+            lambda: self.get_swap_transactions(self.asset_1_id, 10_100, "fixed-output", 9872),
+            app_call_index=1,
+            expected_fee=3_000,
+        )
+
+    def test_add_liquidity(self):
+        self.assert_min_app_call_fee(
+            lambda: self.get_add_liquidity_transactions(asset_1_amount=10_000, asset_2_amount=15_000),
+            app_call_index=2,
+            expected_fee=3_000,
+        )
+
+    def test_add_liquidity_single(self):
+        self.assert_min_app_call_fee(
+            lambda: self.get_add_liquidity_transactions(asset_1_amount=10_000, asset_2_amount=None),
+            app_call_index=1,
+            expected_fee=3_000,
+        )
+
+    def test_remove_liquidity(self):
+        self.assert_min_app_call_fee(
+            lambda: self.get_remove_liquidity_transactions(liquidity_asset_amount=5_000),
+            app_call_index=1,
+            expected_fee=3_000,
+        )
+
+    def test_remove_liquidity_single(self):
+        self.assert_min_app_call_fee(
+            lambda: self.get_remove_liquidity_single_transactions(liquidity_asset_amount=5_000, asset_id=self.asset_1_id),
+            app_call_index=1,
+            expected_fee=3_000,
+        )
+
+    def test_claim_fees(self):
+        self.set_pool_protocol_fees(5_000, 0)
+        self.assert_min_app_call_fee(
+            lambda: self.get_claim_fee_transactions(sender=self.user_addr, fee_collector=self.fee_collector),
+            app_call_index=0,
+            expected_fee=3_000,
+        )
+
+    def test_claim_extra(self):
+        self.ledger.move(5_000, self.asset_1_id, receiver=self.pool_address)
+        self.assert_min_app_call_fee(
+            lambda: self.get_claim_extra_transactions(sender=self.user_addr, asset_id=self.asset_1_id, address=self.pool_address, fee_collector=self.fee_collector),
+            app_call_index=0,
+            expected_fee=2_000,
+        )
+
+    def test_flash_loan(self):
+        def get_txn_group():
+            return [
+                transaction.ApplicationNoOpTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    index=APPLICATION_ID,
+                    app_args=[METHOD_FLASH_LOAN, 2, 10_000, 0],
+                    foreign_assets=[self.asset_1_id, self.asset_2_id],
+                    accounts=[self.pool_address],
+                ),
+                transaction.AssetTransferTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    receiver=self.pool_address,
+                    index=self.asset_1_id,
+                    amt=10_030,
+                ),
+                transaction.ApplicationNoOpTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    index=APPLICATION_ID,
+                    app_args=[METHOD_VERIFY_FLASH_LOAN, 2],
+                    accounts=[self.pool_address],
+                ),
+            ]
+
+        txn_group = set_min_fees(get_txn_group())
+        self.assertEqual(txn_group[2].fee, MIN_TXN_FEE)
+        self.assert_min_app_call_fee(get_txn_group, app_call_index=0, expected_fee=2_000)
+
+    def test_flash_swap(self):
+        def get_txn_group():
+            return [
+                transaction.ApplicationNoOpTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    index=APPLICATION_ID,
+                    app_args=[METHOD_FLASH_SWAP, 2, 10_000, 20_000],
+                    foreign_assets=[self.asset_1_id, self.asset_2_id],
+                    accounts=[self.pool_address],
+                ),
+                transaction.AssetTransferTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    receiver=self.pool_address,
+                    index=self.asset_1_id,
+                    amt=30_500,
+                ),
+                transaction.ApplicationNoOpTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    index=APPLICATION_ID,
+                    app_args=[METHOD_VERIFY_FLASH_SWAP, 2],
+                    foreign_assets=[self.asset_1_id, self.asset_2_id],
+                    accounts=[self.pool_address],
+                ),
+            ]
+
+        txn_group = set_min_fees(get_txn_group())
+        self.assertEqual(txn_group[2].fee, MIN_TXN_FEE)
+        # Both of the assets are transferred out
+        self.assert_min_app_call_fee(get_txn_group, app_call_index=0, expected_fee=3_000)
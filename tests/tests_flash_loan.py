@@ -6,8 +6,10 @@ from algosdk.account import generate_account
 from algosdk.encoding import decode_address
 from algosdk.future import transaction
 
+from .amm import get_fixed_input_swap_quote
 from .constants import *
 from .core import BaseTestCase
+from .flash_loan import evaluate_strategy, get_flash_loan_transactions, get_profitable_strategies, get_strategy_transactions
 
 
 dummy_program = TealishProgram('tests/dummy_program.tl')
@@ -1222,3 +1224,82 @@ class TestFlashLoanAlgoPair(BaseTestCase):
         with self.assertRaises(LogicEvalError) as e:
             self.ledger.eval_transactions(stxns)
         self.assertEqual(e.exception.source['line'], 'assert(Gtxn[asset_2_txn_index].Receiver == pool_address)')
+
+
+class TestFlashLoanBuilder(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = ALGO_ASSET_ID
+        cls.asset_3_id = 2
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000_000)
+        self.ledger.set_account_balance(self.user_addr, 1_000_000_000, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, 1_000_000_000, asset_id=self.asset_3_id)
+
+        self.pool_addresses = []
+        for asset_1_id, asset_2_id, asset_1_reserves, asset_2_reserves in [
+            (self.asset_1_id, self.asset_2_id, 100_000_000, 100_000_000),
+            (self.asset_3_id, self.asset_2_id, 100_000_000, 100_000_000),
+            # Asset 1 is cheaper in this pool
+            (self.asset_1_id, self.asset_3_id, 110_000_000, 100_000_000),
+        ]:
+            pool_address, pool_token_asset_id = self.bootstrap_pool(asset_1_id, asset_2_id)
+            self.ledger.opt_in_asset(self.user_addr, pool_token_asset_id)
+            self.set_initial_pool_liquidity(pool_address, asset_1_id, asset_2_id, pool_token_asset_id, asset_1_reserves=asset_1_reserves, asset_2_reserves=asset_2_reserves, liquidity_provider_address=self.user_addr)
+            self.pool_addresses.append(pool_address)
+        self.pool_address = self.pool_addresses[0]
+
+    def get_pool_states(self):
+        return {pool_address: self.get_pool_state(pool_address) for pool_address in self.pool_addresses}
+
+    def get_balances(self):
+        return {asset_id: self.ledger.get_account_balance(self.user_addr, asset_id)[0] for asset_id in (self.asset_1_id, self.asset_2_id, self.asset_3_id)}
+
+    def test_asset_1_and_algo(self):
+        pool_states = self.get_pool_states()
+        txn_group = get_flash_loan_transactions(self.sp, self.user_addr, pool_states, self.pool_address, 10_000, 20_000)
+        self.assertEqual(txn_group[0].app_args[1], (3).to_bytes(8, "big"))
+        self.assertEqual(txn_group[1].amount, 10_030)
+        self.assertEqual(txn_group[2].type, transaction.constants.payment_txn)
+        self.assertEqual(txn_group[2].amt, 20_060)
+
+        strategy = dict(pool_address=self.pool_address, asset_1_amount=10_000, asset_2_amount=20_000, swaps=[])
+        deltas = evaluate_strategy(pool_states, strategy)
+        balances = self.get_balances()
+        self.ledger.eval_transactions(self.sign_txns(transaction.assign_group_id(txn_group), self.user_sk))
+        self.assertEqual(self.get_balances(), {asset_id: balance + deltas[asset_id] for asset_id, balance in balances.items()})
+
+    def test_profitable_strategies(self):
+        pool_states = self.get_pool_states()
+        strategies = []
+        for loan_amount in (10_000, 1_000_000, 2_000_000, 20_000_000):
+            asset_3_amount, _ = get_fixed_input_swap_quote(pool_states[self.pool_addresses[1]], self.asset_2_id, loan_amount)
+            asset_1_amount, _ = get_fixed_input_swap_quote(pool_states[self.pool_addresses[2]], self.asset_3_id, asset_3_amount)
+            strategies.append(dict(
+                pool_address=self.pool_address,
+                asset_1_amount=0,
+                asset_2_amount=loan_amount,
+                swaps=[
+                    (self.pool_addresses[1], self.asset_2_id, loan_amount),
+                    (self.pool_addresses[2], self.asset_3_id, asset_3_amount),
+                    # The loaned pool can be used in between
+                    (self.pool_address, self.asset_1_id, asset_1_amount),
+                ],
+            ))
+
+        profitable_strategies = get_profitable_strategies(pool_states, strategies)
+        self.assertEqual([score for score, _ in profitable_strategies], [41545, 34703])
+
+        score, strategy = profitable_strategies[0]
+        txn_group = get_strategy_transactions(self.sp, self.user_addr, pool_states, strategy)
+        balances = self.get_balances()
+        self.ledger.eval_transactions(self.sign_txns(transaction.assign_group_id(txn_group), self.user_sk))
+        self.assertEqual(self.get_balances(), {**balances, self.asset_2_id: balances[self.asset_2_id] + score})
@@ -8,6 +8,7 @@ from algosdk.future import transaction
 
 from .constants import *
 from .core import BaseTestCase
+from .flash_swap import calculate_min_flash_swap_input_amount, get_flash_swap_transactions, plan_flash_swap
 
 dummy_program = TealishProgram('tests/dummy_program.tl')
 DUMMY_APP_ID = 11
@@ -1047,3 +1048,62 @@ class TestFlashSwap(BaseTestCase):
         with self.assertRaises(LogicEvalError) as e:
             self.ledger.eval_transactions(stxns)
         self.assertEqual(e.exception.source['line'], 'assert(Gtxn[verify_flash_swap_txn_index].Accounts[1] == Txn.Accounts[1])')
+
+
+class TestFlashSwapPlanner(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+        cls.asset_3_id = 7
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 100_000_000)
+        for asset_id in (self.asset_1_id, self.asset_2_id, self.asset_3_id):
+            self.ledger.set_account_balance(self.user_addr, 100_000_000, asset_id=asset_id)
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+
+    def test_min_input_amount(self):
+        pool_state = self.get_pool_state()
+        # The same cases as test_flash_swap_asset_1_and_asset_2_pass and test_flash_swap_repay_with_the_other_asset_pass
+        self.assertEqual(calculate_min_flash_swap_input_amount(pool_state, 10000, 20000, self.asset_1_id), 30500)
+        self.assertEqual(calculate_min_flash_swap_input_amount(pool_state, 4001, 0, self.asset_2_id), 4030)
+        # The total fee must be positive
+        self.assertEqual(calculate_min_flash_swap_input_amount(pool_state, 1, 0, self.asset_1_id), 334)
+
+    def test_flash_swap_with_intermediate_swaps(self):
+        # Asset 1 is more valuable in the other pools
+        pool_address_2, pool_token_asset_id_2 = self.bootstrap_pool(self.asset_3_id, self.asset_1_id)
+        self.ledger.opt_in_asset(self.user_addr, pool_token_asset_id_2)
+        self.set_initial_pool_liquidity(pool_address_2, self.asset_3_id, self.asset_1_id, pool_token_asset_id_2, asset_1_reserves=1_100_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+        pool_address_3, pool_token_asset_id_3 = self.bootstrap_pool(self.asset_3_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, pool_token_asset_id_3)
+        self.set_initial_pool_liquidity(pool_address_3, self.asset_3_id, self.asset_2_id, pool_token_asset_id_3, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+        pool_states = {pool_address: self.get_pool_state(pool_address) for pool_address in (self.pool_address, pool_address_2, pool_address_3)}
+
+        plan = plan_flash_swap(pool_states, self.pool_address, self.asset_1_id, 10_000, [(pool_address_2, self.asset_1_id), (pool_address_3, self.asset_3_id)])
+        self.assertEqual(plan['input_asset_id'], self.asset_2_id)
+        self.assertGreater(plan['profit'], 0)
+
+        # Minimum repayment - 1 must fail
+        plan['input_amount'] -= 1
+        txn_group = transaction.assign_group_id(get_flash_swap_transactions(self.sp, self.user_addr, pool_states, plan))
+        self.assertEqual(txn_group[0].app_args[1], (6).to_bytes(8, "big"))
+        self.assertEqual(txn_group[-1].app_args[1], (6).to_bytes(8, "big"))
+        with self.assertRaises(LogicEvalError) as e:
+            self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk))
+        self.assertEqual(e.exception.source['line'], 'assert((itob(app_local_get(1, "asset_1_reserves")) b* itob(app_local_get(1, "asset_2_reserves"))) b<= (itob(asset_1_reserves - asset_1_poolers_fee_amount) b* itob(asset_2_reserves - asset_2_poolers_fee_amount)))')
+
+        plan['input_amount'] += 1
+        txn_group = transaction.assign_group_id(get_flash_swap_transactions(self.sp, self.user_addr, pool_states, plan))
+        balance = self.ledger.get_account_balance(self.user_addr, self.asset_2_id)[0]
+        self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk))
+        self.assertEqual(self.ledger.get_account_balance(self.user_addr, self.asset_2_id)[0], balance + plan['profit'])
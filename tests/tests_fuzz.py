@@ -0,0 +1,205 @@
+import os
+import random
+
+from algojig import get_suggested_params
+from algojig.exceptions import LogicEvalError
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+from .fuzz import (
+    FUZZ_TIMESTAMP, POOLS_PER_BLOCK, format_reproducers, generate_cases, get_asset_ids, get_model_failure,
+    get_model_violations, get_pool_local_state, get_user_input_amounts, is_matching, normalize_pool_state, run_model,
+    shrink_case,
+)
+from .utils import get_pool_logicsig_bytecode
+
+# python -m unittest tests.tests_fuzz with FUZZ_CASES=1000000 FUZZ_SAMPLE_RATE=0.001 for a longer run
+FUZZ_SEED = int(os.environ.get("FUZZ_SEED", 0))
+FUZZ_CASES = int(os.environ.get("FUZZ_CASES", 800))
+FUZZ_SAMPLE_RATE = float(os.environ.get("FUZZ_SAMPLE_RATE", 0.1))
+
+
+class FuzzTestCase(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+
+    def setUp(self):
+        self.reset_ledger()
+
+    def reset_ledger(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 10 ** 12)
+
+    def setup_pool(self, index, case):
+        asset_1_id, asset_2_id, pool_token_asset_id = get_asset_ids(index)
+        pool = case['pool']
+        pool_address = get_pool_logicsig_bytecode(amm_pool_template, APPLICATION_ID, asset_1_id, asset_2_id).address()
+
+        self.ledger.set_account_balance(pool_address, 1_000_000)
+        self.ledger.set_auth_addr(pool_address, APPLICATION_ADDRESS)
+        self.ledger.set_account_balance(pool_address, pool['asset_1_reserves'] + pool['asset_1_protocol_fees'], asset_id=asset_1_id)
+        self.ledger.set_account_balance(pool_address, pool['asset_2_reserves'] + pool['asset_2_protocol_fees'], asset_id=asset_2_id)
+        self.ledger.create_asset(asset_id=pool_token_asset_id, params=dict(creator=APPLICATION_ADDRESS))
+        self.ledger.set_account_balance(pool_address, POOL_TOKEN_TOTAL_SUPPLY - (pool['issued_pool_tokens'] - LOCKED_POOL_TOKENS), asset_id=pool_token_asset_id)
+        self.ledger.set_local_state(address=pool_address, app_id=APPLICATION_ID, state=get_pool_local_state(pool, asset_1_id, asset_2_id, pool_token_asset_id))
+
+        input_amounts = get_user_input_amounts(case)
+        for asset, asset_id in enumerate((asset_1_id, asset_2_id, pool_token_asset_id), start=1):
+            self.ledger.set_account_balance(self.user_addr, input_amounts.get(asset, 0), asset_id=asset_id)
+        return pool_address
+
+    def get_case_transactions(self, index, case, pool_address):
+        # The group builders of BaseTestCase use the pool attributes of the test case
+        self.pool_address = pool_address
+        self.asset_1_id, self.asset_2_id, self.pool_token_asset_id = get_asset_ids(index)
+        args = case['args']
+        if case['method'] == METHOD_SWAP:
+            input_asset_id = self.asset_1_id if args['input_asset'] == 1 else self.asset_2_id
+            txn_group = self.get_swap_transactions(input_asset_id, args['input_amount'], args['mode'], args['min_output'])
+        elif case['method'] == METHOD_ADD_LIQUIDITY:
+            txn_group = self.get_add_liquidity_transactions(args['asset_1_amount'], args['asset_2_amount'], args['min_output'])
+        elif args['output_asset']:
+            output_asset_id = self.asset_1_id if args['output_asset'] == 1 else self.asset_2_id
+            txn_group = self.get_remove_liquidity_single_transactions(args['removed_pool_token_amount'], output_asset_id)
+        else:
+            txn_group = self.get_remove_liquidity_transactions(args['removed_pool_token_amount'], args['min_output_1'], args['min_output_2'])
+        # Fees are not under test and the failing cases have no fee path, the max fee covers every path
+        for txn in txn_group:
+            txn.fee = MIN_TXN_FEE * 3
+        txn_group = transaction.assign_group_id(txn_group)
+        return self.sign_txns(txn_group, self.user_sk)
+
+    def get_ledger_outcome(self, index, case, pool_address):
+        asset_ids = get_asset_ids(index)
+        user_balance_deltas = {}
+        for asset, asset_id in enumerate(asset_ids, start=1):
+            delta = self.ledger.get_account_balance(self.user_addr, asset_id)[0] - get_user_input_amounts(case).get(asset, 0)
+            if delta:
+                user_balance_deltas[asset] = delta
+        return "ok", normalize_pool_state(self.get_pool_state(pool_address)), user_balance_deltas
+
+    def evaluate_on_ledger(self, cases):
+        """ Evaluates independent cases in one block, the cases must be expected to pass """
+        self.reset_ledger()
+        pool_addresses = [self.setup_pool(index, case) for index, case in enumerate(cases)]
+        stxns = []
+        for index, case in enumerate(cases):
+            stxns += self.get_case_transactions(index, case, pool_addresses[index])
+        self.ledger.eval_transactions(stxns, block_timestamp=FUZZ_TIMESTAMP)
+        return [self.get_ledger_outcome(index, case, pool_addresses[index]) for index, case in enumerate(cases)]
+
+    def evaluate_case_on_ledger(self, case):
+        # Model outcomes use the asset ids of the pool at index 0
+        try:
+            return self.evaluate_on_ledger([case])[0]
+        except LogicEvalError as e:
+            return "error", (e.source or {}).get('line')
+
+    def run_model(self, case):
+        return run_model(case, asset_ids=get_asset_ids(0))
+
+    def is_mismatching(self, case):
+        model_outcome, model_failure = get_model_failure(case)
+        return model_failure is not None or not is_matching(model_outcome, self.evaluate_case_on_ledger(case))
+
+    def find_mismatches(self, cases, sample_rate, seed=0):
+        """
+        Runs every case on the model and a sample of them on the ledger.
+        Returns the cases which fail on the model itself (an exception or a violated invariant) and the mismatching
+        cases, each of them is shrunk to a minimal case.
+        """
+        rng = random.Random(seed)
+        mismatches = []
+        # The outcomes do not depend on the asset ids, the ledger cases are packed with the ids of their block index
+        model_outcomes = []
+        for case in cases:
+            model_outcome, model_failure = get_model_failure(case)
+            if model_failure is not None:
+                mismatches.append(case)
+            elif rng.random() < sample_rate:
+                model_outcomes.append((case, model_outcome))
+
+        passing_cases = []
+        for case, model_outcome in model_outcomes:
+            if model_outcome[0] == "ok":
+                passing_cases.append((case, model_outcome))
+            elif not is_matching(model_outcome, self.evaluate_case_on_ledger(case)):
+                mismatches.append(case)
+
+        for i in range(0, len(passing_cases), POOLS_PER_BLOCK):
+            block_cases = passing_cases[i:i + POOLS_PER_BLOCK]
+            try:
+                ledger_outcomes = self.evaluate_on_ledger([case for case, _ in block_cases])
+            except LogicEvalError:
+                # At least one of the groups failed, the whole block is rejected
+                mismatches += [case for case, _ in block_cases if self.is_mismatching(case)]
+                continue
+            for (case, model_outcome), ledger_outcome in zip(block_cases, ledger_outcomes):
+                if not is_matching(model_outcome, ledger_outcome):
+                    mismatches.append(case)
+
+        return [shrink_case(case, self.is_mismatching) for case in mismatches]
+
+    def assert_model_matches_ledger(self, pool, method, args):
+        case = dict(pool=pool, method=method, args=args)
+        model_outcome = self.run_model(case)
+        self.assertEqual(get_model_violations(case, model_outcome), [])
+        ledger_outcome = self.evaluate_case_on_ledger(case)
+        self.assertTrue(is_matching(model_outcome, ledger_outcome), msg=f"model: {model_outcome}, ledger: {ledger_outcome}")
+
+
+class TestDifferentialFuzz(FuzzTestCase):
+
+    def test_model_matches_ledger(self):
+        cases = generate_cases(FUZZ_SEED, FUZZ_CASES)
+        mismatches = self.find_mismatches(cases, FUZZ_SAMPLE_RATE, seed=FUZZ_SEED)
+        # The reproducers are reported in the failure message, they can be pasted into this module
+        reproducers = format_reproducers(mismatches) if mismatches else None
+        self.assertEqual(mismatches, [], msg=reproducers)
+
+    def test_model_violations(self):
+        case = dict(
+            pool=dict(asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, issued_pool_tokens=1_000_000, total_fee_share=TOTAL_FEE_SHARE, protocol_fee_ratio=PROTOCOL_FEE_RATIO, asset_1_protocol_fees=0, asset_2_protocol_fees=0),
+            method=METHOD_SWAP,
+            args=dict(input_asset=1, input_amount=10_000, mode="fixed-input", min_output=0),
+        )
+        status, pool_state, user_balance_deltas = run_model(case)
+        self.assertEqual(get_model_violations(case, (status, pool_state, user_balance_deltas)), [])
+        pool_state = {**pool_state, b'asset_2_reserves': pool_state[b'asset_2_reserves'] + 1}
+        self.assertEqual(get_model_violations(case, (status, pool_state, user_balance_deltas)), ["asset 2 is not conserved"])
+
+    def test_swap_fee_overflow(self):
+        self.assert_model_matches_ledger(
+            pool=dict(asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, issued_pool_tokens=1_000_000, total_fee_share=100, protocol_fee_ratio=10, asset_1_protocol_fees=0, asset_2_protocol_fees=0),
+            method=METHOD_SWAP,
+            args=dict(input_asset=1, input_amount=MAX_ASSET_AMOUNT // 2, mode="fixed-input", min_output=0),
+        )
+
+    def test_swap_max_reserves(self):
+        self.assert_model_matches_ledger(
+            pool=dict(asset_1_reserves=MAX_ASSET_AMOUNT - 1, asset_2_reserves=MAX_ASSET_AMOUNT - 1, issued_pool_tokens=MAX_ASSET_AMOUNT - 1, total_fee_share=1, protocol_fee_ratio=3, asset_1_protocol_fees=0, asset_2_protocol_fees=0),
+            method=METHOD_SWAP,
+            args=dict(input_asset=2, input_amount=1, mode="fixed-input", min_output=0),
+        )
+
+    def test_add_liquidity_max_reserves(self):
+        self.assert_model_matches_ledger(
+            pool=dict(asset_1_reserves=MAX_ASSET_AMOUNT // 2, asset_2_reserves=MAX_ASSET_AMOUNT // 2, issued_pool_tokens=MAX_ASSET_AMOUNT // 2, total_fee_share=TOTAL_FEE_SHARE, protocol_fee_ratio=PROTOCOL_FEE_RATIO, asset_1_protocol_fees=0, asset_2_protocol_fees=0),
+            method=METHOD_ADD_LIQUIDITY,
+            args=dict(asset_1_amount=MAX_ASSET_AMOUNT // 2 + 1, asset_2_amount=MAX_ASSET_AMOUNT // 2, min_output=0),
+        )
+
+    def test_remove_liquidity_single_all_but_locked(self):
+        self.assert_model_matches_ledger(
+            pool=dict(asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, issued_pool_tokens=1_000_000, total_fee_share=TOTAL_FEE_SHARE, protocol_fee_ratio=PROTOCOL_FEE_RATIO, asset_1_protocol_fees=0, asset_2_protocol_fees=0),
+            method=METHOD_REMOVE_LIQUIDITY,
+            args=dict(removed_pool_token_amount=1_000_000 - LOCKED_POOL_TOKENS, min_output_1=0, min_output_2=0, output_asset=1),
+        )
@@ -0,0 +1,84 @@
+from algojig import get_suggested_params
+from algojig.exceptions import LogicEvalError
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+
+from .constants import *
+from .core import BaseTestCase
+from .instrumentation import EvalRecorder, get_block_metrics
+
+
+class TestEvalRecorder(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+
+    def test_records(self):
+        eval_transactions = JigLedger.eval_transactions
+        with EvalRecorder() as recorder:
+            recorder.test_id = self.id()
+            block = self.ledger.eval_transactions(self.sign_txns(self.get_swap_transactions(self.asset_1_id, 10_000), self.user_sk))
+            self.ledger.eval_transactions(self.sign_txns(self.get_add_liquidity_transactions(10_000, 10_000), self.user_sk))
+            with self.assertRaises(LogicEvalError):
+                self.ledger.eval_transactions(self.sign_txns(self.get_swap_transactions(self.asset_1_id, 10_000, min_output=10_000), self.user_sk))
+        # The ledger is not wrapped after the recorder is disabled
+        self.assertIs(JigLedger.eval_transactions, eval_transactions)
+
+        swap_record, add_liquidity_record, failed_swap_record = recorder.records
+        self.assertEqual(swap_record['method'], METHOD_SWAP)
+        self.assertEqual(swap_record['test'], self.id())
+        self.assertFalse(swap_record['failed'])
+        # The output is transferred by an inner transaction
+        self.assertEqual(swap_record['inner_transactions'], 1)
+        self.assertEqual(swap_record['opcode_budget'], 700)
+        self.assertEqual(swap_record['log_bytes'], sum(len(log) for log in block[b'txns'][1][b'dt'][b'lg']))
+        self.assertGreater(swap_record['local_state_delta_bytes'], 0)
+        self.assertEqual(add_liquidity_record['method'], METHOD_ADD_LIQUIDITY)
+        self.assertEqual(failed_swap_record['method'], METHOD_SWAP)
+        self.assertTrue(failed_swap_record['failed'])
+
+        summary = recorder.get_summary()
+        self.assertEqual(summary[METHOD_SWAP]['groups'], 2)
+        self.assertEqual(summary[METHOD_SWAP]['failed_groups'], 1)
+        self.assertEqual(summary[METHOD_SWAP]['mean_inner_transactions'], 1)
+
+        stacks = recorder.get_folded_stacks()
+        self.assertEqual(set(stacks), {f"tests.tests_instrumentation;TestEvalRecorder;test_records;{method}" for method in (METHOD_SWAP, METHOD_ADD_LIQUIDITY)})
+
+    def test_block_metrics(self):
+        block = {
+            b'txns': [
+                {b'txn': {b'type': b'axfer'}},
+                {
+                    b'txn': {b'type': b'appl', b'apid': APPLICATION_ID},
+                    b'dt': {
+                        b'lg': [b'input_amount %i' % 1, b'x' * 10],
+                        b'ld': {1: {b'asset_1_reserves': {b'at': 2, b'ui': 5}, b'asset_1_cumulative_price': {b'at': 1, b'bs': b'\x01' * 16}}},
+                        b'itx': [{b'txn': {b'type': b'axfer'}}, {b'txn': {b'type': b'appl'}, b'dt': {b'lg': [b'y']}}],
+                    },
+                },
+            ],
+        }
+        self.assertEqual(get_block_metrics(block), dict(
+            app_calls=2,
+            inner_transactions=2,
+            log_bytes=len(b'input_amount 1') + 10 + 1,
+            local_state_delta_keys=2,
+            local_state_delta_bytes=len(b'asset_1_reserves') + 8 + len(b'asset_1_cumulative_price') + 16,
+        ))
@@ -0,0 +1,39 @@
+import unittest
+
+from algosdk import encoding
+
+from .constants import *
+from .load import LoadGenerator
+
+
+class TestLoadGenerator(unittest.TestCase):
+
+    def test_workload_is_replayable_from_seed(self):
+        workloads = []
+        for _ in range(2):
+            generator = LoadGenerator(seed=1, user_count=5, pool_count=3)
+            workload = generator.generate_workload(100)
+            workloads.append([(method, [encoding.msgpack_encode(stxn) for stxn in stxns]) for method, stxns in workload])
+        self.assertEqual(workloads[0], workloads[1])
+
+        other_workload = LoadGenerator(seed=2, user_count=5, pool_count=3).generate_workload(100)
+        self.assertNotEqual(workloads[0], [(method, [encoding.msgpack_encode(stxn) for stxn in stxns]) for method, stxns in other_workload])
+
+    def test_run(self):
+        generator = LoadGenerator(seed=1, user_count=10, pool_count=5)
+        workload = generator.generate_workload(300)
+        report = generator.run(workload, txns_per_block=200, latency_sample_rate=0.05)
+
+        self.assertEqual(report['groups'], 300)
+        self.assertEqual(report['transactions'], sum(len(stxns) for _, stxns in workload))
+        self.assertGreater(report['blocks'], 1)
+        self.assertGreater(report['transactions_per_second'], 0)
+        self.assertEqual(set(report['latency']), {METHOD_SWAP, METHOD_ADD_LIQUIDITY, METHOD_REMOVE_LIQUIDITY, METHOD_FLASH_LOAN})
+        self.assertEqual(len(report['state_growth']), report['blocks'] + 1)
+
+        # The shadow model and the ledger must agree after the workload
+        for pool in generator.pools:
+            ledger_state = generator.get_pool_state(pool['address'])
+            model_state = generator.pool_states[pool['address']]
+            for key in (b'asset_1_reserves', b'asset_2_reserves', b'issued_pool_tokens', b'asset_1_protocol_fees', b'asset_2_protocol_fees'):
+                self.assertEqual(ledger_state[key], model_state[key])
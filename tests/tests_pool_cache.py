@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+from .pool_cache import PoolStateCache
+
+
+class TestPoolStateCache(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+        cls.asset_3_id = 7
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        for asset_id in (self.asset_1_id, self.asset_2_id, self.asset_3_id):
+            self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=asset_id)
+
+        self.pool_addresses = []
+        for asset_1_id, asset_2_id in [(self.asset_1_id, self.asset_2_id), (self.asset_3_id, self.asset_2_id)]:
+            pool_address, pool_token_asset_id = self.bootstrap_pool(asset_1_id, asset_2_id)
+            self.ledger.opt_in_asset(self.user_addr, pool_token_asset_id)
+            self.set_initial_pool_liquidity(pool_address, asset_1_id, asset_2_id, pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+            self.pool_addresses.append(pool_address)
+        self.pool_address = self.pool_addresses[0]
+        self.cache = PoolStateCache(lambda address: dict(self.get_pool_state(address)), round=1)
+
+    def test_invalidation(self):
+        other_pool_address = self.pool_addresses[1]
+        self.assertEqual(self.cache.get(self.pool_address), self.get_pool_state())
+        self.cache.get(self.pool_address)
+        self.cache.get(other_pool_address)
+        self.assertEqual(self.cache.get_metrics(), dict(hits=1, misses=2, hit_rate=1 / 3, size=2))
+
+        txn_group = transaction.assign_group_id(self.get_swap_transactions(self.asset_1_id, 10_000))
+        block = self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk))
+        self.cache.apply_block(2, block)
+
+        # Only the swapped pool is reloaded
+        self.assertEqual(self.cache.get(self.pool_address)[b'asset_1_reserves'], self.get_pool_state()[b'asset_1_reserves'])
+        self.assertEqual(self.cache.get(other_pool_address, round=1), self.get_pool_state(other_pool_address))
+        self.assertEqual(self.cache.get_metrics()['misses'], 3)
+        with self.assertRaises(LookupError):
+            self.cache.get(self.pool_address, round=1)
+
+    def test_eviction(self):
+        cache = PoolStateCache(lambda address: dict(self.get_pool_state(address)), max_size=1)
+        cache.get(self.pool_addresses[0])
+        cache.get(self.pool_addresses[1])
+        self.assertEqual(list(cache.entries), [self.pool_addresses[1]])
+
+    def test_block_during_load(self):
+        # A block of the next round is applied while the state of the previous round is loaded
+        def loader(address):
+            pool_state = dict(self.get_pool_state(address))
+            cache.apply_block(2, {b'txns': []})
+            return pool_state
+
+        cache = PoolStateCache(loader, round=1)
+        cache.get(self.pool_address)
+        self.assertEqual(cache.entries, {})
+
+        # The pool is invalidated while it is loaded
+        def loader(address):
+            pool_state = dict(self.get_pool_state(address))
+            cache.invalidate([address])
+            return pool_state
+
+        cache = PoolStateCache(loader, round=1)
+        cache.get(self.pool_address)
+        self.assertEqual(cache.entries, {})
+        self.assertEqual(cache.pending_loads, {})
+
+    def test_concurrent_reads(self):
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda i: self.cache.get(self.pool_addresses[i % 2]), range(1000)))
+        metrics = self.cache.get_metrics()
+        self.assertEqual(metrics['hits'] + metrics['misses'], 1000)
+        self.assertEqual(metrics['size'], 2)
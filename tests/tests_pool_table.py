@@ -0,0 +1,128 @@
+import os
+import tempfile
+import unittest
+
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+
+from .constants import *
+from .pool_table import PoolTable
+
+
+class TestPoolTable(unittest.TestCase):
+
+    def setUp(self):
+        _, self.pool_1_address = generate_account()
+        _, self.pool_2_address = generate_account()
+        self.pool_states = {
+            self.pool_1_address: {
+                b'asset_1_id': 5,
+                b'asset_2_id': ALGO_ASSET_ID,
+                b'pool_token_asset_id': 10,
+                b'asset_1_reserves': 1_000_000,
+                b'asset_2_reserves': 4_000_000,
+                b'issued_pool_tokens': 2_000_000,
+                b'total_fee_share': TOTAL_FEE_SHARE,
+                b'protocol_fee_ratio': PROTOCOL_FEE_RATIO,
+                b'cumulative_price_update_timestamp': 100,
+                b'asset_1_cumulative_price': (4 << 64).to_bytes(16, 'big'),
+                b'asset_2_cumulative_price': (1 << 62).to_bytes(16, 'big'),
+            },
+            self.pool_2_address: {
+                b'asset_1_id': 7,
+                b'asset_2_id': 5,
+                b'pool_token_asset_id': 11,
+                b'asset_1_reserves': 3_000_000,
+                b'asset_2_reserves': 1_000_000,
+                b'issued_pool_tokens': 1_732_050,
+                b'total_fee_share': TOTAL_FEE_SHARE,
+                b'protocol_fee_ratio': PROTOCOL_FEE_RATIO,
+            },
+        }
+        self.table = PoolTable.from_pool_states(self.pool_states)
+
+    def test_lookup(self):
+        row = self.table.get_row(self.pool_2_address)
+        self.assertEqual(self.table.find(5, 7), row)
+        self.assertEqual(self.table.find(7, 5), row)
+        self.assertIsNone(self.table.find(7, ALGO_ASSET_ID))
+        self.assertEqual(self.table.columns['asset_1_reserves'][row], 3_000_000)
+
+        pool_state = self.table.get_pool_state(self.table.get_row(self.pool_1_address))
+        self.assertEqual(pool_state[b'asset_1_cumulative_price'], 4 << 64)
+        self.assertEqual(pool_state[b'asset_2_protocol_fees'], 0)
+        self.assertEqual(self.table.get_pool_state(row)[b'asset_1_cumulative_price'], 0)
+
+        with self.assertRaises(ValueError):
+            self.table.add(self.pool_1_address, self.pool_states[self.pool_1_address])
+
+    def test_apply_block(self):
+        # A swap of the pool 2 and a remove liquidity of the pool 1 by an inner transaction, the user is not a pool
+        _, user_address = generate_account()
+        block = {
+            b'txns': [
+                {
+                    b'txn': {b'apid': APPLICATION_ID, b'snd': decode_address(user_address), b'apat': [decode_address(self.pool_2_address)]},
+                    b'dt': {b'ld': {1: {b'asset_1_reserves': {b'at': 2, b'ui': 3_010_000}, b'asset_2_protocol_fees': {b'at': 2, b'ui': 5}}}},
+                },
+                {
+                    b'txn': {b'apid': 1, b'snd': decode_address(user_address)},
+                    b'dt': {b'itx': [
+                        {
+                            b'txn': {b'apid': APPLICATION_ID, b'snd': decode_address(user_address), b'apat': [decode_address(self.pool_1_address)]},
+                            b'dt': {b'ld': {
+                                0: {b'lock': {b'at': 2, b'ui': 1}},
+                                1: {b'issued_pool_tokens': {b'at': 2, b'ui': 1_500_000}, b'asset_2_cumulative_price': {b'at': 1, b'bs': (5 << 64).to_bytes(16, 'big')}},
+                            }},
+                        },
+                    ]},
+                },
+            ],
+        }
+        self.assertEqual(self.table.apply_block(block), 2)
+
+        pool_2_state = self.table.get_pool_state(self.table.get_row(self.pool_2_address))
+        self.assertEqual(pool_2_state[b'asset_1_reserves'], 3_010_000)
+        self.assertEqual(pool_2_state[b'asset_2_protocol_fees'], 5)
+        self.assertEqual(pool_2_state[b'asset_2_reserves'], 1_000_000)
+        pool_1_state = self.table.get_pool_state(self.table.get_row(self.pool_1_address))
+        self.assertEqual(pool_1_state[b'issued_pool_tokens'], 1_500_000)
+        self.assertEqual(pool_1_state[b'asset_1_cumulative_price'], 4 << 64)
+        self.assertEqual(pool_1_state[b'asset_2_cumulative_price'], 5 << 64)
+
+        # The deleted keys are 0
+        self.table.apply_state_delta(self.pool_1_address, {b'asset_2_protocol_fees': {b'at': 3}})
+        self.assertEqual(self.table.columns['asset_2_protocol_fees'][self.table.get_row(self.pool_1_address)], 0)
+
+    def test_slice(self):
+        columns = self.table.get_slice(1, 2)
+        self.assertEqual(list(columns['asset_1_id']), [7])
+        # The slices are views of the columns
+        self.table.columns['asset_1_reserves'][1] = 42
+        self.assertEqual(columns['asset_1_reserves'][0], 42)
+
+    def test_save_and_load(self):
+        fd, path = tempfile.mkstemp(suffix=".bin")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        self.table.save(path)
+
+        table = PoolTable.load(path)
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.find(ALGO_ASSET_ID, 5), self.table.get_row(self.pool_1_address))
+        for row in range(len(table)):
+            self.assertEqual(table.get_pool_state(row), self.table.get_pool_state(row))
+        with self.assertRaises(ValueError):
+            table.add("pool_3", self.pool_states[self.pool_1_address])
+        table.close()
+
+        # The updates of a writable table are written to the file
+        table = PoolTable.load(path, writable=True)
+        table.apply_state_delta(self.pool_2_address, {b'asset_2_reserves': {b'at': 2, b'ui': 999_000}})
+        table.close()
+        table = PoolTable.load(path)
+        self.assertEqual(table.columns['asset_2_reserves'][table.get_row(self.pool_2_address)], 999_000)
+        # The columns are views of the file
+        with self.assertRaises(ValueError):
+            table.save(path)
+        table.close()
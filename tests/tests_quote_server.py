@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+
+from . import amm
+from .algod import AlgodClient, AlgodError
+from .constants import *
+from .pool_table import PoolTable
+from .quote_server import QuoteServer
+
+
+class TestQuoteServer(unittest.TestCase):
+
+    def setUp(self):
+        self.pool_state = {
+            b'asset_1_id': 5,
+            b'asset_2_id': ALGO_ASSET_ID,
+            b'pool_token_asset_id': 10,
+            b'asset_1_reserves': 1_000_000,
+            b'asset_2_reserves': 4_000_000,
+            b'issued_pool_tokens': 2_000_000,
+            b'asset_1_protocol_fees': 0,
+            b'asset_2_protocol_fees': 0,
+            b'total_fee_share': TOTAL_FEE_SHARE,
+            b'protocol_fee_ratio': PROTOCOL_FEE_RATIO,
+            b'cumulative_price_update_timestamp': 100,
+        }
+        self.table = PoolTable.from_pool_states({'pool_1': self.pool_state})
+
+    def run_with_server(self, function):
+        async def run():
+            server = await QuoteServer(self.table, round=7).start()
+            try:
+                async with AlgodClient(server.host, server.port, max_connections=8) as client:
+                    return await function(server, client)
+            finally:
+                await server.close()
+        return asyncio.run(run())
+
+    def test_quotes(self):
+        async def run(server, client):
+            return await asyncio.gather(
+                client.request("GET", "/v1/quotes/swap?pool=pool_1&asset_id=5&amount=10000"),
+                client.request("GET", "/v1/quotes/swap?pool=pool_1&asset_id=0&amount=10000&mode=fixed-output"),
+                client.request("GET", "/v1/quotes/add-liquidity?pool=pool_1&asset_1_amount=10000"),
+                client.request("GET", "/v1/quotes/remove-liquidity?pool=pool_1&pool_token_amount=10000&asset_id=0"),
+            )
+
+        responses = self.run_with_server(run)
+        self.assertEqual([response['round'] for response in responses], [7] * 4)
+        self.assertEqual(responses[0]['quote'], amm.swap(self.pool_state, 5, 10_000, "fixed-input", 0, timestamp=100)[1])
+
+        _, result = amm.swap(self.pool_state, ALGO_ASSET_ID, 100_000, "fixed-output", 10_000, timestamp=100)
+        self.assertEqual(responses[1]['quote']['output_amount'], 10_000)
+        self.assertEqual(responses[1]['quote']['input_amount'], 100_000 - result['change'])
+        self.assertEqual(responses[2]['quote'], amm.add_liquidity(self.pool_state, 10_000, None, timestamp=100)[1])
+        self.assertEqual(responses[3]['quote'], amm.remove_liquidity(self.pool_state, 10_000, output_asset_id=ALGO_ASSET_ID, timestamp=100)[1])
+
+    def test_coalescing(self):
+        async def run(server, client):
+            responses = await asyncio.gather(*[client.request("GET", "/v1/quotes/swap?pool=pool_1&asset_id=5&amount=10000") for _ in range(8)])
+            return responses, server.request_count, server.quote_count
+
+        responses, request_count, quote_count = self.run_with_server(run)
+        self.assertEqual(request_count, 8)
+        self.assertEqual(quote_count, 1)
+        self.assertEqual(len({str(response) for response in responses}), 1)
+
+    def test_errors(self):
+        async def run(server, client):
+            errors = []
+            for path in [
+                "/v1/quotes/swap?pool=pool_1&asset_id=5&amount=0",
+                "/v1/quotes/swap?pool=pool_2&asset_id=5&amount=10000",
+                "/v1/quotes/swap?pool=pool_1&asset_id=5&amount=x",
+                "/v1/quotes/flash-loan?pool=pool_1",
+            ]:
+                with self.assertRaises(AlgodError) as e:
+                    await client.request("GET", path)
+                errors.append((e.exception.status, e.exception.message))
+            return errors
+
+        self.assertEqual(
+            self.run_with_server(run),
+            [
+                (400, "assert(input_amount)"),
+                (404, "pool_2 is not a pool"),
+                (400, "invalid literal for int() with base 10: 'x'"),
+                (404, "flash-loan is not a quote"),
+            ],
+        )
+
+    def test_state_update(self):
+        async def run(server, client):
+            # A swap of the pool changed the reserves
+            server.table.apply_state_delta('pool_1', {b'asset_1_reserves': {b'at': 2, b'ui': 2_000_000}})
+            server.round = 8
+            return await client.request("GET", "/v1/quotes/swap?pool=pool_1&asset_id=5&amount=10000")
+
+        response = self.run_with_server(run)
+        self.assertEqual(response['round'], 8)
+        pool_state = {**self.pool_state, b'asset_1_reserves': 2_000_000}
+        self.assertEqual(response['quote'], amm.swap(pool_state, 5, 10_000, "fixed-input", 0, timestamp=100)[1])
@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import unittest
+
+from .constants import *
+from .events import get_random_events
+from .pool_table import get_random_pool_states
+from .revenue import DAY, YEAR, RevenueAggregator, get_fee_amounts, recompute
+
+
+class TestRevenue(unittest.TestCase):
+
+    def test_fee_amounts(self):
+        swap = dict(method=METHOD_SWAP, logs=dict(input_asset_id=2, output_asset_id=5, poolers_fee_amount=25, protocol_fee_amount=5))
+        self.assertEqual(get_fee_amounts(swap), (0, 0, 25, 5))
+        add_liquidity = dict(method=METHOD_ADD_LIQUIDITY, logs=dict(input_asset_id=5, output_asset_id=2, poolers_fee_amount=8, protocol_fee_amount=2))
+        self.assertEqual(get_fee_amounts(add_liquidity), (8, 2, 0, 0))
+        flash_loan = dict(method=METHOD_VERIFY_FLASH_LOAN, logs=dict(asset_2_poolers_fee_amount=4, asset_2_protocol_fee_amount=1))
+        self.assertEqual(get_fee_amounts(flash_loan), (0, 0, 4, 1))
+        # The two asset remove_liquidity has no fee
+        self.assertEqual(get_fee_amounts(dict(method=METHOD_REMOVE_LIQUIDITY, logs={})), (0, 0, 0, 0))
+
+    def test_aggregator(self):
+        rows = []
+        aggregator = RevenueAggregator(rows.append, period=DAY)
+
+        def add_event(timestamp, method, logs, reserves=(None, None)):
+            aggregator.add_event(dict(pool_address='pool', timestamp=timestamp, method=method, logs=logs, asset_1_reserves=reserves[0], asset_2_reserves=reserves[1]))
+
+        add_event(10, METHOD_SWAP, dict(input_asset_id=5, output_asset_id=2, poolers_fee_amount=200, protocol_fee_amount=50), (1_000_000, 4_000_000))
+        add_event(20, METHOD_SWAP, dict(input_asset_id=2, output_asset_id=5, poolers_fee_amount=400, protocol_fee_amount=100), (900_000, 4_000_000))
+        add_event(DAY + 5, METHOD_VERIFY_FLASH_LOAN, dict(asset_1_poolers_fee_amount=10, asset_1_protocol_fee_amount=2))
+        self.assertEqual(len(rows), 1)
+        price = 4_000_000 / 900_000
+        self.assertEqual(rows[0], dict(
+            pool_address='pool',
+            period_start=0,
+            asset_1_poolers_fee_amount=200,
+            asset_1_protocol_fee_amount=50,
+            asset_2_poolers_fee_amount=400,
+            asset_2_protocol_fee_amount=100,
+            asset_1_reserves=900_000,
+            asset_2_reserves=4_000_000,
+            poolers_fee_value=200 * price + 400,
+            protocol_fee_value=50 * price + 100,
+            apr=(200 * price + 400) / 8_000_000 * 365,
+        ))
+
+        with self.assertRaises(ValueError):
+            add_event(5, METHOD_SWAP, {})
+        aggregator.flush()
+        # The reserves of the previous period are used if the events do not change them
+        self.assertEqual((rows[1]['period_start'], rows[1]['asset_1_poolers_fee_amount'], rows[1]['asset_1_reserves']), (DAY, 10, 900_000))
+        self.assertEqual(rows[1]['apr'], 10 * price / 8_000_000 * YEAR / DAY)
+
+    def test_recompute(self):
+        events = get_random_events(get_random_pool_states(20), 2000, interval=60)
+        fd, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        results = []
+        for worker_count in (0, 2):
+            recompute(events, path, period=3600, worker_count=worker_count)
+            with open(path) as f:
+                results.append([json.loads(line) for line in f])
+        self.assertEqual(results[0], results[1])
+
+        rows = results[0]
+        self.assertEqual(rows, sorted(rows, key=lambda row: (row['period_start'], row['pool_address'])))
+        for index, key in enumerate(('asset_1_poolers_fee_amount', 'asset_1_protocol_fee_amount', 'asset_2_poolers_fee_amount', 'asset_2_protocol_fee_amount')):
+            self.assertEqual(sum(row[key] for row in rows), sum(get_fee_amounts(event)[index] for event in events))
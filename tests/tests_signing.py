@@ -0,0 +1,37 @@
+import base64
+
+from algojig import get_suggested_params
+from algosdk.account import generate_account
+from algosdk.encoding import msgpack_encode
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+from .signing import BatchSigner
+from .utils import get_pool_logicsig_bytecode
+
+
+class TestBatchSigner(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+        cls.pool_token_asset_id = 6
+        cls.pool_address = get_pool_logicsig_bytecode(amm_pool_template, APPLICATION_ID, cls.asset_1_id, cls.asset_2_id).address()
+
+    def test_sign(self):
+        txn_groups = [transaction.assign_group_id(self.get_swap_transactions(self.asset_1_id, 1_000 + i)) for i in range(100)]
+        txn_groups += [transaction.assign_group_id(self.get_add_liquidity_transactions(1_000 + i, 2_000 + i)) for i in range(100)]
+        expected = [[base64.b64decode(msgpack_encode(stxn)) for stxn in self.sign_txns(txn_group, self.user_sk)] for txn_group in txn_groups]
+
+        with BatchSigner(self.user_sk, worker_count=2, chunk_size=16) as signer:
+            self.assertEqual(signer.sign(txn_groups), expected)
+
+            buffer, offsets = signer.sign_to_buffer(txn_groups)
+            self.assertEqual(len(offsets), len(txn_groups) + 1)
+            self.assertEqual(bytes(buffer), b"".join(b"".join(encoded_stxns) for encoded_stxns in expected))
+            for i, encoded_stxns in enumerate(expected):
+                self.assertEqual(buffer[offsets[i]:offsets[i + 1]], b"".join(encoded_stxns))
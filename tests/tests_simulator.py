@@ -0,0 +1,80 @@
+from algojig import get_suggested_params
+from algojig.exceptions import LogicEvalError
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .amm import LogicError, get_fixed_input_swap_quote
+from .constants import *
+from .core import BaseTestCase
+from .simulator import PoolSimulator, get_operation, simulate_pending_groups
+
+
+class TestPoolSimulator(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=2_000_000, liquidity_provider_address=self.user_addr)
+
+    def test_pending_groups(self):
+        pool_state = self.get_pool_state()
+        output_amount, _ = get_fixed_input_swap_quote(pool_state, self.asset_1_id, 10_000)
+        txn_groups = [
+            self.get_swap_transactions(self.asset_1_id, 10_000, min_output=output_amount),
+            # The reserves are changed by the first swap, the same quote fails
+            self.get_swap_transactions(self.asset_1_id, 10_000, min_output=output_amount),
+            self.get_add_liquidity_transactions(10_000, 20_000),
+            self.get_add_liquidity_transactions(None, 5_000),
+            self.get_remove_liquidity_transactions(5_000),
+            self.get_remove_liquidity_single_transactions(5_000, self.asset_2_id),
+            self.get_swap_transactions(self.asset_2_id, 1_000, mode="fixed-output", min_output=400),
+        ]
+        simulator = simulate_pending_groups({self.pool_address: pool_state}, txn_groups, timestamp=1000)[self.pool_address]
+        self.assertEqual(simulator.get_failed_indexes(), [1])
+        self.assertIsInstance(simulator.results[1], LogicError)
+        self.assertEqual(simulator.results[5]['asset_1_amount'], 0)
+
+        # The groups that are not dropped are applied by the ledger with the same result
+        for index, txn_group in enumerate(txn_groups):
+            stxns = self.sign_txns(transaction.assign_group_id(txn_group), self.user_sk)
+            if index in simulator.get_failed_indexes():
+                with self.assertRaises(LogicEvalError):
+                    self.ledger.eval_transactions(stxns, block_timestamp=1000)
+            else:
+                self.ledger.eval_transactions(stxns, block_timestamp=1000)
+        self.assertEqual(simulator.state, self.get_pool_state())
+
+    def test_reorder(self):
+        pool_state = self.get_pool_state()
+        output_amount, _ = get_fixed_input_swap_quote(pool_state, self.asset_1_id, 10_000)
+        operations = [get_operation(txn_group, {self.pool_address: pool_state})[1:] for txn_group in [
+            self.get_swap_transactions(self.asset_1_id, 10_000, min_output=output_amount),
+            self.get_swap_transactions(self.asset_1_id, 1_000),
+        ]]
+        simulator = PoolSimulator(pool_state, operations)
+        self.assertEqual(simulator.get_failed_indexes(), [])
+
+        # Our swap is front-run by a swap of the same direction
+        simulator.reorder([1, 0])
+        self.assertEqual(simulator.get_failed_indexes(), [1])
+        state = simulator.state
+        simulator.remove(1)
+        self.assertEqual(simulator.state, state)
+        simulator.insert(0, operations[0])
+        self.assertEqual(simulator.get_failed_indexes(), [])
+        self.assertEqual(simulator.states[1][b'asset_1_reserves'], pool_state[b'asset_1_reserves'] + 10_000 - simulator.results[0]['protocol_fee_amount'])
@@ -0,0 +1,72 @@
+import base64
+
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.encoding import msgpack_encode
+from algosdk.future import transaction
+
+from .amm import get_fixed_input_swap_quote
+from .constants import *
+from .core import BaseTestCase
+from .templates import TransactionGroupTemplate
+
+
+class TestTransactionGroupTemplate(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+
+    def encode_txn_group(self, txn_group, first_valid, last_valid):
+        for txn in txn_group:
+            txn.first_valid_round = first_valid
+            txn.last_valid_round = last_valid
+        txn_group = transaction.assign_group_id(txn_group)
+        return [base64.b64decode(msgpack_encode(stxn)) for stxn in self.sign_txns(txn_group, self.user_sk)]
+
+    def test_matches_object_path(self):
+        swap_template = TransactionGroupTemplate(self.get_swap_transactions(self.asset_1_id, 1), self.user_sk, amount_indexes=[0], min_output_args=[(1, 2)])
+        add_liquidity_template = TransactionGroupTemplate(self.get_add_liquidity_transactions(1, 1), self.user_sk, amount_indexes=[0, 1], min_output_args=[(2, 2)])
+        remove_liquidity_template = TransactionGroupTemplate(self.get_remove_liquidity_transactions(1), self.user_sk, amount_indexes=[0], min_output_args=[(1, 1), (1, 2)])
+
+        # The integer encodings of msgpack have different widths, the zero first valid round is omitted by msgpack_encode
+        for first_valid, amount, min_output in [(0, 1, 0), (1, 1, 0), (127, 128, 255), (1_000, 65_536, 2 ** 32), (2 ** 32, MAX_ASSET_AMOUNT, MAX_UINT64)]:
+            last_valid = first_valid + 1000
+            self.assertEqual(
+                swap_template.encode(first_valid, last_valid, amounts=[amount], min_outputs=[min_output]),
+                self.encode_txn_group(self.get_swap_transactions(self.asset_1_id, amount, min_output=min_output), first_valid, last_valid),
+            )
+            self.assertEqual(
+                add_liquidity_template.encode(first_valid, last_valid, amounts=[amount, amount + 1], min_outputs=[min_output]),
+                self.encode_txn_group(self.get_add_liquidity_transactions(amount, amount + 1, min_output=min_output), first_valid, last_valid),
+            )
+            self.assertEqual(
+                remove_liquidity_template.encode(first_valid, last_valid, amounts=[amount], min_outputs=[min_output, min_output // 2]),
+                self.encode_txn_group(self.get_remove_liquidity_transactions(amount, min_output_1=min_output, min_output_2=min_output // 2), first_valid, last_valid),
+            )
+
+    def test_swap(self):
+        swap_template = TransactionGroupTemplate(self.get_swap_transactions(self.asset_1_id, 1), self.user_sk, amount_indexes=[0], min_output_args=[(1, 2)])
+
+        for input_amount in (10_000, 20_000, 30_000):
+            output_amount, _ = get_fixed_input_swap_quote(self.get_pool_state(), self.asset_1_id, input_amount)
+            stxns = swap_template.get_signed_transactions(self.sp.first, self.sp.last, amounts=[input_amount], min_outputs=[output_amount])
+            asset_2_balance = self.ledger.get_account_balance(self.user_addr, self.asset_2_id)[0]
+            self.ledger.eval_transactions(stxns)
+            self.assertEqual(self.ledger.get_account_balance(self.user_addr, self.asset_2_id)[0], asset_2_balance + output_amount)
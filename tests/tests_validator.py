@@ -0,0 +1,158 @@
+import re
+import unittest
+from unittest.mock import patch
+
+from algojig import get_suggested_params
+from algojig.exceptions import LogicEvalError
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from . import tests_add_liquidity, tests_flash_loan, tests_flash_swap, tests_remove_liquidity, tests_swap, tests_swap_groupped
+from .constants import *
+from .core import BaseTestCase
+from .validator import get_group_error
+
+PAIR_CALLS = [
+    ("verify_flash_loan_txn_index", "verify_flash_loan"),
+    ("flash_loan_txn_index", "flash_loan"),
+    ("verify_flash_swap_txn_index", "verify_flash_swap"),
+    ("flash_swap_txn_index", "flash_swap"),
+]
+
+
+def get_validator_lines():
+    """ Returns the lines which can be reported by the validator """
+    with open("tests/validator.py") as f:
+        source = f.read()
+    lines = set()
+    for line in re.findall(r"""(?:require\(.*?, f?|LogicError\(f?)(?:"(.*?)"|'(.*?)')\)""", source):
+        line = line[0] or line[1]
+        if "{" in line:
+            lines.update(line.format(index_name=index_name, method=method) for index_name, method in PAIR_CALLS)
+        else:
+            lines.add(line)
+    return lines
+
+
+class TestGroupValidator(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+
+    def assert_same_error(self, txn_group, expected_error):
+        txn_group = transaction.assign_group_id(txn_group)
+        self.assertEqual(get_group_error(txn_group, {self.pool_address: self.get_pool_state()}), expected_error)
+        with self.assertRaises(LogicEvalError) as e:
+            self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk))
+        self.assertEqual(e.exception.source['line'], expected_error[1])
+
+    def test_contract_lines(self):
+        with open("contracts/amm_approval.tl") as f:
+            contract_lines = {line.strip() for line in f}
+        self.assertEqual(get_validator_lines() - contract_lines, set())
+
+    def test_valid_groups(self):
+        pool_states = {self.pool_address: self.get_pool_state()}
+        for txn_group in [
+            self.get_swap_transactions(self.asset_1_id, 10_000),
+            self.get_add_liquidity_transactions(10_000, 10_000),
+            self.get_add_liquidity_transactions(None, 10_000),
+            self.get_remove_liquidity_transactions(10_000),
+            self.get_remove_liquidity_single_transactions(10_000, self.asset_1_id),
+            self.get_flash_loan_transactions(10_000, 10_000, 10_030, 10_030),
+        ]:
+            self.assertIsNone(get_group_error(txn_group, pool_states))
+
+    def test_errors(self):
+        txn_group = self.get_swap_transactions(self.asset_1_id, 10_000)
+        txn_group[0].receiver = self.user_addr
+        self.assert_same_error(txn_group, (1, "assert(Gtxn[input_txn_index].AssetReceiver == pool_address)"))
+
+        txn_group = self.get_remove_liquidity_transactions(10_000)
+        txn_group[1].foreign_assets = [self.asset_2_id, self.asset_1_id]
+        self.assert_same_error(txn_group, (1, "assert(Txn.Assets[0] == asset_1_id)"))
+
+        txn_group = self.get_add_liquidity_transactions(10_000, 10_000)
+        txn_group[0].index = self.asset_2_id
+        self.assert_same_error(txn_group, (2, "assert(Gtxn[asset_1_txn_index].XferAsset == asset_1_id)"))
+
+        # The swap of the pool is not allowed between the flash swap and its verification
+        txn_group = [
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_FLASH_SWAP, 4, 10_000, 0],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            ),
+            *self.get_swap_transactions(self.asset_2_id, 10_000),
+            transaction.AssetTransferTxn(sender=self.user_addr, sp=self.sp, receiver=self.pool_address, index=self.asset_1_id, amt=10_100),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_VERIFY_FLASH_SWAP, 4],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            ),
+        ]
+        txn_group[0].fee = self.sp.fee * 3
+        self.assert_same_error(txn_group, (2, 'assert(app_local_get(1, "lock") == (Txn.ApplicationArgs[0] == "verify_flash_swap"))'))
+
+    def test_agreement(self):
+        """ The existing tests are run with the validator in front of the ledger """
+        validator_lines = get_validator_lines()
+        eval_transactions = JigLedger.eval_transactions
+        mismatches = []
+
+        def validated_eval_transactions(ledger, stxns, *args, **kwargs):
+            pool_states = {address: account['local_states'][APPLICATION_ID] for address, account in ledger.accounts.items() if APPLICATION_ID in account.get('local_states', {})}
+            error = get_group_error(stxns, pool_states)
+            try:
+                block = eval_transactions(ledger, stxns, *args, **kwargs)
+            except LogicEvalError as e:
+                line = (e.source or {}).get('line')
+                # A failing assert which is not checked by the validator may come first
+                if line in validator_lines and (error is None or error[1] != line):
+                    mismatches.append((error, line))
+                raise
+            if error is not None:
+                mismatches.append((error, None))
+            return block
+
+        suite = unittest.TestSuite()
+        # The modules are imported instead of the test cases so they are not collected twice
+        for test_case in [
+            tests_swap.TestSwap,
+            tests_swap_groupped.TestGroupedSwap,
+            tests_add_liquidity.TestAddLiquidity,
+            tests_add_liquidity.TestAddLiquidityAlgoPair,
+            tests_remove_liquidity.TestRemoveLiquidity,
+            tests_flash_loan.TestFlashLoan,
+            tests_flash_loan.TestFlashLoanAlgoPair,
+            tests_flash_swap.TestFlashSwap,
+        ]:
+            suite.addTests(unittest.defaultTestLoader.loadTestsFromTestCase(test_case))
+        with patch.object(JigLedger, 'eval_transactions', validated_eval_transactions):
+            result = unittest.TestResult()
+            suite.run(result)
+        self.assertEqual(result.errors + result.failures, [])
+        self.assertEqual(mismatches, [])
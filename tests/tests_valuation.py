@@ -0,0 +1,78 @@
+import unittest
+
+from . import amm
+from .constants import *
+from .valuation import PositionBook, get_asset_prices, get_pool_columns, get_twap_price, get_underlying_amounts
+
+
+class TestValuation(unittest.TestCase):
+
+    def setUp(self):
+        self.pool_states = {
+            'pool_1': {
+                b'asset_1_id': 5,
+                b'asset_2_id': ALGO_ASSET_ID,
+                b'asset_1_reserves': 1_000_000,
+                b'asset_2_reserves': 4_000_000,
+                b'issued_pool_tokens': 2_000_000,
+                b'total_fee_share': TOTAL_FEE_SHARE,
+                b'protocol_fee_ratio': PROTOCOL_FEE_RATIO,
+                b'cumulative_price_update_timestamp': 100,
+            },
+            'pool_2': {
+                b'asset_1_id': 7,
+                b'asset_2_id': 5,
+                b'asset_1_reserves': 3_000_000,
+                b'asset_2_reserves': 1_000_000,
+                b'issued_pool_tokens': 1_732_050,
+                b'total_fee_share': TOTAL_FEE_SHARE,
+                b'protocol_fee_ratio': PROTOCOL_FEE_RATIO,
+                b'cumulative_price_update_timestamp': 100,
+            },
+        }
+
+    def test_underlying_amounts_match_remove_liquidity(self):
+        pool_state = self.pool_states['pool_2']
+        pool_token_amounts = [1, 999, 1_000, 123_457, pool_state[b'issued_pool_tokens'] - LOCKED_POOL_TOKENS]
+        asset_1_amounts, asset_2_amounts = get_underlying_amounts(pool_state[b'asset_1_reserves'], pool_state[b'asset_2_reserves'], pool_state[b'issued_pool_tokens'], pool_token_amounts)
+        for pool_token_amount, asset_1_amount, asset_2_amount in zip(pool_token_amounts, asset_1_amounts, asset_2_amounts):
+            try:
+                _, result = amm.remove_liquidity(pool_state, pool_token_amount, timestamp=100)
+            except amm.LogicError:
+                # The removal would fail, the amounts are still the pro rata share
+                self.assertEqual(asset_1_amount, pool_token_amount * pool_state[b'asset_1_reserves'] // pool_state[b'issued_pool_tokens'])
+                continue
+            self.assertEqual((asset_1_amount, asset_2_amount), (result['asset_1_amount'], result['asset_2_amount']))
+        self.assertEqual((asset_1_amounts[-1], asset_2_amounts[-1]), (pool_state[b'asset_1_reserves'], pool_state[b'asset_2_reserves']))
+
+    def test_asset_prices(self):
+        asset_prices = get_asset_prices(self.pool_states, ALGO_ASSET_ID)
+        self.assertEqual(asset_prices, {ALGO_ASSET_ID: 1.0, 5: 4.0, 7: 4.0 / 3})
+
+    def test_twap_price(self):
+        previous_pool_state = self.pool_states['pool_1']
+        pool_state = dict(previous_pool_state)
+        amm.update_price_oracle(pool_state, 110)
+        # The reserves change after the oracle update, the TWAP is the price before the change
+        pool_state[b'asset_2_reserves'] = 8_000_000
+        amm.update_price_oracle(pool_state, 120)
+        self.assertEqual(get_twap_price(previous_pool_state, pool_state), 6.0)
+
+    def test_position_values(self):
+        pool_addresses, pools = get_pool_columns(self.pool_states)
+        asset_prices = get_asset_prices(self.pool_states, ALGO_ASSET_ID)
+        # Position 0 entered at the current price, position 1 entered when asset 5 was cheaper
+        position_book = PositionBook(
+            pool_count=len(pool_addresses),
+            pool_indexes=[1, 0, 0],
+            pool_token_amounts=[17_320, 20_000, 20_000],
+            entry_asset_1_amounts=[30_000, 10_000, 20_000],
+            entry_asset_2_amounts=[10_000, 40_000, 20_000],
+        )
+        result = position_book.value(pools, asset_prices)
+        # The results are in the input order
+        self.assertEqual(list(result['asset_1_amount']), [29_999, 10_000, 10_000])
+        self.assertEqual(list(result['asset_2_amount']), [9_999, 40_000, 40_000])
+        self.assertEqual(list(result['value']), [29_999 * 4.0 / 3 + 9_999 * 4.0, 80_000.0, 80_000.0])
+        self.assertEqual(result['impermanent_loss'][1], 0.0)
+        self.assertLess(result['impermanent_loss'][2], 0)
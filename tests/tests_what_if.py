@@ -0,0 +1,84 @@
+from algojig import get_suggested_params
+from algojig.exceptions import LogicEvalError
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .amm import get_fixed_input_swap_quote
+from .constants import *
+from .core import BaseTestCase
+from .what_if import WhatIfEvaluator, fork_ledger
+
+
+class TestWhatIfEvaluator(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+
+    def get_candidates(self):
+        output_amount, _ = get_fixed_input_swap_quote(self.get_pool_state(), self.asset_1_id, 10_000)
+        candidates = []
+        for txn_group in [
+            self.get_swap_transactions(self.asset_1_id, 10_000, min_output=output_amount),
+            self.get_swap_transactions(self.asset_1_id, 10_000, min_output=output_amount + 1),
+            self.get_add_liquidity_transactions(10_000, 10_000),
+        ]:
+            candidates.append(self.sign_txns(transaction.assign_group_id(txn_group), self.user_sk))
+        return candidates
+
+    def test_evaluate(self):
+        pool_state = dict(self.get_pool_state())
+        candidates = self.get_candidates()
+        evaluator = WhatIfEvaluator(self.ledger)
+        results = evaluator.evaluate(candidates)
+
+        (swap_block, swap_error), (_, failed_swap_error), (add_liquidity_block, _) = results
+        self.assertIsNone(swap_error)
+        self.assertIsInstance(failed_swap_error, LogicEvalError)
+        self.assertEqual(failed_swap_error.source['line'], "assert(output_amount >= min_output)")
+        # The candidates are evaluated against the same state
+        self.assertEqual(len(swap_block[b'txns'][1][b'dt'][b'itx']), 1)
+        self.assertEqual(len(add_liquidity_block[b'txns'][2][b'dt'][b'itx']), 2)
+        self.assertEqual(self.get_pool_state(), pool_state)
+
+        block = self.ledger.eval_transactions(candidates[0])
+        self.assertEqual(block[b'txns'][1][b'dt'][b'lg'], swap_block[b'txns'][1][b'dt'][b'lg'])
+
+    def test_set_ledger(self):
+        candidates = self.get_candidates()
+        evaluator = WhatIfEvaluator(self.ledger)
+        self.assertIsNone(evaluator.evaluate(candidates[:1])[0][1])
+        self.ledger.eval_transactions(candidates[0])
+
+        # The quote of the swap is not valid after the swap
+        evaluator.set_ledger(self.ledger)
+        self.assertIsNotNone(evaluator.evaluate(candidates[:1])[0][1])
+
+    def test_fork_ledger(self):
+        pool_state = dict(self.get_pool_state())
+        user_balance = list(self.ledger.accounts[self.user_addr]['balances'][self.asset_1_id])
+        forked_ledger = fork_ledger(self.ledger)
+        forked_ledger.eval_transactions(self.get_candidates()[0])
+
+        self.assertNotEqual(forked_ledger.accounts[self.pool_address]['local_states'][APPLICATION_ID], pool_state)
+        self.assertNotEqual(forked_ledger.accounts[self.user_addr]['balances'][self.asset_1_id], user_balance)
+        self.assertEqual(self.get_pool_state(), pool_state)
+        self.assertEqual(self.ledger.accounts[self.user_addr]['balances'][self.asset_1_id], user_balance)
+        # The base ledger can still be evaluated
+        self.ledger.eval_transactions(self.get_candidates()[0])
@@ -1,5 +1,6 @@
 from decimal import ROUND_UP, Decimal
 
+import msgpack
 from algosdk.future import transaction
 
 
@@ -35,3 +36,17 @@ def print_logs(txn):
                 s = log[0:i].decode()
                 value = int.from_bytes(log[i + 2:], 'big')
                 print(f'{s}: {value}')
+
+
+def decode_signed_transactions(encoded_stxns):
+    """ Returns the signed transaction objects, an item of encoded_stxns may be concatenated signed transactions """
+    stxns = []
+    for encoded_stxn in encoded_stxns:
+        unpacker = msgpack.Unpacker(raw=False)
+        unpacker.feed(encoded_stxn)
+        for stxn in unpacker:
+            if "lsig" in stxn:
+                stxns.append(transaction.LogicSigTransaction.undictify(stxn))
+            else:
+                stxns.append(transaction.SignedTransaction.undictify(stxn))
+    return stxns
@@ -0,0 +1,337 @@
+"""
+Off-chain group validator for the AMM app calls.
+
+The positional asserts of contracts/amm_approval.tl (the transaction types, receivers, senders and assets of the
+transactions at the relative indexes, Txn.NumAssets, the index_diff of the flash calls) and the lock are checked in the
+order of the approval program. The error is the Tealish line which would fail, the same line as
+LogicEvalError.source['line'].
+
+The amount asserts which are cheap and depend only on the group and the pool state are checked too. The swap and the
+liquidity results (min_output, the invariant) are not, tests/simulator.py covers them.
+
+    error = get_group_error(txn_group, pool_states)
+    if error:
+        txn_index, line = error
+"""
+from algosdk.encoding import encode_address
+from algosdk.future import transaction
+
+from .amm import LogicError, calculate_fixed_input_fee_amounts, require
+from .constants import *
+
+ZERO_ADDRESS = encode_address(bytes(32))
+
+AMM_METHODS = {
+    "add_initial_liquidity",
+    METHOD_ADD_LIQUIDITY,
+    METHOD_REMOVE_LIQUIDITY,
+    METHOD_SWAP,
+    "flash_loan",
+    "verify_flash_loan",
+    "flash_swap",
+    "verify_flash_swap",
+}
+
+
+# Transaction fields as they are read by the approval program, the fields of the other transaction types are zero
+
+def get_receiver(txn):
+    return txn.receiver if txn.type == transaction.constants.payment_txn else ZERO_ADDRESS
+
+
+def get_amount(txn):
+    return txn.amt if txn.type == transaction.constants.payment_txn else 0
+
+
+def get_asset_receiver(txn):
+    return txn.receiver if txn.type == transaction.constants.assettransfer_txn else ZERO_ADDRESS
+
+
+def get_xfer_asset(txn):
+    return txn.index if txn.type == transaction.constants.assettransfer_txn else 0
+
+
+def get_asset_amount(txn):
+    return txn.amount if txn.type == transaction.constants.assettransfer_txn else 0
+
+
+def get_app_arg(txn, index, line):
+    app_args = (txn.app_args or []) if txn.type == transaction.constants.appcall_txn else []
+    require(index < len(app_args), line)
+    return app_args[index]
+
+
+def get_int_app_arg(txn, index, line):
+    value = get_app_arg(txn, index, line)
+    require(len(value) <= 8, line)
+    return int.from_bytes(value, 'big')
+
+
+def get_account(txn, index, line):
+    """ Txn.Accounts[0] is the sender """
+    accounts = [txn.sender, *(txn.accounts or [])] if txn.type == transaction.constants.appcall_txn else [txn.sender]
+    require(index < len(accounts), line)
+    return accounts[index]
+
+
+def get_group_txn(txn_group, group_index, offset, line):
+    """ Gtxn[Txn.GroupIndex + offset], line is the line of the index calculation or the first access """
+    index = group_index + offset
+    require(0 <= index < len(txn_group), line)
+    return txn_group[index]
+
+
+class GroupValidator:
+    """ Validates one app call of the group, the methods are the blocks of the amm block of the approval program """
+
+    def __init__(self, txn_group, group_index, pool_states, locks):
+        """ locks is {pool_address: lock} of the flash swaps of the previous app calls in the group """
+        self.txn_group = txn_group
+        self.group_index = group_index
+        self.txn = txn_group[group_index]
+        self.user_address = self.txn.sender
+        self.pool_address = get_account(self.txn, 1, "bytes pool_address = Txn.Accounts[1]")
+
+        # app_local_get returns 0 for a missing key
+        pool_state = pool_states.get(self.pool_address) or {}
+        self.asset_1_id = pool_state.get(b'asset_1_id', 0)
+        self.asset_2_id = pool_state.get(b'asset_2_id', 0)
+        self.pool_token_asset_id = pool_state.get(b'pool_token_asset_id', 0)
+        self.asset_1_reserves = pool_state.get(b'asset_1_reserves', 0)
+        self.asset_2_reserves = pool_state.get(b'asset_2_reserves', 0)
+        self.issued_pool_tokens = pool_state.get(b'issued_pool_tokens', 0)
+        self.total_fee_share = pool_state.get(b'total_fee_share', 0)
+        self.protocol_fee_ratio = pool_state.get(b'protocol_fee_ratio', 0)
+        self.lock = locks.get(self.pool_address, pool_state.get(b'lock', 0))
+
+    def validate(self, method):
+        require(self.lock == (method == "verify_flash_swap"), 'assert(app_local_get(1, "lock") == (Txn.ApplicationArgs[0] == "verify_flash_swap"))')
+        getattr(self, method)()
+
+    def swap(self):
+        input_txn = get_group_txn(self.txn_group, self.group_index, -1, "int input_txn_index = Txn.GroupIndex - 1")
+        mode = get_app_arg(self.txn, 1, "bytes mode = Txn.ApplicationArgs[1]")
+        get_int_app_arg(self.txn, 2, "int min_output = btoi(Txn.ApplicationArgs[2])")
+
+        if input_txn.type == transaction.constants.payment_txn:
+            require(get_receiver(input_txn) == self.pool_address, "assert(Gtxn[input_txn_index].Receiver == pool_address)")
+            input_asset_id = ALGO_ASSET_ID
+            input_amount = get_amount(input_txn)
+        elif input_txn.type == transaction.constants.assettransfer_txn:
+            require(get_asset_receiver(input_txn) == self.pool_address, "assert(Gtxn[input_txn_index].AssetReceiver == pool_address)")
+            input_asset_id = get_xfer_asset(input_txn)
+            input_amount = get_asset_amount(input_txn)
+        else:
+            raise LogicError("error()")
+        require(input_txn.sender == self.user_address, "assert(Gtxn[input_txn_index].Sender == user_address)")
+        require(input_amount, "assert(input_amount)")
+
+        if input_asset_id not in (self.asset_1_id, self.asset_2_id):
+            raise LogicError("error()")
+        if mode not in (b"fixed-input", b"fixed-output"):
+            raise LogicError("error()")
+
+    def add_initial_liquidity(self):
+        require(self.issued_pool_tokens == 0, "assert(issued_pool_tokens == 0)")
+        asset_1_txn = get_group_txn(self.txn_group, self.group_index, -2, "asset_1_txn_index = Txn.GroupIndex - 2")
+        asset_2_txn = get_group_txn(self.txn_group, self.group_index, -1, "asset_2_txn_index = Txn.GroupIndex - 1")
+
+        require(asset_1_txn.type == transaction.constants.assettransfer_txn, "assert(Gtxn[asset_1_txn_index].TypeEnum == Axfer)")
+        require(get_asset_receiver(asset_1_txn) == self.pool_address, "assert(Gtxn[asset_1_txn_index].AssetReceiver == pool_address)")
+        require(get_xfer_asset(asset_1_txn) == self.asset_1_id, "assert(Gtxn[asset_1_txn_index].XferAsset == asset_1_id)")
+        require(asset_1_txn.sender == self.user_address, "assert(Gtxn[asset_1_txn_index].Sender == user_address)")
+        require(get_asset_amount(asset_1_txn), "assert(asset_1_amount)")
+
+        asset_2_amount = self.validate_asset_2_transfer(asset_2_txn)
+        require(asset_2_amount, "assert(asset_2_amount)")
+        require(asset_2_txn.sender == self.user_address, "assert(Gtxn[asset_2_txn_index].Sender == user_address)")
+
+    def add_liquidity(self):
+        mode = get_app_arg(self.txn, 1, "bytes mode = Txn.ApplicationArgs[1]")
+        get_int_app_arg(self.txn, 2, "int min_output = btoi(Txn.ApplicationArgs[2])")
+        require(self.issued_pool_tokens, "assert(issued_pool_tokens)")
+
+        asset_1_txn = asset_2_txn = None
+        if mode == b"flexible":
+            asset_1_txn = get_group_txn(self.txn_group, self.group_index, -2, "asset_1_txn_index = Txn.GroupIndex - 2")
+            asset_2_txn = get_group_txn(self.txn_group, self.group_index, -1, "asset_2_txn_index = Txn.GroupIndex - 1")
+        elif mode == b"single":
+            txn = get_group_txn(self.txn_group, self.group_index, -1, "int txn_index = Txn.GroupIndex - 1")
+            if get_xfer_asset(txn) == self.asset_1_id:
+                asset_1_txn = txn
+            elif get_xfer_asset(txn) == self.asset_2_id:
+                asset_2_txn = txn
+            else:
+                raise LogicError("error()")
+        else:
+            raise LogicError("error()")
+
+        if asset_1_txn is not None:
+            require(asset_1_txn.type == transaction.constants.assettransfer_txn, "assert(Gtxn[asset_1_txn_index].TypeEnum == Axfer)")
+            require(get_asset_receiver(asset_1_txn) == self.pool_address, "assert(Gtxn[asset_1_txn_index].AssetReceiver == pool_address)")
+            require(get_xfer_asset(asset_1_txn) == self.asset_1_id, "assert(Gtxn[asset_1_txn_index].XferAsset == asset_1_id)")
+            require(asset_1_txn.sender == self.user_address, "assert(Gtxn[asset_1_txn_index].Sender == user_address)")
+
+        if asset_2_txn is not None:
+            self.validate_asset_2_transfer(asset_2_txn)
+            require(asset_2_txn.sender == self.user_address, "assert(Gtxn[asset_2_txn_index].Sender == user_address)")
+
+    def validate_asset_2_transfer(self, asset_2_txn):
+        """ Returns the amount, Gtxn[asset_2_txn_index] is a payment if asset 2 is ALGO """
+        if self.asset_2_id == ALGO_ASSET_ID:
+            require(asset_2_txn.type == transaction.constants.payment_txn, "assert(Gtxn[asset_2_txn_index].TypeEnum == Pay)")
+            require(get_receiver(asset_2_txn) == self.pool_address, "assert(Gtxn[asset_2_txn_index].Receiver == pool_address)")
+            return get_amount(asset_2_txn)
+        require(asset_2_txn.type == transaction.constants.assettransfer_txn, "assert(Gtxn[asset_2_txn_index].TypeEnum == Axfer)")
+        require(get_asset_receiver(asset_2_txn) == self.pool_address, "assert(Gtxn[asset_2_txn_index].AssetReceiver == pool_address)")
+        require(get_xfer_asset(asset_2_txn) == self.asset_2_id, "assert(Gtxn[asset_2_txn_index].XferAsset == asset_2_id)")
+        return get_asset_amount(asset_2_txn)
+
+    def remove_liquidity(self):
+        get_int_app_arg(self.txn, 1, "int min_output_1 = btoi(Txn.ApplicationArgs[1])")
+        get_int_app_arg(self.txn, 2, "int min_output_2 = btoi(Txn.ApplicationArgs[2])")
+        pool_token_txn = get_group_txn(self.txn_group, self.group_index, -1, "int pool_token_txn_index = Txn.GroupIndex - 1")
+        require(pool_token_txn.type == transaction.constants.assettransfer_txn, "assert(Gtxn[pool_token_txn_index].TypeEnum == Axfer)")
+        require(get_asset_receiver(pool_token_txn) == self.pool_address, "assert(Gtxn[pool_token_txn_index].AssetReceiver == pool_address)")
+        require(get_xfer_asset(pool_token_txn) == self.pool_token_asset_id, "assert(Gtxn[pool_token_txn_index].XferAsset == pool_token_asset_id)")
+        require(pool_token_txn.sender == self.user_address, "assert(Gtxn[pool_token_txn_index].Sender == user_address)")
+        removed_pool_token_amount = get_asset_amount(pool_token_txn)
+        require(removed_pool_token_amount, "assert(removed_pool_token_amount)")
+
+        issued_pool_tokens = self.issued_pool_tokens
+        if removed_pool_token_amount + LOCKED_POOL_TOKENS == issued_pool_tokens:
+            asset_1_amount, asset_2_amount = self.asset_1_reserves, self.asset_2_reserves
+            issued_pool_tokens = 0
+        else:
+            require(issued_pool_tokens, "asset_1_amount = btoi((itob(removed_pool_token_amount) b* itob(asset_1_reserves)) b/ itob(issued_pool_tokens))")
+            asset_1_amount = removed_pool_token_amount * self.asset_1_reserves // issued_pool_tokens
+            asset_2_amount = removed_pool_token_amount * self.asset_2_reserves // issued_pool_tokens
+            require(removed_pool_token_amount <= issued_pool_tokens, "issued_pool_tokens = issued_pool_tokens - removed_pool_token_amount")
+            issued_pool_tokens -= removed_pool_token_amount
+        require(asset_1_amount and asset_2_amount, "assert(asset_1_amount && asset_2_amount)")
+
+        assets = self.txn.foreign_assets or []
+        if len(assets) == 2:
+            require(assets[0] == self.asset_1_id, "assert(Txn.Assets[0] == asset_1_id)")
+            require(assets[1] == self.asset_2_id, "assert(Txn.Assets[1] == asset_2_id)")
+        elif len(assets) == 1:
+            require(issued_pool_tokens > 0, "assert(issued_pool_tokens > 0)")
+            if assets[0] not in (self.asset_1_id, self.asset_2_id):
+                raise LogicError("error()")
+        else:
+            raise LogicError("error()")
+
+    def flash_loan(self):
+        index_diff = get_int_app_arg(self.txn, 1, "int index_diff = btoi(Txn.ApplicationArgs[1])")
+        asset_1_amount = get_int_app_arg(self.txn, 2, "int asset_1_amount = btoi(Txn.ApplicationArgs[2])")
+        asset_2_amount = get_int_app_arg(self.txn, 3, "int asset_2_amount = btoi(Txn.ApplicationArgs[3])")
+        if asset_1_amount and asset_2_amount:
+            require(index_diff > 2, "assert(index_diff > 2)")
+        else:
+            require(index_diff > 1, "assert(index_diff > 1)")
+            require(asset_1_amount or asset_2_amount, "assert(asset_1_amount || asset_2_amount)")
+
+        verify_txn = get_group_txn(self.txn_group, self.group_index, index_diff, "assert(Gtxn[verify_flash_loan_txn_index].TypeEnum == Appl)")
+        self.validate_pair_call(verify_txn, "verify_flash_loan", "verify_flash_loan_txn_index")
+        require(verify_txn.sender == self.user_address, "assert(Gtxn[verify_flash_loan_txn_index].Sender == user_address)")
+
+        if asset_1_amount:
+            require(asset_1_amount <= self.asset_1_reserves, "assert(asset_1_amount <= asset_1_reserves)")
+        if asset_2_amount:
+            require(asset_2_amount <= self.asset_2_reserves, "assert(asset_2_amount <= asset_2_reserves)")
+
+    def verify_flash_loan(self):
+        index_diff = get_int_app_arg(self.txn, 1, "int index_diff = btoi(Txn.ApplicationArgs[1])")
+        flash_loan_txn = get_group_txn(self.txn_group, self.group_index, -index_diff, "int flash_loan_txn_index = Txn.GroupIndex - index_diff")
+        self.validate_pair_call(flash_loan_txn, "flash_loan", "flash_loan_txn_index")
+        require(flash_loan_txn.sender == self.user_address, "assert(Gtxn[flash_loan_txn_index].Sender == user_address)")
+        asset_1_output_amount = get_int_app_arg(flash_loan_txn, 2, "int asset_1_output_amount = btoi(Gtxn[flash_loan_txn_index].ApplicationArgs[2])")
+        asset_2_output_amount = get_int_app_arg(flash_loan_txn, 3, "int asset_2_output_amount = btoi(Gtxn[flash_loan_txn_index].ApplicationArgs[3])")
+
+        if asset_1_output_amount:
+            asset_1_total_fee_amount, _, _ = calculate_fixed_input_fee_amounts(asset_1_output_amount, self.total_fee_share, self.protocol_fee_ratio)
+            require(asset_1_total_fee_amount, "assert(asset_1_total_fee_amount)")
+            asset_1_repayment_amount = asset_1_output_amount + asset_1_total_fee_amount
+            if asset_2_output_amount:
+                asset_1_txn = get_group_txn(self.txn_group, self.group_index, -2, "asset_1_txn_index = Txn.GroupIndex - 2")
+            else:
+                asset_1_txn = get_group_txn(self.txn_group, self.group_index, -1, "asset_1_txn_index = Txn.GroupIndex - 1")
+            require(asset_1_txn.type == transaction.constants.assettransfer_txn, "assert(Gtxn[asset_1_txn_index].TypeEnum == Axfer)")
+            require(get_xfer_asset(asset_1_txn) == self.asset_1_id, "assert(Gtxn[asset_1_txn_index].XferAsset == asset_1_id)")
+            require(get_asset_receiver(asset_1_txn) == self.pool_address, "assert(Gtxn[asset_1_txn_index].AssetReceiver == pool_address)")
+            require(get_asset_amount(asset_1_txn) >= asset_1_repayment_amount, "assert(Gtxn[asset_1_txn_index].AssetAmount >= asset_1_repayment_amount)")
+            require(asset_1_txn.sender == self.user_address, "assert(Gtxn[asset_1_txn_index].Sender == user_address)")
+
+        if asset_2_output_amount:
+            asset_2_total_fee_amount, _, _ = calculate_fixed_input_fee_amounts(asset_2_output_amount, self.total_fee_share, self.protocol_fee_ratio)
+            require(asset_2_total_fee_amount, "assert(asset_2_total_fee_amount)")
+            asset_2_repayment_amount = asset_2_output_amount + asset_2_total_fee_amount
+            asset_2_txn = get_group_txn(self.txn_group, self.group_index, -1, "int asset_2_txn_index = Txn.GroupIndex - 1")
+            if self.asset_2_id == ALGO_ASSET_ID:
+                require(asset_2_txn.type == transaction.constants.payment_txn, "assert(Gtxn[asset_2_txn_index].TypeEnum == Pay)")
+                require(get_receiver(asset_2_txn) == self.pool_address, "assert(Gtxn[asset_2_txn_index].Receiver == pool_address)")
+                require(get_amount(asset_2_txn) >= asset_2_repayment_amount, "assert(Gtxn[asset_2_txn_index].Amount >= asset_2_repayment_amount)")
+            else:
+                require(asset_2_txn.type == transaction.constants.assettransfer_txn, "assert(Gtxn[asset_2_txn_index].TypeEnum == Axfer)")
+                require(get_xfer_asset(asset_2_txn) == self.asset_2_id, "assert(Gtxn[asset_2_txn_index].XferAsset == asset_2_id)")
+                require(get_asset_receiver(asset_2_txn) == self.pool_address, "assert(Gtxn[asset_2_txn_index].AssetReceiver == pool_address)")
+                require(get_asset_amount(asset_2_txn) >= asset_2_repayment_amount, "assert(Gtxn[asset_2_txn_index].AssetAmount >= asset_2_repayment_amount)")
+            require(asset_2_txn.sender == self.user_address, "assert(Gtxn[asset_2_txn_index].Sender == user_address)")
+
+    def flash_swap(self):
+        index_diff = get_int_app_arg(self.txn, 1, "int index_diff = btoi(Txn.ApplicationArgs[1])")
+        require(index_diff > 1, "assert(index_diff > 1)")
+        verify_txn = get_group_txn(self.txn_group, self.group_index, index_diff, "assert(Gtxn[verify_flash_swap_txn_index].TypeEnum == Appl)")
+        self.validate_pair_call(verify_txn, "verify_flash_swap", "verify_flash_swap_txn_index")
+        require(verify_txn.sender == self.user_address, "assert(Gtxn[verify_flash_swap_txn_index].Sender == user_address)")
+        asset_1_output_amount = get_int_app_arg(self.txn, 2, "int asset_1_output_amount = btoi(Txn.ApplicationArgs[2])")
+        asset_2_output_amount = get_int_app_arg(self.txn, 3, "int asset_2_output_amount = btoi(Txn.ApplicationArgs[3])")
+        require(asset_1_output_amount or asset_2_output_amount, "assert(asset_1_output_amount || asset_2_output_amount)")
+        if asset_1_output_amount:
+            require(asset_1_output_amount <= self.asset_1_reserves, "assert(asset_1_output_amount <= asset_1_reserves)")
+        if asset_2_output_amount:
+            require(asset_2_output_amount <= self.asset_2_reserves, "assert(asset_2_output_amount <= asset_2_reserves)")
+
+    def verify_flash_swap(self):
+        index_diff = get_int_app_arg(self.txn, 1, "int index_diff = btoi(Txn.ApplicationArgs[1])")
+        flash_swap_txn = get_group_txn(self.txn_group, self.group_index, -index_diff, "int flash_swap_txn_index = Txn.GroupIndex - index_diff")
+        self.validate_pair_call(flash_swap_txn, "flash_swap", "flash_swap_txn_index")
+
+    def validate_pair_call(self, txn, method, index_name):
+        """ The flash call and its verify call are calls of the same pool with the same index_diff """
+        require(txn.type == transaction.constants.appcall_txn, f"assert(Gtxn[{index_name}].TypeEnum == Appl)")
+        require(txn.on_complete == transaction.OnComplete.NoOpOC, f"assert(Gtxn[{index_name}].OnCompletion == NoOp)")
+        require(txn.index == APPLICATION_ID, f"assert(Gtxn[{index_name}].ApplicationID == Global.CurrentApplicationID)")
+        require(get_app_arg(txn, 0, f'assert(Gtxn[{index_name}].ApplicationArgs[0] == "{method}")') == method.encode(), f'assert(Gtxn[{index_name}].ApplicationArgs[0] == "{method}")')
+        index_diff_line = f"assert(Gtxn[{index_name}].ApplicationArgs[1] == Txn.ApplicationArgs[1])"
+        require(get_app_arg(txn, 1, index_diff_line) == self.txn.app_args[1], index_diff_line)
+        pool_line = f"assert(Gtxn[{index_name}].Accounts[1] == Txn.Accounts[1])"
+        require(get_account(txn, 1, pool_line) == self.pool_address, pool_line)
+
+
+def get_group_error(txn_group, pool_states, app_id=APPLICATION_ID):
+    """
+    Returns (txn_index, line) of the first app call of the group which would fail, None if the checked asserts pass.
+    txn_group is a list of transactions or signed transactions, pool_states is {pool_address: pool_state}. The lock of a
+    pool is tracked through the group. The pool states are not updated by the other app calls of the group.
+    """
+    txn_group = [getattr(txn, 'transaction', txn) for txn in txn_group]
+    locks = {}
+    for group_index, txn in enumerate(txn_group):
+        if not (txn.type == transaction.constants.appcall_txn and txn.index == app_id and txn.on_complete == transaction.OnComplete.NoOpOC):
+            continue
+        method = (txn.app_args or [b""])[0].decode(errors='replace')
+        if method not in AMM_METHODS:
+            continue
+
+        try:
+            validator = GroupValidator(txn_group, group_index, pool_states, locks)
+            validator.validate(method)
+        except LogicError as e:
+            return group_index, str(e)
+
+        if method == "flash_swap":
+            locks[validator.pool_address] = 1
+        elif method == "verify_flash_swap":
+            locks[validator.pool_address] = 0
+    return None
@@ -0,0 +1,208 @@
+"""
+Batch LP position valuation and impermanent loss.
+
+The positions are columns (pool index, pool token amount, entry amounts) and the pools are columns of reserves and
+issued pool tokens. The underlying amounts use the rounding of remove_liquidity, the values are in a numeraire asset
+priced by spot or TWAP prices.
+
+    python -m tests.valuation --pools 5000 --positions 1000000
+
+benchmarks the mark-to-market time.
+"""
+import argparse
+import json
+import random
+import time
+from array import array
+from collections import deque
+from itertools import repeat
+from math import isqrt
+from operator import add, itemgetter, mul, sub, truediv
+
+from . import amm
+from .constants import *
+
+
+def get_spot_price(pool_state):
+    """ The price of asset 1 in asset 2 """
+    return pool_state[b'asset_2_reserves'] / pool_state[b'asset_1_reserves']
+
+
+def get_twap_price(previous_pool_state, pool_state):
+    """ The time weighted average price of asset 1 in asset 2 between the two states of a pool """
+    time_delta = pool_state[b'cumulative_price_update_timestamp'] - previous_pool_state[b'cumulative_price_update_timestamp']
+    if not time_delta:
+        return get_spot_price(pool_state)
+    cumulative_price_delta = amm.get_cumulative_price(pool_state, b'asset_1_cumulative_price') - amm.get_cumulative_price(previous_pool_state, b'asset_1_cumulative_price')
+    return cumulative_price_delta / time_delta / PRICE_SCALE_FACTOR
+
+
+def get_asset_prices(pool_states, numeraire_asset_id, previous_pool_states=None):
+    """
+    Returns {asset_id: price in the numeraire asset}. The prices are propagated from the numeraire through the pools,
+    the deepest pool is used first. TWAP prices are used if the previous pool states are given.
+    """
+    asset_pools = {}
+    for pool_address, pool_state in pool_states.items():
+        if not pool_state[b'asset_1_reserves'] or not pool_state[b'asset_2_reserves']:
+            continue
+        asset_pools.setdefault(pool_state[b'asset_1_id'], []).append(pool_address)
+        asset_pools.setdefault(pool_state[b'asset_2_id'], []).append(pool_address)
+
+    prices = {numeraire_asset_id: 1.0}
+    queue = deque([numeraire_asset_id])
+    while queue:
+        asset_id = queue.popleft()
+        pool_addresses = sorted(asset_pools.get(asset_id, ()), key=lambda address: amm.get_swap_reserves(pool_states[address], asset_id)[0], reverse=True)
+        for pool_address in pool_addresses:
+            pool_state = pool_states[pool_address]
+            if previous_pool_states and pool_address in previous_pool_states:
+                price = get_twap_price(previous_pool_states[pool_address], pool_state)
+            else:
+                price = get_spot_price(pool_state)
+            if asset_id == pool_state[b'asset_2_id']:
+                other_asset_id, other_price = pool_state[b'asset_1_id'], prices[asset_id] * price
+            else:
+                other_asset_id, other_price = pool_state[b'asset_2_id'], prices[asset_id] / price
+            if other_asset_id not in prices:
+                prices[other_asset_id] = other_price
+                queue.append(other_asset_id)
+    return prices
+
+
+def get_underlying_amounts(asset_1_reserves, asset_2_reserves, issued_pool_tokens, pool_token_amounts):
+    """ The asset amounts of remove_liquidity for the positions of a pool """
+    if not issued_pool_tokens:
+        return [0] * len(pool_token_amounts), [0] * len(pool_token_amounts)
+    asset_1_amounts = [p * asset_1_reserves // issued_pool_tokens for p in pool_token_amounts]
+    asset_2_amounts = [p * asset_2_reserves // issued_pool_tokens for p in pool_token_amounts]
+    # The last remover gets all of the reserves
+    if max(pool_token_amounts, default=0) + LOCKED_POOL_TOKENS == issued_pool_tokens:
+        for index, p in enumerate(pool_token_amounts):
+            if p + LOCKED_POOL_TOKENS == issued_pool_tokens:
+                asset_1_amounts[index], asset_2_amounts[index] = asset_1_reserves, asset_2_reserves
+    return asset_1_amounts, asset_2_amounts
+
+
+def get_gather(indexes):
+    """ Returns a function which returns the tuple of the values at the indexes """
+    if len(indexes) == 1:
+        index = indexes[0]
+        return lambda values: (values[index],)
+    if not indexes:
+        return lambda values: ()
+    return itemgetter(*indexes)
+
+
+class PositionBook:
+    """
+    The positions are grouped by pool once so the underlying amounts and the values of a pool are computed by maps with
+    the reserves and the prices of the pool as constants. The results are reordered to the input order at the end.
+    The entry amounts are the underlying amounts at the entry snapshot, they are used for the impermanent loss.
+
+    A valuation of 1M positions of 5000 pools takes about 1.3-2.2 s in CPython, it is not under a second. The divisions
+    and the reordering are large parts of it as every result is a Python object on the way.
+    """
+
+    def __init__(self, pool_count, pool_indexes, pool_token_amounts, entry_asset_1_amounts, entry_asset_2_amounts):
+        grouped_indexes = [[] for _ in range(pool_count)]
+        for position_index, pool_index in enumerate(pool_indexes):
+            grouped_indexes[pool_index].append(position_index)
+
+        self.pool_positions = []
+        grouped_order = []
+        for position_indexes in grouped_indexes:
+            grouped_order.extend(position_indexes)
+            if not position_indexes:
+                self.pool_positions.append(None)
+                continue
+            self.pool_positions.append((
+                [pool_token_amounts[i] for i in position_indexes],
+                [float(entry_asset_1_amounts[i]) for i in position_indexes],
+                [float(entry_asset_2_amounts[i]) for i in position_indexes],
+            ))
+        # The index of each position in the grouped order
+        ranks = [0] * len(grouped_order)
+        for rank, position_index in enumerate(grouped_order):
+            ranks[position_index] = rank
+        self.ungroup = get_gather(ranks)
+
+    def value(self, pools, asset_prices):
+        """
+        pools: columns asset_1_id, asset_2_id, asset_1_reserves, asset_2_reserves, issued_pool_tokens, see get_pool_columns
+        asset_prices: {asset_id: price in the numeraire}, see get_asset_prices
+        Returns the columns asset_1_amount, asset_2_amount, value and impermanent_loss of the positions in the input order.
+        impermanent_loss is value / value of holding the entry amounts - 1, it is negative if the position lost against holding.
+        """
+        asset_1_amounts, asset_2_amounts, values, impermanent_losses = [], [], [], []
+        for pool_index, pool_positions in enumerate(self.pool_positions):
+            if pool_positions is None:
+                continue
+            pool_token_amounts, entry_asset_1_amounts, entry_asset_2_amounts = pool_positions
+            p1 = repeat(asset_prices.get(pools['asset_1_id'][pool_index], 0.0))
+            p2 = repeat(asset_prices.get(pools['asset_2_id'][pool_index], 0.0))
+            pool_asset_1_amounts, pool_asset_2_amounts = get_underlying_amounts(pools['asset_1_reserves'][pool_index], pools['asset_2_reserves'][pool_index], pools['issued_pool_tokens'][pool_index], pool_token_amounts)
+            pool_values = list(map(add, map(mul, pool_asset_1_amounts, p1), map(mul, pool_asset_2_amounts, p2)))
+            hold_values = list(map(add, map(mul, entry_asset_1_amounts, p1), map(mul, entry_asset_2_amounts, p2)))
+
+            asset_1_amounts += pool_asset_1_amounts
+            asset_2_amounts += pool_asset_2_amounts
+            values += pool_values
+            if 0.0 in hold_values:
+                impermanent_losses += [v / h - 1 if h else 0.0 for v, h in zip(pool_values, hold_values)]
+            else:
+                impermanent_losses += map(sub, map(truediv, pool_values, hold_values), repeat(1.0))
+        return dict(
+            asset_1_amount=array('Q', self.ungroup(asset_1_amounts)),
+            asset_2_amount=array('Q', self.ungroup(asset_2_amounts)),
+            value=array('d', self.ungroup(values)),
+            impermanent_loss=array('d', self.ungroup(impermanent_losses)),
+        )
+
+
+def get_pool_columns(pool_states):
+    """ Returns (pool addresses, columns) of the pool states """
+    pool_addresses = list(pool_states)
+    columns = {}
+    for key in ('asset_1_id', 'asset_2_id', 'asset_1_reserves', 'asset_2_reserves', 'issued_pool_tokens'):
+        columns[key] = array('Q', [pool_states[pool_address][key.encode()] for pool_address in pool_addresses])
+    return pool_addresses, columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pools", type=int, default=5_000)
+    parser.add_argument("--positions", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool_states = {}
+    for index in range(args.pools):
+        asset_1_reserves, asset_2_reserves = rng.randint(10 ** 6, 10 ** 13), rng.randint(10 ** 6, 10 ** 13)
+        pool_states[index] = {
+            b'asset_1_id': index + 1,
+            b'asset_2_id': ALGO_ASSET_ID,
+            b'asset_1_reserves': asset_1_reserves,
+            b'asset_2_reserves': asset_2_reserves,
+            b'issued_pool_tokens': isqrt(asset_1_reserves * asset_2_reserves),
+        }
+    _, pools = get_pool_columns(pool_states)
+    pool_indexes = [rng.randrange(args.pools) for _ in range(args.positions)]
+    pool_token_amounts = [rng.randint(1, pools['issued_pool_tokens'][i] // 1000) for i in pool_indexes]
+    # The entry prices are different from the current prices
+    entry_asset_1_amounts = [p * pools['asset_1_reserves'][i] * 2 // pools['issued_pool_tokens'][i] for i, p in zip(pool_indexes, pool_token_amounts)]
+    entry_asset_2_amounts = [p * pools['asset_2_reserves'][i] // 2 // pools['issued_pool_tokens'][i] for i, p in zip(pool_indexes, pool_token_amounts)]
+    position_book = PositionBook(args.pools, pool_indexes, pool_token_amounts, entry_asset_1_amounts, entry_asset_2_amounts)
+
+    start = time.perf_counter()
+    asset_prices = get_asset_prices(pool_states, ALGO_ASSET_ID)
+    prices_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    position_book.value(pools, asset_prices)
+    positions_seconds = time.perf_counter() - start
+    print(json.dumps(dict(pools=args.pools, positions=args.positions, prices_seconds=prices_seconds, positions_seconds=positions_seconds), indent=2))
+
+
+if __name__ == "__main__":
+    main()
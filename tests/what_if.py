@@ -0,0 +1,98 @@
+"""
+What-if evaluation of many candidate groups against the same ledger state.
+
+Every candidate is evaluated with eval_transactions on a fork of the base ledger, the candidates do not see each
+other. The candidates are evaluated one by one in the current process, algojig evaluates in fixed files under
+/tmp/jig so the evaluations of several processes would not run concurrently.
+
+    python -m tests.what_if --candidates 500
+
+benchmarks the evaluation.
+"""
+import argparse
+import json
+import time
+
+from algojig.ledger import JigLedger
+
+from .load import LoadGenerator
+
+
+def fork_ledger(ledger):
+    """
+    Returns a copy of the ledger which can be evaluated without changing the ledger.
+    JigLedger has no copy method, the copy depends on its attributes: the account, app, asset, box and global state
+    dicts are copied down to the mutable values, the other attributes (e.g. the programs) are shared and the sqlite
+    connections (db, block_db) of the last evaluation are not copied.
+    """
+    forked_ledger = JigLedger.__new__(JigLedger)
+    vars(forked_ledger).update(vars(ledger))
+    forked_ledger.db = forked_ledger.block_db = None
+    forked_ledger.accounts = {
+        address: {
+            **account,
+            'balances': {asset_id: list(balance) for asset_id, balance in account['balances'].items()},
+            'local_states': {app_id: dict(local_state) for app_id, local_state in account['local_states'].items()},
+        }
+        for address, account in ledger.accounts.items()
+    }
+    forked_ledger.apps = dict(ledger.apps)
+    forked_ledger.assets = dict(ledger.assets)
+    forked_ledger.boxes = {app_id: dict(boxes) for app_id, boxes in ledger.boxes.items()}
+    forked_ledger.global_states = {app_id: dict(global_state) for app_id, global_state in ledger.global_states.items()}
+    return forked_ledger
+
+
+class WhatIfEvaluator:
+    """
+    Evaluates candidate groups against a base ledger.
+
+        evaluator = WhatIfEvaluator(ledger)
+        for block, error in evaluator.evaluate([stxns, ...]):
+            ...
+
+    error is None or the exception of eval_transactions, e.g. LogicEvalError.
+    """
+
+    def __init__(self, ledger):
+        self.ledger = None
+        self.set_ledger(ledger)
+
+    def set_ledger(self, ledger):
+        """ Changes the base ledger, the later changes of the ledger are not seen by the evaluator """
+        self.ledger = fork_ledger(ledger)
+
+    def evaluate_candidate(self, stxns, block_timestamp=1000):
+        """ Returns (block, None) or (None, exception), the base ledger is not changed """
+        try:
+            return fork_ledger(self.ledger).eval_transactions(stxns, block_timestamp=block_timestamp), None
+        except Exception as e:
+            return None, e
+
+    def evaluate(self, candidates, block_timestamp=1000):
+        """ Returns [(block, error), ...] in the order of the candidates, a candidate is a list of signed transactions """
+        return [self.evaluate_candidate(stxns, block_timestamp) for stxns in candidates]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pools", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=500)
+    args = parser.parse_args()
+
+    generator = LoadGenerator(seed=args.seed, user_count=20, pool_count=args.pools)
+    candidates = [stxns for _, stxns in generator.generate_workload(args.candidates)]
+    evaluator = WhatIfEvaluator(generator.ledger)
+    start = time.perf_counter()
+    results = evaluator.evaluate(candidates)
+    duration = time.perf_counter() - start
+    print(json.dumps(dict(
+        seconds=duration,
+        candidates_per_second=len(candidates) / duration,
+        failed_candidates=sum(error is not None for _, error in results),
+    ), indent=2))
+
+
+if __name__ == "__main__":
+    main()